@@ -0,0 +1,177 @@
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Iterable, List, Optional, Tuple
+
+import maze_runner
+import maze_runner_extension
+from result_cache import ResultCache, result_key
+from search import ENGINES
+from exploration_log import CsvSink, NullSink
+from components import reachable
+
+# the runner module used for each mode, they differ in how strictly mazes are checked
+RUNNERS = {"base": maze_runner, "extension": maze_runner_extension}
+
+
+# the mazes to solve: every .mz and .mzb file in a directory, or whatever a glob pattern matches
+def find_mazes(target: str) -> List[str]:
+    if os.path.isdir(target):
+        return sorted(glob.glob(os.path.join(target, "*.mz")) + glob.glob(os.path.join(target, "*.mzb")))
+    return sorted(glob.glob(target, recursive=True))
+
+
+# the name each maze's output files get: its path relative to the directory all the mazes share,
+# without the extension, so a/x.mz and b/x.mz write a/x.* and b/x.* and never each other's files.
+# raises ValueError when two mazes would still get the same name (e.g. x.mz and x.mzb)
+def output_names(maze_files: List[str]) -> List[str]:
+    paths = [os.path.abspath(maze_file) for maze_file in maze_files]
+    root = os.path.commonpath([os.path.dirname(path) for path in paths]) if paths else ""
+    names = [os.path.splitext(os.path.relpath(path, root))[0] for path in paths]
+    seen = {}
+    for maze_file, name in zip(maze_files, names):
+        if name in seen:
+            raise ValueError(f"{seen[name]} and {maze_file} would write the same output files ({name}.*)")
+        seen[name] = maze_file
+    return names
+
+
+# solves one maze file and returns its result line. runs inside a worker process, so it never
+# raises: a maze that can't be read or solved comes back with ok = false and the error.
+# with an output directory the statistics and exploration log of each maze are written there
+# as <output_name>.statistics.txt / <output_name>.exploration.csv (see output_names, the file
+# name without its extension when not given) so no run overwrites another.
+def solve_maze_file(maze_file: str, mode: str = "base", algorithm: str = "bfs",
+                    starting: Optional[Tuple[int, int]] = None, goal: Optional[Tuple[int, int]] = None,
+                    output_dir: Optional[str] = None, use_cache: bool = True,
+                    output_name: Optional[str] = None) -> dict:
+    runner = RUNNERS[mode]
+    name = output_name or os.path.splitext(os.path.basename(maze_file))[0]
+    result = {"maze": maze_file, "ok": False}
+    began = time.perf_counter()
+    cache = None
+    try:
+        if output_dir:
+            os.makedirs(os.path.dirname(os.path.join(output_dir, name)), exist_ok=True)
+        maze = runner.maze_reader(maze_file, compact=True)
+        read_done = time.perf_counter()
+        result["read_seconds"] = round(read_done - began, 6)
+
+        # the extension answers an invalid position with a made up [(0, 0)] path, here it is an
+        # error like in the base version, and it is never cached as if it were a solve
+        if mode == "extension":
+            maze_runner_extension.check_positions(maze, starting, goal)
+
+        # start and goal in different parts of the maze: skipped without touching the cache or searching
+        # when the maze already has a component index (a .mzb file stored with --components)
+        if reachable(maze, starting or (0, 0), goal or (len(maze) - 1, len(maze[0]) - 1)) is False:
+            result["unreachable"] = True
+            raise ValueError("No path found from starting to goal.")
+
+        cache = ResultCache() if use_cache else None
+        key = result_key(maze, starting, goal, algorithm, mode)
+        cached = cache.lookup(key) if cache else None
+        statistics = None
+        if cached is not None:
+            path, exploration_steps, statistics = cached
+        else:
+            header = runner.exploration_header(algorithm)
+            if output_dir:
+                sink = CsvSink(os.path.join(output_dir, f"{name}.exploration.csv"), header)
+            else:
+                sink = NullSink(header)  # still counted, the extension scores need it
+            with sink:
+                path, exploration_steps = runner.shortest_path(maze, starting, goal, algorithm=algorithm, log_sink=sink)
+            result["log_rows_per_second"] = sink.stats()["rows_per_second"]
+            if cache:
+                cache.store(key, path, exploration_steps)
+        result["search_seconds"] = round(time.perf_counter() - read_done, 6)
+        result["cached"] = cached is not None
+        score = statistics["score"] if statistics else exploration_steps / 4 + len(path)
+
+        if output_dir:
+            statistics_file = os.path.join(output_dir, f"{name}.statistics.txt")
+            if mode == "base":
+                runner.write_statistics(maze_file, exploration_steps, len(path), path, output_file=statistics_file,
+                                        score=score)
+            else:
+                runner.write_statistics(maze_file, exploration_steps, len(path), output_file=statistics_file,
+                                        score=score)
+        result.update(ok=True, score=score,
+                      exploration_steps=exploration_steps, path_length=len(path))
+    except Exception as e:
+        result["error"] = str(e)
+    finally:
+        if cache:
+            cache.close()
+    result["total_seconds"] = round(time.perf_counter() - began, 6)
+    return result
+
+
+# solve_maze_file with the options first, so pool.map can hand it each maze and its output name
+def _solve_named(options: dict, maze_file: str, output_name: Optional[str]) -> dict:
+    return solve_maze_file(maze_file, output_name=output_name, **options)
+
+
+# solves every maze across a pool of worker processes and yields the results in input order, so a
+# result can wait on a slower maze ahead of it. chunksize mazes are handed to a worker at a time
+# to cut the messaging cost
+def solve_batch(maze_files: Iterable[str], workers: Optional[int] = None, chunksize: int = 8, **options):
+    maze_files = list(maze_files)
+    names = output_names(maze_files) if options.get("output_dir") else [None] * len(maze_files)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(partial(_solve_named, options), maze_files, names, chunksize=chunksize)
+
+
+# command line for batch runs: python maze_runner.py batch <directory or glob> [options]
+def main(argv: List[str], mode: str = "base"):
+    parser = argparse.ArgumentParser(prog="batch", description="Solve many mazes across a process pool")
+    parser.add_argument("target", help='A directory of .mz / .mzb files or a glob pattern, e.g. "mazes/**/*.mz"')
+    parser.add_argument("--starting", help='The starting position for every maze, e.g., "1,1"', default=None)
+    parser.add_argument("--goal", help='The goal position for every maze, e.g., "4,5"', default=None)
+    parser.add_argument("--algorithm", help="Search algorithm to use", choices=list(ENGINES), default="bfs")
+    parser.add_argument("--mode", help="Which runner's rules to solve with", choices=list(RUNNERS), default=mode)
+    parser.add_argument("--workers", help="Number of worker processes (default: one per cpu)", type=int, default=None)
+    parser.add_argument("--chunksize", help="Mazes handed to a worker at a time", type=int, default=8)
+    parser.add_argument("--output", help="JSONL file for the results (default: standard output)", default=None)
+    parser.add_argument("--output-dir", help="Directory for per-maze statistics and exploration logs", default=None)
+    parser.add_argument("--no-cache", help="Always search, don't read or write the result cache", action="store_true")
+    args = parser.parse_args(argv)
+
+    maze_files = find_mazes(args.target)
+    if not maze_files:
+        print(f"Error: no maze files found for {args.target}")
+        return 1
+    if args.output_dir:
+        try:
+            output_names(maze_files)  # two mazes that would share output files stop the run before it starts
+        except ValueError as e:
+            print("Error:", e)
+            return 1
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    starting = tuple(map(int, args.starting.split(','))) if args.starting else None
+    goal = tuple(map(int, args.goal.split(','))) if args.goal else None
+    out = open(args.output, "w") if args.output else sys.stdout
+    solved = 0
+    try:
+        for result in solve_batch(maze_files, args.workers, args.chunksize, mode=args.mode, algorithm=args.algorithm,
+                                  starting=starting, goal=goal, output_dir=args.output_dir,
+                                  use_cache=not args.no_cache):
+            out.write(json.dumps(result) + "\n")
+            out.flush()  # one line per maze as soon as it is done
+            solved += result["ok"]
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"Solved {solved} of {len(maze_files)} mazes", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,292 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import maze
+import maze_runner
+import maze_runner_extension
+import runner
+import runner_extension
+from maze_generator import maze_lines
+from mzb_format import mz_to_mzb
+from search import ENGINES
+
+# benchmarks for the readers, shortest_path, runner.explore and runner_extension.dfs_explore on
+# generated mazes of a few sizes and shapes. every case runs warmup times untimed, then repeats
+# timed runs (each on a freshly loaded maze so nothing cached from the run before is reused),
+# then once more under tracemalloc for the peak memory. results go to a JSON file, and a saved
+# earlier file can be given as a baseline: any case whose median time grew by more than the
+# threshold is reported as a regression and the exit code is 1.
+
+# rooms across and down for each size class, a maze of n rooms is (2n + 1) x (2n + 1) cells
+SIZES = {"small": 25, "medium": 150, "large": 600}
+
+
+# the .mz lines of each topology, all enclosed by walls with (1, 1) and the far corner open
+def open_lines(rooms: int, seed: int) -> Iterator[bytes]:
+    size = 2 * rooms + 1
+    yield b"#" * size
+    for _ in range(size - 2):
+        yield b"#" + b"." * (size - 2) + b"#"
+    yield b"#" * size
+
+
+def perfect_lines(rooms: int, seed: int) -> Iterator[bytes]:
+    return maze_lines(rooms, rooms, "backtracker", seed)
+
+
+# one corridor that snakes from side to side, every other row is a wall with a gap at one end
+def corridor_lines(rooms: int, seed: int) -> Iterator[bytes]:
+    size = 2 * rooms + 1
+    yield b"#" * size
+    for y in range(1, size - 1):
+        if y % 2:
+            yield b"#" + b"." * (size - 2) + b"#"
+        elif y % 4 == 2:
+            yield b"#" * (size - 2) + b".#"
+        else:
+            yield b"#." + b"#" * (size - 2)
+    yield b"#" * size
+
+
+# a braided maze where some walls have become spaces, only the extension reads these
+def irregular_lines(rooms: int, seed: int) -> Iterator[bytes]:
+    rng = random.Random(seed)
+    for y, line in enumerate(maze_lines(rooms, rooms, "eller", seed, braid_probability=0.5)):
+        if 0 < y < 2 * rooms:
+            line = bytearray(line)
+            for x in range(1, len(line) - 1):
+                if line[x] == ord("#") and rng.random() < 0.05:
+                    line[x] = ord(" ")
+        yield bytes(line)
+
+
+TOPOLOGIES = {"open": open_lines, "perfect": perfect_lines, "corridor": corridor_lines, "irregular": irregular_lines}
+
+
+# runs fn warmup + repeats times and returns its timings, the peak traced memory and the result
+# (or error) of the last run. setup makes fn's arguments before every run and isn't timed.
+def measure(setup: Callable[[], tuple], fn: Callable, warmup: int = 1, repeats: int = 5) -> dict:
+    if repeats < 1:
+        raise ValueError("At least one timed run is needed.")
+
+    def run_once():
+        arguments = setup()
+        gc.collect()
+        began = time.perf_counter()
+        try:
+            fn(*arguments)
+            outcome = "ok"
+        except Exception as e:  # a goal the wall follower can't reach still has a cost worth timing
+            outcome = f"{type(e).__name__}: {e}"
+        return time.perf_counter() - began, outcome
+
+    for _ in range(warmup):
+        run_once()
+    times = []
+    for _ in range(repeats):
+        seconds, outcome = run_once()
+        times.append(seconds)
+
+    arguments = setup()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn(*arguments)
+    except Exception:
+        pass
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {
+        "min": round(min(times), 6),
+        "median": round(statistics.median(times), 6),
+        "mean": round(statistics.mean(times), 6),
+        "repeats": repeats,
+        "peak_bytes": peak,
+        "outcome": outcome,
+    }
+
+
+# (name, setup, fn) for everything benchmarked on one maze file
+def cases(maze_file: str, topology: str, size: str, algorithms: List[str]) -> Iterator[Tuple[str, Callable, Callable]]:
+    strict = topology != "irregular"  # the base version only reads enclosed mazes of # and .
+    solver = maze_runner if strict else maze_runner_extension
+    grid = solver.maze_reader(maze_file, compact=True)
+    rows, cols = len(grid), len(grid[0])
+    start, goal = (1, 1), (rows - 2, cols - 2)
+    name = f"{topology}/{size}"
+
+    yield f"maze_reader/{name}", lambda: (maze_file,), solver.maze_reader
+    yield f"maze_reader_compact/{name}", lambda: (maze_file, True), solver.maze_reader
+    # the same maze as a .mzb file, which also brings its wall masks along
+    mzb_file = os.path.splitext(maze_file)[0] + ".mzb"
+    mz_to_mzb(maze_file, mzb_file)
+    yield f"maze_reader_mzb/{name}", lambda: (mzb_file, True), solver.maze_reader
+    for algorithm in algorithms:
+        yield (f"shortest_path[{algorithm}]/{name}", lambda: (solver.maze_reader(maze_file, compact=True),),
+               lambda m, a=algorithm: solver.shortest_path(m, start, goal, algorithm=a))
+    if strict:
+        yield f"load_maze/{name}", lambda: (maze_file,), maze.load_maze_from_file
+        yield f"load_maze_mzb/{name}", lambda: (mzb_file,), maze.load_maze_from_file
+        # the base runner is (x, y) with north as y + 1, the goal is the far corner
+        yield (f"explore/{name}", lambda: (runner.create_runner(1, 1, "N"), maze.load_maze_from_file(maze_file)),
+               lambda r, m: runner.explore(r, m, (cols - 2, rows - 2)))
+        yield (f"explore_fast/{name}", lambda: (runner.create_runner(1, 1, "N"), maze.load_maze_from_file(maze_file)),
+               lambda r, m: runner.explore(r, m, (cols - 2, rows - 2), fast=True))
+    yield (f"dfs_explore/{name}",
+           lambda: (runner_extension.create_runner(1, 1, "N"), maze_runner_extension.maze_reader(maze_file, compact=True)),
+           lambda r, m: runner_extension.dfs_explore(r, m, (cols - 2, rows - 2)))
+
+
+# engines that return exactly the path bfs does, the others only have to match its length
+EXACT_ENGINES = ("junction", "frontier")
+
+
+# solves one maze from a few starts with every engine and compares each with bfs. the extension's
+# irregular mazes also start from ' ' cells, which it accepts as starting points. besides the far
+# corner the goals include one no engine may reach: no goal at all, which defaults to the bottom
+# right wall cell, and on irregular mazes a ' ' cell. returns what didn't match
+def check_engines(maze_file: str, topology: str, seed: int, starts: int = 8) -> List[str]:
+    solver = maze_runner if topology != "irregular" else maze_runner_extension
+    grid = solver.maze_reader(maze_file, compact=True)
+    rows, cols = len(grid), len(grid[0])
+    rng = random.Random(seed)
+    cells = [(r, c) for r in range(rows) for c in range(cols) if grid[r][c] != ord("#")]
+    spaces = [cell for cell in cells if grid[cell[0]][cell[1]] == ord(" ")]
+    positions = [(1, 1)] + rng.sample(cells, min(starts, len(cells))) + rng.sample(spaces, min(starts, len(spaces)))
+    goals = [(rows - 2, cols - 2), None] + rng.sample(spaces, min(1, len(spaces)))
+
+    def solve(start, goal, algorithm):
+        try:
+            return solver.shortest_path(grid, start, goal, algorithm=algorithm)[0]
+        except ValueError as e:
+            return str(e)
+
+    problems = []
+    for goal in goals:
+        for start in positions:
+            expected = solve(start, goal, "bfs")
+            for algorithm in ENGINES:
+                path = solve(start, goal, algorithm)
+                same = path == expected if algorithm in EXACT_ENGINES or isinstance(expected, str) or isinstance(path, str) \
+                    else len(path) == len(expected)
+                if not same:
+                    problems.append(f"{algorithm} differs from bfs on {os.path.basename(maze_file)} from {start} to {goal}")
+    return problems
+
+
+# generates every maze into directory and runs all of its cases
+def run_benchmarks(sizes: List[str], topologies: List[str], algorithms: List[str], warmup: int, repeats: int,
+                   seed: int, directory: str, progress: bool = True, check: Optional[List[str]] = None) -> dict:
+    results = {}
+    for size in sizes:
+        for topology in topologies:
+            maze_file = os.path.join(directory, f"{topology}_{size}.mz")
+            with open(maze_file, "wb") as file:
+                for line in TOPOLOGIES[topology](SIZES[size], seed):
+                    file.write(line + b"\n")
+            if check is not None:
+                check.extend(check_engines(maze_file, topology, seed))
+            for name, setup, fn in cases(maze_file, topology, size, algorithms):
+                results[name] = measure(setup, fn, warmup, repeats)
+                if progress:
+                    print(f"{name:45} {results[name]['median']:>10.4f}s  {results[name]['peak_bytes'] / 1e6:>8.1f} MB",
+                          file=sys.stderr)
+    return results
+
+
+# cases whose median time grew by more than threshold (0.2 = 20%) over the baseline's,
+# as name -> (baseline median, new median)
+def regressions(results: dict, baseline: dict, threshold: float) -> Dict[str, Tuple[float, float]]:
+    slower = {}
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before and result["median"] > before["median"] * (1 + threshold):
+            slower[name] = (before["median"], result["median"])
+    return slower
+
+
+def environment() -> dict:
+    try:
+        import numpy
+        numpy_version = numpy.__version__
+    except ImportError:
+        numpy_version = None
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "system": platform.system(),
+        "numpy": numpy_version,
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+# command line: python benchmark.py --sizes small,medium --output bench.json --baseline saved.json
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the maze readers, solvers and runners")
+    parser.add_argument("--sizes", help=f"Comma separated size classes ({', '.join(SIZES)})", default="small,medium")
+    parser.add_argument("--topologies", help=f"Comma separated topologies ({', '.join(TOPOLOGIES)})",
+                        default=",".join(TOPOLOGIES))
+    parser.add_argument("--algorithms", help=f"Comma separated shortest_path algorithms ({', '.join(ENGINES)})",
+                        default="bfs")
+    parser.add_argument("--warmup", help="Untimed runs before timing", type=int, default=1)
+    parser.add_argument("--repeats", help="Timed runs per case", type=int, default=5)
+    parser.add_argument("--seed", help="Seed for the generated mazes", type=int, default=1)
+    parser.add_argument("--output", help="JSON file for the results", default="benchmark.json")
+    parser.add_argument("--baseline", help="Earlier results JSON to compare against", default=None)
+    parser.add_argument("--threshold", help="Allowed slowdown before a case counts as a regression (0.2 = 20%%)",
+                        type=float, default=0.2)
+    parser.add_argument("--check-engines", help="Also check every search engine against bfs on each maze "
+                                                "(the exit code is 1 if one differs)", action="store_true")
+    args = parser.parse_args(argv)
+    if args.repeats < 1:
+        parser.error("--repeats must be at least 1")
+    if args.warmup < 0:
+        parser.error("--warmup cannot be negative")
+
+    sizes, topologies, algorithms = args.sizes.split(","), args.topologies.split(","), args.algorithms.split(",")
+    for value, known, what in ((sizes, SIZES, "size"), (topologies, TOPOLOGIES, "topology"), (algorithms, ENGINES, "algorithm")):
+        unknown = [v for v in value if v not in known]
+        if unknown:
+            print(f"Error: unknown {what}: {', '.join(unknown)}")
+            return 2
+
+    problems = [] if args.check_engines else None
+    with tempfile.TemporaryDirectory() as directory:
+        results = run_benchmarks(sizes, topologies, algorithms, args.warmup, args.repeats, args.seed, directory,
+                                 check=problems)
+    report = {"environment": environment(), "seed": args.seed, "results": results}
+    with open(args.output, "w") as file:
+        json.dump(report, file, indent=2)
+    print(f"Wrote {len(results)} results to {args.output}")
+    if problems is not None:
+        for problem in problems:
+            print(f"MISMATCH {problem}")
+        if problems:
+            return 1
+        print("Every engine agrees with bfs")
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)["results"]
+        slower = regressions(results, baseline, args.threshold)
+        for name, (before, after) in sorted(slower.items()):
+            print(f"REGRESSION {name}: {before:.4f}s -> {after:.4f}s ({after / before - 1:+.0%})")
+        if slower:
+            return 1
+        print(f"No regressions over {args.threshold:.0%} against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+import re
+from array import array
+from typing import List, Optional, Tuple
+from grid import Grid, passable_mask
+
+Position = Tuple[int, int]
+
+# a run of open cells in the 1/0 open-cell mask
+_RUN = re.compile(rb"\x01+")
+
+
+# the connected component of every open cell, labelled in one pass over the maze. each row is
+# split into runs of open cells (found by a regex over the mask, not cell by cell), a run is
+# joined with every run of the row above it touches in a union-find over the runs, and at the
+# end every run is written into the labels array with one slice assignment. after that whether two
+# cells are connected is a comparison of two labels.
+# labels are 0 for closed cells and 1, 2, ... for the components, positions are (row, column).
+class ComponentIndex:
+    __slots__ = ("maze", "open_values", "rows", "cols", "labels", "sizes", "version")
+
+    def __init__(self, maze, open_values: bytes = b"."):
+        self.maze = maze
+        self.open_values = open_values
+        self.rows = len(maze)
+        self.cols = len(maze[0]) if self.rows else 0
+        self.version = maze.version if isinstance(maze, Grid) else 0
+        self.rebuild()
+
+    # an index around labels that were already computed (e.g. stored in a .mzb file), nothing is rebuilt
+    @classmethod
+    def from_labels(cls, maze, labels, sizes: List[int], open_values: bytes = b".") -> "ComponentIndex":
+        index = cls.__new__(cls)
+        index.maze = maze
+        index.open_values = open_values
+        index.rows = len(maze)
+        index.cols = len(maze[0]) if index.rows else 0
+        index.version = maze.version if isinstance(maze, Grid) else 0
+        index.labels = labels
+        index.sizes = sizes
+        return index
+
+    def rebuild(self):
+        rows, cols = self.rows, self.cols
+        mask = passable_mask(self.maze, self.open_values)
+        parent = []
+        spans = []  # flat (start, end) cell range of every run
+
+        def find(run):
+            while parent[run] != run:
+                parent[run] = parent[parent[run]]
+                run = parent[run]
+            return run
+
+        above = []  # (first column, last column + 1, run) for the row above
+        finditer = _RUN.finditer
+        for offset in range(0, rows * cols, cols):
+            current = []
+            i, count = 0, len(above)
+            for match in finditer(mask, offset, offset + cols):
+                run = len(parent)
+                parent.append(run)
+                span = match.span()
+                spans.append(span)
+                start, end = span[0] - offset, span[1] - offset
+                # runs above that share a column with this one, both lists are sorted by column
+                while i < count and above[i][1] <= start:
+                    i += 1
+                j = i
+                while j < count and above[j][0] < end:
+                    a, b = find(above[j][2]), find(run)
+                    if a != b:
+                        parent[b] = a
+                    j += 1
+                if j > i:
+                    i = j - 1  # the last run above may also touch the next run in this row
+                current.append((start, end, run))
+            above = current
+
+        labels = array("i", [0]) * (rows * cols)
+        numbers = {}
+        sizes = [0]
+        fills = {}  # label -> array("i", [label]) repeated, sliced to each run's length
+        for run, (start, end) in enumerate(spans):
+            root = find(run)
+            label = numbers.get(root)
+            if label is None:
+                label = numbers[root] = len(sizes)
+                sizes.append(0)
+                fills[label] = array("i", [label]) * cols
+            labels[start:end] = fills[label][:end - start]
+            sizes[label] += end - start
+        self.labels = labels
+        self.sizes = sizes  # cells in each component, sizes[0] is unused
+
+    # number of components
+    def count(self) -> int:
+        return len(self.sizes) - 1
+
+    # label of the component a cell is in, 0 for a closed or off-maze cell
+    def component(self, position: Position) -> int:
+        r, c = position
+        if not (0 <= r < self.rows and 0 <= c < self.cols):
+            return 0
+        return self.labels[r * self.cols + c]
+
+    # whether there is any route between two open cells
+    def connected(self, a: Position, b: Position) -> bool:
+        label = self.component(a)
+        return label != 0 and label == self.component(b)
+
+
+# the component index of a maze, for a Grid it is kept in grid.indexes and rebuilt only after the
+# grid changed, lists get a new one every time
+def component_index(maze, open_values: bytes = b".") -> ComponentIndex:
+    if not isinstance(maze, Grid):
+        return ComponentIndex(maze, open_values)
+    key = ("components", open_values)
+    index = maze.indexes.get(key)
+    if index is None:
+        index = maze.indexes[key] = ComponentIndex(maze, open_values)
+    elif index.version != maze.version:
+        index.rebuild()
+        index.version = maze.version
+    return index
+
+
+# the component index of a Grid only if it is already built and up to date (kept from an earlier
+# query, or stored in a .mzb file), else None. building one labels every cell of the maze, which
+# costs far more than a search that finds its goal nearby, so a search is never made to wait for it
+def built_component_index(maze, open_values: bytes = b".") -> Optional[ComponentIndex]:
+    if not isinstance(maze, Grid):
+        return None
+    index = maze.indexes.get(("components", open_values))
+    if index is None or index.version != maze.version:
+        return None
+    return index
+
+
+# whether starting and goal are connected, None when either of them isn't an open cell or, unless
+# build is set, when the maze has no component index built yet (see built_component_index)
+def reachable(maze, starting: Position, goal: Position, open_values: bytes = b".",
+              build: bool = False) -> Optional[bool]:
+    index = component_index(maze, open_values) if build else built_component_index(maze, open_values)
+    if index is None or not index.component(starting) or not index.component(goal):
+        return None
+    return index.connected(starting, goal)
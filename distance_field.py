@@ -0,0 +1,128 @@
+from array import array
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+from grid import Grid, passable_mask
+from search import MOVES
+
+Position = Tuple[int, int]
+
+
+# distance from every cell to one goal, found with a single breadth first search backwards
+# from the goal and kept as one int per cell (-1 = can't reach the goal). after that the
+# shortest path from any start is read off by walking downhill, and an unreachable start is
+# answered by one lookup. positions are (row, column) like shortest_path in maze_runner.py.
+class DistanceField:
+    __slots__ = ("goal", "rows", "cols", "distances", "exploration_steps")
+
+    def __init__(self, open_cells, rows: int, cols: int, goal: Position):
+        self.goal = goal
+        self.rows = rows
+        self.cols = cols
+        self.distances = array("i", [-1]) * (rows * cols)
+        self.exploration_steps = 0  # cells taken off the queue while building the field
+        self._fill(open_cells)
+
+    def _fill(self, open_cells):
+        rows, cols, distances = self.rows, self.cols, self.distances
+        target = self.goal[0] * cols + self.goal[1]
+        distances[target] = 0
+        queue = deque([target])
+        while queue:
+            current = queue.popleft()
+            self.exploration_steps += 1
+            r, c = divmod(current, cols)
+            step = distances[current] + 1
+            for dr, dc, _ in MOVES:
+                if 0 <= r + dr < rows and 0 <= c + dc < cols:
+                    neighbor = current + dr * cols + dc
+                    if open_cells[neighbor] and distances[neighbor] == -1:
+                        distances[neighbor] = step
+                        queue.append(neighbor)
+
+    # number of steps from starting to the goal, -1 when the goal can't be reached
+    def distance(self, starting: Position) -> int:
+        return self.distances[starting[0] * self.cols + starting[1]]
+
+    # shortest path from starting to the goal, None when there isn't one.
+    # at each cell it takes the first move (in the Up, Down, Left, Right order the bfs uses) that
+    # goes one step downhill, which gives exactly the path the bfs in shortest_path would return
+    def path(self, starting: Position) -> Optional[List[Position]]:
+        rows, cols, distances = self.rows, self.cols, self.distances
+        current = starting[0] * cols + starting[1]
+        remaining = distances[current]
+        if remaining == -1:
+            return None
+        path = [starting]
+        while remaining:
+            r, c = divmod(current, cols)
+            remaining -= 1
+            for dr, dc, _ in MOVES:
+                if 0 <= r + dr < rows and 0 <= c + dc < cols and distances[current + dr * cols + dc] == remaining:
+                    current += dr * cols + dc
+                    path.append((r + dr, c + dc))
+                    break
+        return path
+
+
+# keeps one distance field per goal for a maze, so repeated queries against the same goal cost
+# O(path length) instead of a new search. a Grid is checked for changes on every query (its
+# version goes up when cells are written through set() / touch() or the add wall functions) and
+# the fields are thrown away when it changed, a 2d list maze needs invalidate() after edits.
+class DistanceFieldCache:
+    __slots__ = ("maze", "open_values", "fields", "version", "_open_cells")
+
+    def __init__(self, maze, open_values: bytes = b"."):
+        self.maze = maze
+        self.open_values = open_values
+        self.fields: Dict[Position, DistanceField] = {}
+        self.version = -1
+        self._open_cells = None
+
+    # drops every field, call after changing a 2d list maze
+    def invalidate(self):
+        self.fields.clear()
+        self._open_cells = None
+        self.version = -1
+
+    def _check(self):
+        if isinstance(self.maze, Grid) and self.version != self.maze.version:
+            self.invalidate()
+            self.version = self.maze.version
+        if self._open_cells is None:
+            self._open_cells = passable_mask(self.maze, self.open_values)
+
+    # returns the field for goal, building it the first time
+    def field(self, goal: Position) -> DistanceField:
+        self._check()
+        field = self.fields.get(goal)
+        if field is None:
+            rows, cols = len(self.maze), len(self.maze[0])
+            if not (0 <= goal[0] < rows and 0 <= goal[1] < cols) or not self._open_cells[goal[0] * cols + goal[1]]:
+                raise ValueError(f"Invalid goal position: {goal}")
+            field = self.fields[goal] = DistanceField(self._open_cells, rows, cols, goal)
+        return field
+
+    # same result as shortest_path(maze, starting, goal) with the bfs engine, the exploration steps
+    # are the cells the field cost to build when this query built it and 0 when it was reused
+    def shortest_path(self, starting: Position, goal: Position) -> Tuple[List[Position], int]:
+        self._check()
+        rows, cols = len(self.maze), len(self.maze[0])
+        if not (0 <= starting[0] < rows and 0 <= starting[1] < cols) or not self._open_cells[starting[0] * cols + starting[1]]:
+            raise ValueError(f"Invalid starting position: {starting}")
+        built = goal not in self.fields
+        field = self.field(goal)
+        path = field.path(starting)
+        if path is None:
+            raise ValueError("No path found from starting to goal.")
+        return path, field.exploration_steps if built else 0
+
+
+# the cache kept with a Grid (in grid.indexes) so every caller shares it, 2d lists get a new one
+def distance_fields(maze, open_values: bytes = b".") -> DistanceFieldCache:
+    if not isinstance(maze, Grid):
+        return DistanceFieldCache(maze, open_values)
+    key = ("distance_fields", open_values)
+    cache = maze.indexes.get(key)
+    if cache is None:
+        cache = maze.indexes[key] = DistanceFieldCache(maze, open_values)
+    return cache
@@ -0,0 +1,166 @@
+import csv
+import os
+import struct
+import time
+from typing import Iterator, List, Sequence
+
+# where shortest_path sends exploration log rows. a sink gets one row per discovered cell while
+# the search runs and writes it out through a buffered file straight away, so the memory used
+# for logging stays the size of the buffer no matter how big the maze is.
+# every sink counts its rows and the time it was open, stats() reports the throughput.
+# a file sink writes to <path>.part and only puts it in place of the log at <path> on close(),
+# discard() (or leaving a with block on an exception) throws it away and keeps the old log, so a
+# search that fails leaves the last exploration log alone like it always did.
+
+BUFFER_SIZE = 1 << 20
+
+
+class LogSink:
+    def __init__(self, header: Sequence[str]):
+        self.header = list(header)
+        self.rows = 0
+        self.bytes_written = 0
+        self.opened = time.perf_counter()
+        self.closed = None
+
+    def write(self, row: Sequence):
+        self.rows += 1
+
+    def close(self):
+        if self.closed is None:
+            self.closed = time.perf_counter()
+
+    # closes the sink without keeping what was written to it
+    def discard(self):
+        self.close()
+
+    # rows written, seconds open and rows per second
+    def stats(self) -> dict:
+        seconds = (self.closed or time.perf_counter()) - self.opened
+        return {
+            "rows": self.rows,
+            "bytes": self.bytes_written,
+            "seconds": round(seconds, 6),
+            "rows_per_second": round(self.rows / seconds) if seconds > 0 else 0,
+        }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+
+# drops every row, only counts them (the search still runs with logging switched on,
+# which is what the extension runner needs to count its exploration steps)
+class NullSink(LogSink):
+    pass
+
+
+# a sink writing to a file, through <path>.part until it is closed
+class FileSink(LogSink):
+    def __init__(self, path: str, header: Sequence[str], mode: str, **options):
+        super().__init__(header)
+        self.path = path
+        self.file = open(path + '.part', mode=mode, buffering=BUFFER_SIZE, **options)
+
+    def close(self):
+        if self.closed is None:
+            self.bytes_written = self.file.tell()
+            self.file.close()
+            os.replace(self.path + '.part', self.path)
+        super().close()
+
+    def discard(self):
+        if self.closed is None:
+            self.file.close()
+            os.remove(self.path + '.part')
+        super().close()
+
+
+# the exploration.csv format shortest_path has always written, a header line then one line per row
+class CsvSink(FileSink):
+    def __init__(self, path: str, header: Sequence[str]):
+        super().__init__(path, header, 'w', newline='')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(self.header)
+
+    def write(self, row: Sequence):
+        self.rows += 1
+        self.writer.writerow(row)
+
+
+# struct format for each column a log can have, text columns are always a single character
+COLUMN_FORMATS = {
+    'Step': 'Q',
+    'x-coordinate': 'i',
+    'y-coordinate': 'i',
+    'Action': 'c',
+    'Side': 'c',
+}
+BINARY_MAGIC = b"MZLOG1"
+
+
+# fixed width binary records, e.g. 17 bytes per row for the base runner's 4 columns instead of
+# a line of text. the file starts with MZLOG1, a 2 byte length and the comma separated header,
+# read_binary_log turns it back into rows.
+class BinarySink(FileSink):
+    def __init__(self, path: str, header: Sequence[str]):
+        super().__init__(path, header, 'wb')
+        self.record = struct.Struct('<' + ''.join(COLUMN_FORMATS[name] for name in self.header))
+        self.text_columns = [i for i, name in enumerate(self.header) if COLUMN_FORMATS[name] == 'c']
+        names = ','.join(self.header).encode()
+        self.file.write(BINARY_MAGIC + struct.pack('<H', len(names)) + names)
+
+    def write(self, row: Sequence):
+        self.rows += 1
+        if self.text_columns:
+            row = list(row)
+            for i in self.text_columns:
+                row[i] = row[i].encode()
+        self.file.write(self.record.pack(*row))
+
+
+# reads the rows of a BinarySink file back, text columns come back as one character strings
+def read_binary_log(path: str) -> Iterator[List]:
+    with open(path, 'rb') as file:
+        if file.read(len(BINARY_MAGIC)) != BINARY_MAGIC:
+            raise ValueError(f"Not a binary exploration log: {path}")
+        (length,) = struct.unpack('<H', file.read(2))
+        header = file.read(length).decode().split(',')
+        record = struct.Struct('<' + ''.join(COLUMN_FORMATS[name] for name in header))
+        text_columns = [i for i, name in enumerate(header) if COLUMN_FORMATS[name] == 'c']
+        while True:
+            chunk = file.read(record.size * 4096)
+            if not chunk:
+                break
+            for values in record.iter_unpack(chunk):
+                row = list(values)
+                for i in text_columns:
+                    row[i] = row[i].decode()
+                yield row
+
+
+# the sinks that can be picked by name, e.g. on the command line
+SINKS = {
+    "csv": CsvSink,
+    "binary": BinarySink,
+    "none": lambda path, header: NullSink(header),
+}
+
+# default file name for each format
+LOG_FILES = {
+    "csv": "exploration.csv",
+    "binary": "exploration.bin",
+    "none": None,
+}
+
+
+# opens the named sink for a header
+def open_sink(log_format: str, header: Sequence[str], path: str = None) -> LogSink:
+    if log_format not in SINKS:
+        raise ValueError(f"Unknown exploration log format: {log_format}. Use one of: {', '.join(SINKS)}")
+    return SINKS[log_format](path or LOG_FILES[log_format], header)
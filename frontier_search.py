@@ -0,0 +1,115 @@
+from typing import List, Optional, Tuple
+from search import MOVES, Discover, SearchResult, _build_path, bfs, trace_moves
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, without it the engine is the plain bfs
+    np = None
+
+Position = Tuple[int, int]
+
+# frontiers smaller than this are expanded cell by cell, the array set up would cost more than it saves
+SMALL_FRONTIER = 256
+
+
+# one bool array per move (Up, Down, Left, Right), True where a cell has an open neighbour that way
+def _neighbor_planes(open_cells, rows: int, cols: int):
+    passable = np.frombuffer(bytes(open_cells), dtype=np.uint8).astype(bool).reshape(rows, cols)
+    planes = [np.zeros((rows, cols), dtype=bool) for _ in range(4)]
+    planes[0][1:] = passable[:-1]
+    planes[1][:-1] = passable[1:]
+    planes[2][:, 1:] = passable[:, :-1]
+    planes[3][:, :-1] = passable[:, 1:]
+    return [plane.ravel() for plane in planes]
+
+
+# breadth first search one whole level at a time. every cell of a frontier is turned into its four
+# neighbours at once with array arithmetic (bounds, open and seen checks are masks), and the
+# neighbours are kept in the order the queue of the plain bfs would have found them: by the
+# frontier position of the cell that found them, then Up, Down, Left, Right. a cell found more
+# than once in a level keeps its first finder. so the move plane (one byte per cell, as in bfs),
+# the path, the exploration steps and the exploration log all come out exactly as bfs gives them.
+# the level the goal is in is only expanded up to the goal, like bfs stops when it takes the goal
+# off the queue. without numpy it simply runs bfs.
+# it only pays off when the levels are wide. on open grids of 10^7 cells it is about 8x faster
+# than bfs, not 10x. perfect mazes have frontiers of a few cells, almost every level goes through
+# the cell by cell path below and it is no faster than bfs (1.64s against 1.79s at 10^7 cells).
+def frontier_bfs(open_cells, rows: int, cols: int, starting: Position, goal: Position, on_discover: Discover = None,
+                 stats: Optional[dict] = None) -> SearchResult:
+    if np is None:
+        return bfs(open_cells, rows, cols, starting, goal, on_discover, stats)
+    size = rows * cols
+    start, target = starting[0] * cols + starting[1], goal[0] * cols + goal[1]
+    came_from = bytearray(size)  # 0 = not seen, 1-4 = move that reached the cell, 5 = start
+    came_from[start] = 5
+    seen = np.frombuffer(came_from, dtype=np.uint8)  # the same bytes, for the array levels
+    planes = _neighbor_planes(open_cells, rows, cols)
+    # lowest finder number (frontier position * 4 + move) of a cell while a level is built
+    claim_type = np.int32 if 4 * size < 2 ** 31 else np.int64
+    claim = np.full(size, np.iinfo(claim_type).max, dtype=claim_type)
+    frontier: List[int] = [start]
+    expanded = discovered = 0
+    peak = 1
+
+    while len(frontier):
+        peak = max(peak, len(frontier))
+        if came_from[target]:  # the goal is in this level, expand only what bfs takes off before it
+            position = frontier.index(target) if isinstance(frontier, list) else int(np.flatnonzero(frontier == target)[0])
+            discovered += _expand(frontier[:position], came_from, seen, open_cells, planes, claim, cols, on_discover,
+                                  expanded)[1][1]
+            expanded += position + 1
+            break
+        frontier, found = _expand(frontier, came_from, seen, open_cells, planes, claim, cols, on_discover, expanded)
+        expanded += found[0]
+        discovered += found[1]
+
+    if stats is not None:
+        stats.update(peak_frontier=peak, came_from_entries=size - came_from.count(0))
+    if not came_from[target]:
+        return None, expanded, discovered
+    return _build_path(stats, trace_moves, came_from, cols, target), expanded, discovered
+
+
+# the next level of a frontier, marking the move that found each new cell in came_from.
+# returns it with (cells expanded, cells discovered)
+def _expand(frontier, came_from: bytearray, seen, open_cells, planes, claim, cols: int, on_discover: Discover,
+            expanded: int):
+    if len(frontier) < SMALL_FRONTIER:
+        frontier = frontier if isinstance(frontier, list) else frontier.tolist()
+        return _expand_cells(frontier, came_from, open_cells, len(seen) // cols, cols, on_discover, expanded)
+    cells = np.asarray(frontier, dtype=np.int64)
+    unclaimed = np.iinfo(claim.dtype).max
+    # one row per frontier cell, one column per move in the order bfs tries them, True where that
+    # neighbour is open, then numbered row by row: frontier position * 4 + move
+    order = np.flatnonzero(np.stack([plane[cells] for plane in planes], axis=1))
+    neighbors = cells[order >> 2] + np.array((-cols, cols, -1, 1))[order & 3]
+    new = seen[neighbors] == 0
+    order, neighbors = order[new], neighbors[new]
+    # a cell found more than once in this level belongs to its lowest number, the first finder
+    number = order.astype(claim.dtype)
+    np.minimum.at(claim, neighbors, number)
+    first = claim[neighbors] == number
+    claim[neighbors] = unclaimed
+    order, neighbors = order[first], neighbors[first]
+    seen[neighbors] = (order & 3) + 1
+    if on_discover is not None:
+        for number, cell in zip(order.tolist(), neighbors.tolist()):
+            on_discover(expanded + (number >> 2) + 1, cell // cols, cell % cols, MOVES[number & 3][2])
+    return neighbors, (len(frontier), len(neighbors))
+
+
+# the same as _expand one cell at a time, for small frontiers
+def _expand_cells(frontier: List[int], came_from: bytearray, open_cells, rows: int, cols: int, on_discover: Discover,
+                  expanded: int):
+    next_frontier = []
+    for count, current in enumerate(frontier, expanded + 1):
+        r, c = divmod(current, cols)
+        for move, (dr, dc, action) in enumerate(MOVES, 1):
+            if 0 <= r + dr < rows and 0 <= c + dc < cols:
+                neighbor = current + dr * cols + dc
+                if open_cells[neighbor] and not came_from[neighbor]:
+                    came_from[neighbor] = move
+                    next_frontier.append(neighbor)
+                    if on_discover is not None:
+                        on_discover(count, r + dr, c + dc, action)
+    return next_frontier, (len(frontier), len(next_frontier))
@@ -0,0 +1,131 @@
+from typing import Iterator, List, Sequence, Union
+
+# a maze grid stored as one contiguous bytearray, row after row (row-stride indexing).
+# a 2d list of python ints costs a pointer plus an int object per cell, this costs one byte,
+# so big mazes use roughly an order of magnitude less memory and load a lot faster.
+# maze[y][x] still reads like a 2d list: indexing a grid gives a read-only memoryview of that
+# row, straight over the shared buffer. writes go through set(), or into cells followed by
+# touch(), so the grid always knows it changed: version goes up on every write, and indexes
+# holds data derived from the cells (wall masks etc), each one remembering the version it was
+# built for. a write through a row (maze[y][x] = ...) raises TypeError instead of leaving the
+# wall masks and the other indexes silently stale.
+class Grid:
+    __slots__ = ("width", "height", "cells", "version", "indexes", "_view")
+
+    def __init__(self, width: int, height: int, fill: int = 0, cells: Union[bytes, bytearray, None] = None):
+        if width < 0 or height < 0:
+            raise ValueError("Grid dimensions cannot be negative.")
+        if cells is None:
+            cells = bytearray([fill]) * (width * height)
+        elif len(cells) != width * height:
+            raise ValueError("Cell buffer does not match grid dimensions.")
+        self.width = width
+        self.height = height
+        self.cells = bytearray(cells) if not isinstance(cells, bytearray) else cells
+        self.version = 0
+        self.indexes = {}
+        self._view = memoryview(self.cells).toreadonly()
+
+    # builds a grid from rows of ints or strings (a string row is stored as its ascii bytes),
+    # short rows are padded with the pad value so the grid is always rectangular
+    @classmethod
+    def from_rows(cls, rows: Sequence[Sequence], pad: int = 1) -> "Grid":
+        width = max((len(row) for row in rows), default=0)
+        cells = bytearray()
+        for row in rows:
+            if isinstance(row, str):
+                data = row.encode("ascii")
+            elif isinstance(row, (bytes, bytearray, memoryview)):
+                data = bytes(row)
+            elif row and isinstance(row[0], str):  # list of single characters
+                data = "".join(row).encode("ascii")
+            else:
+                data = bytes(row)
+            cells += data
+            if len(data) < width:
+                cells += bytes([pad]) * (width - len(data))
+        return cls(width, len(rows), cells=cells)
+
+    # number of rows, same as len() of a 2d list
+    def __len__(self) -> int:
+        return self.height
+
+    # maze[y] returns a read-only view of row y, negative rows count from the bottom like lists
+    def __getitem__(self, y: int) -> memoryview:
+        if y < 0:
+            y += self.height
+        if not 0 <= y < self.height:
+            raise IndexError("Grid row out of range")
+        start = y * self.width
+        return self._view[start:start + self.width]
+
+    def __iter__(self) -> Iterator[memoryview]:
+        for y in range(self.height):
+            yield self[y]
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, Grid):
+            return self.width == other.width and self.height == other.height and self.cells == other.cells
+        if isinstance(other, list):
+            return self.to_rows() == other
+        return NotImplemented
+
+    __hash__ = None  # grids are mutable
+
+    # pickle and deepcopy keep the size and the cells, like they did for the 2d lists. the row view
+    # can't be pickled and the indexes are derived data, the copy builds its own when it needs them
+    def __reduce__(self):
+        return Grid, (self.width, self.height, 0, self.cells)
+
+    def __repr__(self) -> str:
+        return f"Grid(width={self.width}, height={self.height})"
+
+    # reads the cell at column x, row y
+    def get(self, x: int, y: int) -> int:
+        return self.cells[y * self.width + x]
+
+    # writes the cell at column x, row y
+    def set(self, x: int, y: int, value: int):
+        self.cells[y * self.width + x] = value
+        self.touch((x, y))
+
+    # call after writing cells directly (maze.cells[...] = ...), with the (x, y) cells that changed.
+    # indexes that can patch themselves (they have an update method) are fixed up for just those
+    # cells, the others are left with an old version and get rebuilt the next time they are used.
+    def touch(self, *changed):
+        old = self.version
+        self.version += 1
+        for index in self.indexes.values():
+            if changed and index.version == old and hasattr(index, "update"):
+                index.update(changed)
+                index.version = self.version
+
+    # copies the grid out as a 2d list of ints, for callers that really need lists
+    def to_rows(self) -> List[List[int]]:
+        width = self.width
+        return [list(self.cells[y * width:(y + 1) * width]) for y in range(self.height)]
+
+    def copy(self) -> "Grid":
+        return Grid(self.width, self.height, cells=bytearray(self.cells))
+
+
+# type used by functions that accept either the old 2d list or a grid
+Maze = Union[Grid, List[List[int]]]
+
+
+# returns the cells of any maze as one row-major bytes-like object, a grid hands back its buffer
+# and a 2d list of characters or ints is joined once
+def cell_bytes(maze) -> Union[bytes, bytearray]:
+    if isinstance(maze, Grid):
+        return maze.cells
+    if maze and maze[0] and isinstance(maze[0][0], str):
+        return "".join(map("".join, maze)).encode("ascii", "replace")
+    return bytes(cell for row in maze for cell in row)
+
+
+# returns a flat bytearray with 1 for every cell whose value is in open_values and 0 otherwise,
+# e.g. b"." for character mazes or b"\x00" for the 0/1 mazes from maze.py
+def passable_mask(maze, open_values: bytes = b".") -> bytearray:
+    table = bytes(1 if i in open_values else 0 for i in range(256))
+    mask = cell_bytes(maze).translate(table)
+    return mask if isinstance(mask, bytearray) else bytearray(mask)
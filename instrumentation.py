@@ -0,0 +1,88 @@
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from typing import Optional
+
+# opt-in measurements for one solve. maze_reader, shortest_path and dfs_explore take an
+# instrumentation=None argument, given an Instrumentation they time their phases and record what
+# the search did (nodes expanded, peak frontier / stack size, parent entries kept, ...), without
+# one they skip it all: no timers, no counters, the searches run exactly as before.
+# trace_allocations=True also records the peak bytes allocated in every phase with tracemalloc,
+# which slows python down a lot, so it is off unless asked for.
+
+INSTRUMENTATION_FILE = "instrumentation.json"
+
+
+class Instrumentation:
+    def __init__(self, trace_allocations: bool = False):
+        self.trace_allocations = trace_allocations
+        self.phases = {}  # phase name -> seconds, added up when a phase runs more than once
+        self.counters = {}  # counter name -> value
+        self.allocations = {}  # phase name -> peak bytes allocated while it ran
+
+    # times the code inside a with block as the named phase
+    @contextmanager
+    def phase(self, name: str):
+        started_tracing = self.trace_allocations and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        if self.trace_allocations:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+        began = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.add_time(name, time.perf_counter() - began)
+            if self.trace_allocations:
+                peak = tracemalloc.get_traced_memory()[1] - before
+                self.allocations[name] = max(self.allocations.get(name, 0), peak)
+            if started_tracing:
+                tracemalloc.stop()
+
+    def add_time(self, name: str, seconds: float):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def count(self, name: str, value: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def record(self, name: str, value):
+        self.counters[name] = value
+
+    # keeps the largest value seen, e.g. the peak frontier over several searches
+    def maximum(self, name: str, value):
+        self.counters[name] = max(self.counters.get(name, value), value)
+
+    def to_dict(self) -> dict:
+        result = {
+            "phases": {name: round(seconds, 6) for name, seconds in self.phases.items()},
+            "counters": dict(self.counters),
+        }
+        if self.trace_allocations:
+            result["allocations"] = dict(self.allocations)
+        return result
+
+    # writes the measurements as JSON, by default instrumentation.json next to statistics.txt
+    def write(self, output_file: str = INSTRUMENTATION_FILE):
+        with open(output_file, "w") as file:
+            json.dump(self.to_dict(), file, indent=2)
+            file.write("\n")
+
+
+# instrumentation.phase(name), or a with block that does nothing when instrumentation is None
+def phase(instrumentation: Optional[Instrumentation], name: str):
+    return nullcontext() if instrumentation is None else instrumentation.phase(name)
+
+
+# records what a search engine reported (see the stats argument in search.py), the time spent
+# rebuilding the path is moved out of the search phase into a path phase of its own
+def record_search(instrumentation: Instrumentation, stats: dict, expanded: int, discovered: int, path):
+    path_seconds = stats.pop("path_seconds", 0.0)
+    instrumentation.add_time("search", -path_seconds)
+    instrumentation.add_time("path", path_seconds)
+    instrumentation.count("nodes_expanded", expanded)
+    instrumentation.count("nodes_discovered", discovered)
+    instrumentation.maximum("peak_frontier", stats.get("peak_frontier", 0))
+    instrumentation.maximum("came_from_entries", stats.get("came_from_entries", 0))
+    instrumentation.record("path_length", len(path) if path else 0)
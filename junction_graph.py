@@ -0,0 +1,286 @@
+from array import array
+from heapq import heappush, heappop
+from typing import Dict, List, Optional, Tuple
+from search import MOVES, Discover, SearchResult, _build_path
+
+Position = Tuple[int, int]
+
+INFINITY = float("inf")
+
+# the move back the way a move came: Up <-> Down, Left <-> Right
+REVERSE = (1, 0, 3, 2)
+
+
+# the maze with its corridors collapsed: nodes are the open cells that don't have exactly two open
+# neighbours (junctions, dead ends, lone cells) and every corridor between two nodes becomes one
+# weighted edge, so a search only has to look at the nodes. every corridor cell remembers which
+# corridor it is in and how far along, which is all it takes to know its distance again.
+# prune_dead_ends=True also marks the branches that only lead to dead ends (found by peeling off
+# nodes with a single corridor until none are left), searches skip those unless the start or the
+# goal is in one. positions are (row, column) like shortest_path in maze_runner.py.
+class JunctionGraph:
+    __slots__ = ("rows", "cols", "open_cells", "is_node", "corridor", "offset", "ends", "lengths",
+                 "exits", "edges", "pruned", "towards_core")
+
+    def __init__(self, open_cells, rows: int, cols: int, prune_dead_ends: bool = True):
+        self.rows, self.cols = rows, cols
+        self.open_cells = open_cells
+        self.corridor = array("i", [-1]) * (rows * cols)  # corridor each corridor cell is in, -1 otherwise
+        self.offset = array("i", [0]) * (rows * cols)  # steps from the corridor's first end to the cell
+        self.ends: List[Tuple[int, int]] = []  # (first end, last end) node of every corridor
+        self.lengths = array("i")  # steps from one end of a corridor to the other
+        self.exits = bytearray()  # the move out of the first end and out of the last end, two per corridor
+        self.edges: Dict[int, List[int]] = {}  # node -> corridors leaving it, a loop is in it twice
+        self._build(self._neighbor_planes())
+        self.pruned = bytearray(rows * cols)
+        self.towards_core: Dict[int, int] = {}  # pruned node -> the node its branch hangs from
+        if prune_dead_ends:
+            self._prune()
+
+    # one plane per move (Up, Down, Left, Right) saying which cells have an open neighbour that way
+    def _neighbor_planes(self) -> Tuple[bytes, bytes, bytes, bytes]:
+        rows, cols, cells = self.rows, self.cols, bytes(self.open_cells)
+        if not cells:
+            return b"", b"", b"", b""
+        left = bytearray(b"\x00" + cells[:-1])
+        left[0::cols] = bytes(rows)
+        right = bytearray(cells[1:] + b"\x00")
+        right[cols - 1::cols] = bytes(rows)
+        return bytes(cols) + cells[:-cols], cells[cols:] + bytes(cols), bytes(left), bytes(right)
+
+    # open cells with a number of open neighbours other than two. the neighbour counts of all cells
+    # are added up at once as big integers, one byte per cell (a count never carries past 4)
+    def _find_nodes(self, planes) -> bytearray:
+        size = self.rows * self.cols
+        if size == 0:
+            return bytearray()
+        degrees = sum(int.from_bytes(plane, "big") for plane in planes).to_bytes(size, "big")
+        not_two = degrees.translate(bytes(0 if i == 2 else 1 for i in range(256)))
+        return bytearray((int.from_bytes(not_two, "big") & int.from_bytes(self.open_cells, "big")).to_bytes(size, "big"))
+
+    # walks every corridor once, from the node at one end to the node at the other
+    def _build(self, planes):
+        self.is_node = is_node = self._find_nodes(planes)
+        corridor, offset, edges = self.corridor, self.offset, self.edges
+        cols = self.cols
+        steps = (-cols, cols, -1, 1)
+        moves = tuple(zip(range(4), steps, planes))
+        walked = bytearray(self.rows * cols * 4)  # (cell, move) pairs that start a walked corridor
+        walked_cells = bytearray(self.rows * cols)
+
+        def walk_from(node: int):
+            edges.setdefault(node, [])
+            for first, step, plane in moves:
+                if not plane[node] or walked[node * 4 + first]:
+                    continue
+                number = len(self.lengths)
+                cell, move, length = node + step, first, 1
+                while not is_node[cell]:
+                    walked_cells[cell] = 1
+                    corridor[cell] = number
+                    offset[cell] = length
+                    back = REVERSE[move]
+                    # a corridor cell has two open neighbours, leave by the one it wasn't entered from
+                    for move, step, plane in moves:
+                        if plane[cell] and move != back:
+                            break
+                    cell += step
+                    length += 1
+                walked[node * 4 + first] = walked[cell * 4 + REVERSE[move]] = 1
+                self.ends.append((node, cell))
+                self.lengths.append(length)
+                self.exits += bytes((first, REVERSE[move]))
+                edges[node].append(number)
+                edges.setdefault(cell, []).append(number)
+
+        position = is_node.find(1)
+        while position != -1:
+            walk_from(position)
+            position = is_node.find(1, position + 1)
+        # a loop of corridor with no node anywhere on it gets one of its cells as a node
+        size = len(walked_cells)
+        reached = int.from_bytes(is_node, "big") | int.from_bytes(walked_cells, "big")
+        left_over = int.from_bytes(self.open_cells, "big") & ~reached
+        if left_over:
+            left_over = left_over.to_bytes(size, "big")
+            cell = left_over.find(1)
+            while cell != -1:
+                if not walked_cells[cell]:
+                    is_node[cell] = 1
+                    walk_from(cell)
+                cell = left_over.find(1, cell + 1)
+
+    # the node at the other end of a corridor
+    def _other_end(self, number: int, node: int) -> int:
+        first, last = self.ends[number]
+        return last if first == node else first
+
+    # takes dead ends off the graph one at a time, a node left with a single corridor becomes the
+    # next dead end, so whole branches of dead ends go. what is left is every loop and every route
+    # between them, the only places a shortest path between two of them can go
+    def _prune(self):
+        pruned, edges = self.pruned, self.edges
+        degree = {node: len(corridors) for node, corridors in edges.items()}
+        stack = [node for node, count in degree.items() if count <= 1]
+        while stack:
+            node = stack.pop()
+            if pruned[node]:
+                continue
+            pruned[node] = 1
+            for number in edges[node]:
+                other = self._other_end(number, node)
+                if other != node and not pruned[other]:
+                    self.towards_core[node] = other
+                    degree[other] -= 1
+                    if degree[other] == 1:
+                        stack.append(other)
+
+    # nodes a search is allowed into even though they were pruned: the branches holding the
+    # given cells, from each cell back to where its branch hangs off the rest of the maze
+    def _unpruned_for(self, *cells: int) -> set:
+        allowed = set()
+        for cell in cells:
+            number = self.corridor[cell]
+            for node in self.ends[number] if number != -1 else (cell,):
+                while node in self.towards_core and node not in allowed:
+                    allowed.add(node)
+                    node = self.towards_core[node]
+                allowed.add(node)
+        return allowed
+
+    # steps from any open cell to the target, from the node distances a search found.
+    # target_corridor and target_offset say where the target is when it is inside a corridor
+    def _cell_distance(self, cell: int, distances: dict, target: int, target_corridor: int, target_offset: int):
+        if cell == target:
+            return 0
+        number = self.corridor[cell]
+        if number == -1:
+            return distances.get(cell, INFINITY)
+        first, last = self.ends[number]
+        k = self.offset[cell]
+        best = min(distances.get(first, INFINITY) + k, distances.get(last, INFINITY) + self.lengths[number] - k)
+        if number == target_corridor:
+            best = min(best, abs(k - target_offset))
+        return best
+
+    # shortest path from starting to goal, the same engine shape as the ones in search.py.
+    # Dijkstra runs over the nodes from the goal until the start's distance is settled, then the
+    # path is walked from the start cell by cell, always taking the first move (Up, Down, Left,
+    # Right) that goes one step closer, which is exactly the path the plain bfs returns.
+    # on_discover gets the nodes as they are reached, with the move that left the node expanded
+    def search(self, starting: Position, goal: Position, on_discover: Discover = None,
+               stats: Optional[dict] = None) -> SearchResult:
+        rows, cols, ends, lengths, exits, edges = self.rows, self.cols, self.ends, self.lengths, self.exits, self.edges
+        start, target = starting[0] * cols + starting[1], goal[0] * cols + goal[1]
+        if start != target and not self.open_cells[target]:  # like bfs, a goal that isn't open is never reached
+            if stats is not None:
+                stats.update(peak_frontier=0, came_from_entries=0)
+            return None, 0, 0
+        target_corridor, target_offset = self.corridor[target], self.offset[target]
+        # a start that isn't an open cell itself (e.g. a ' ' cell the extension runner allows) is in
+        # no corridor, it joins the graph through its open neighbours, one step further away
+        if start == target or self.open_cells[start]:
+            entries, extra = [start], 0
+        else:
+            r, c = starting
+            entries = [start + dr * cols + dc for dr, dc, _ in MOVES
+                       if 0 <= r + dr < rows and 0 <= c + dc < cols and self.open_cells[start + dr * cols + dc]]
+            extra = 1
+        allowed = self._unpruned_for(*entries, target)
+        pruned = self.pruned
+
+        def start_distance() -> int:
+            return min((self._cell_distance(cell, distances, target, target_corridor, target_offset)
+                        for cell in entries), default=INFINITY) + extra
+
+        distances = {}
+        heap = []
+        if target_corridor == -1:
+            distances[target] = 0
+            heap.append((0, target))
+        else:
+            first, last = ends[target_corridor]
+            distances[first] = target_offset
+            distances[last] = min(distances.get(last, INFINITY), lengths[target_corridor] - target_offset)
+            heap = [(distance, node) for node, distance in distances.items()]
+            heap.sort()
+        expanded, discovered = 0, len(heap)
+        settled = set()
+        track, peak = stats is not None, len(heap)
+
+        estimate = start_distance()
+        while heap:
+            if track and len(heap) > peak:
+                peak = len(heap)
+            distance, node = heappop(heap)
+            if node in settled:
+                continue
+            if distance >= estimate:  # nothing closer than the start is left to settle
+                break
+            settled.add(node)
+            expanded += 1
+            for number in edges[node]:
+                first, last = ends[number]
+                other, exit_move = (last, exits[2 * number]) if first == node else (first, exits[2 * number + 1])
+                if other in settled or (pruned[other] and other not in allowed):
+                    continue
+                through = distance + lengths[number]
+                if through < distances.get(other, INFINITY):
+                    if other not in distances:
+                        discovered += 1
+                    distances[other] = through
+                    heappush(heap, (through, other))
+                    if on_discover is not None:
+                        r, c = divmod(other, cols)
+                        on_discover(expanded, r, c, MOVES[exit_move][2])
+            estimate = start_distance()
+
+        if track:
+            stats.update(peak_frontier=peak, came_from_entries=len(distances))
+        if estimate == INFINITY:
+            return None, expanded, discovered
+        return _build_path(stats, self._walk_down, start, estimate, distances, target), expanded, discovered
+
+    # the path from start to the target, one step closer every move (see search)
+    def _walk_down(self, start: int, remaining: int, distances: dict, target: int) -> List[Position]:
+        rows, cols, open_cells = self.rows, self.cols, self.open_cells
+        target_corridor, target_offset = self.corridor[target], self.offset[target]
+        current = start
+        path = [divmod(start, cols)]
+        while remaining:
+            r, c = divmod(current, cols)
+            remaining -= 1
+            for dr, dc, _ in MOVES:
+                if 0 <= r + dr < rows and 0 <= c + dc < cols:
+                    neighbor = current + dr * cols + dc
+                    if open_cells[neighbor] and \
+                            self._cell_distance(neighbor, distances, target, target_corridor, target_offset) == remaining:
+                        current = neighbor
+                        path.append((r + dr, c + dc))
+                        break
+        return path
+
+    # number of nodes and of corridors between them (pruned ones included)
+    def size(self) -> Tuple[int, int]:
+        return len(self.edges), len(self.lengths)
+
+
+# the graph of the last maze the junction engine searched, kept with a copy of that maze's
+# open-cell mask. asking again about the same maze (the usual case: many starts and goals in one
+# maze) skips building the graph, any change to the maze builds a new one
+_last_graph: Optional[Tuple[bytes, int, JunctionGraph]] = None
+
+
+def junction_graph(open_cells, rows: int, cols: int) -> JunctionGraph:
+    global _last_graph
+    if _last_graph is not None and _last_graph[1] == cols and _last_graph[0] == open_cells:
+        return _last_graph[2]
+    graph = JunctionGraph(open_cells, rows, cols)
+    _last_graph = (bytes(open_cells), cols, graph)
+    return graph
+
+
+# the search engine for shortest_path(algorithm="junction"), see search.py
+def junction(open_cells, rows: int, cols: int, starting: Position, goal: Position, on_discover: Discover = None,
+             stats: Optional[dict] = None) -> SearchResult:
+    return junction_graph(open_cells, rows, cols).search(starting, goal, on_discover, stats)
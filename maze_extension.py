@@ -1,37 +1,53 @@
-from typing import Tuple, List
+from typing import Tuple
+from grid import Grid, Maze
+from mzb_format import is_mzb, read_mzb
+from wall_index import wall_index
 # reason for choosing 2d list was because its straight forward to visulaize a maze grid with list,
 # list are more flexible like each cell can store a value indicating if it's a wall or a path and
 # additional information like visited status can also be stored, and it easy to access and update cell in list
+# mazes are now a Grid (grid.py) which still indexes like a 2d list (maze[y][x]) but keeps every
+# cell as one byte in a single buffer, all functions below also still accept plain 2d lists
+
+# the byte value for each character in a .mz file, 1 for '#' (wall) and 0 for everything else
+_WALL_TABLE = bytes(1 if i == ord('#') else 0 for i in range(256))
+
 
 # Create a maze with specified width and height, and external walls
-def create_maze(width: int = 5, height: int = 5) -> List[List[int]]:
-    maze = [[1] * width for _ in range(height)]  # Initialize maze with walls (1)
+def create_maze(width: int = 5, height: int = 5) -> Grid:
+    maze = Grid(width, height, fill=1)  # Initialize maze with walls (1)
     for y in range(1, height - 1):
-        for x in range(1, width - 1):
-            maze[y][x] = 0
+        maze.cells[y * width + 1:(y + 1) * width - 1] = bytes(max(width - 2, 0))
     return maze # returns generated maze
 
 
+# marks (x, y) as a wall, a Grid through set() so its cached wall masks are patched for just that cell
+def _set_wall(maze: Maze, x: int, y: int):
+    if isinstance(maze, Grid):
+        maze.set(x, y, 1)
+    else:
+        maze[y][x] = 1
+
+
 # Add a horizontal wall to the maze at the specified (x_coordinate)
-def add_horizontal_wall(maze: List[List[int]], x_coordinate: int, horizontal_line: int) -> List[List[int]]:
+def add_horizontal_wall(maze: Maze, x_coordinate: int, horizontal_line: int) -> Maze:
     if 0 <= horizontal_line < len(maze) and 0 <= x_coordinate < len(maze[0]): # Check if coordinates are within bounds
-        maze[horizontal_line][x_coordinate] = 1# will mark specified position as wall
+        _set_wall(maze, x_coordinate, horizontal_line)# will mark specified position as wall
         if horizontal_line + 1 < len(maze):
-            maze[horizontal_line + 1][x_coordinate] = 1
+            _set_wall(maze, x_coordinate, horizontal_line + 1)
     return maze # returns generated maze
 
 
 # Add a vertical wall to the maze at the specified (y_coordinate)
-def add_vertical_wall(maze: List[List[int]], y_coordinate: int, vertical_line: int) -> List[List[int]]:
+def add_vertical_wall(maze: Maze, y_coordinate: int, vertical_line: int) -> Maze:
     if 0 <= y_coordinate < len(maze) and 0 <= vertical_line < len(maze[0]):# Check if coordinates are within bounds
-        maze[y_coordinate][vertical_line] = 1# Set a vertical wall at the specified position
+        _set_wall(maze, vertical_line, y_coordinate)# Set a vertical wall at the specified position
         if vertical_line - 1 >= 0:
-            maze[y_coordinate][vertical_line - 1] = 1
+            _set_wall(maze, vertical_line - 1, y_coordinate)
     return maze # returns generated maze
 
 
 # Returns the dimensions (width, height) of the maze
-def get_dimensions(maze: List[List[int]]) -> Tuple[int, int]:
+def get_dimensions(maze: Maze) -> Tuple[int, int]:
     height = len(maze)
     width = len(maze[0]) if height > 0 else 0
     return width, height
@@ -41,10 +57,14 @@ def get_dimensions(maze: List[List[int]]) -> Tuple[int, int]:
 
 
 # this function will return wall status
-def get_walls(maze: List[List[int]], x: int, y: int) -> Tuple[bool, bool, bool, bool]:
+def get_walls(maze: Maze, x: int, y: int) -> Tuple[bool, bool, bool, bool]:
     width = len(maze[0])  # number of columns (width of the maze)
     height = len(maze)  # number of rows (height of the maze)
 
+    # a Grid keeps a precomputed wall mask per cell, so the answer is one lookup
+    if isinstance(maze, Grid) and 0 <= x < width and 0 <= y < height:
+        return wall_index(maze).walls(x, y)
+
     def is_wall(nx, ny): # this inner helper function checks if a given coordinate (nx, ny) represents a wall or is out of bounds.
         return not (0 <= nx < width and 0 <= ny < height) or maze[ny][nx] == 1
 
@@ -61,17 +81,17 @@ def get_walls(maze: List[List[int]], x: int, y: int) -> Tuple[bool, bool, bool,
 
 
 # Load a maze from a file, supporting non-regular structures
-def load_maze_from_file(filename: str) -> List[List[int]]:
-    maze = []
-    with open(filename, 'r') as file:
-        for line in file:
-            # Accept '#' as walls and '.' or spaces as paths
-            maze.append([1 if char == '#' else 0 for char in line.rstrip()])
-    return maze
+def load_maze_from_file(filename: str) -> Grid:
+    if is_mzb(filename):  # binary .mzb mazes load straight into 1 / 0 cells with their wall masks
+        return read_mzb(filename, binary=True)
+    with open(filename, 'rb') as file:
+        rows = [line.rstrip() for line in file]  # trailing whitespace is dropped, as it always was
+    # Accept '#' as walls and '.' or spaces as paths, rows shorter than the widest one are padded with walls
+    return Grid.from_rows([row.translate(_WALL_TABLE) for row in rows], pad=1)
 
 
 # Visualize the maze in a user-friendly format
-def display_maze(maze: List[List[int]]):
+def display_maze(maze: Maze):
     for row in maze:
         print(''.join('#' if cell == 1 else '.' for cell in row))
 
@@ -0,0 +1,221 @@
+import argparse
+import random
+import sys
+import time
+from array import array
+from typing import Iterator, Optional, Tuple
+from grid import Grid
+from mz_reader import parse_mz
+
+# random perfect mazes (exactly one route between any two rooms) written straight to .mz files.
+# a maze of width x height rooms is a (2 * width + 1) x (2 * height + 1) grid of characters: rooms
+# sit on odd rows and columns and the cells between them are '.' when the two rooms are joined.
+# every algorithm produces the maze as a stream of room rows, each an (east, south) pair of
+# bytearrays with 1 where the room is open to its right / lower neighbour, and the writer turns
+# one room row into two lines of text at a time, so no maze is ever held as lists of characters.
+# eller's algorithm only keeps the current row, so it can write mazes of any size in O(width) memory.
+
+RoomRow = Tuple[bytearray, bytearray]
+
+# 1 (open) -> '.', 0 (wall) -> '#'
+_OPEN_TABLE = b"#." + b"#" * 254
+
+
+# kruskal's algorithm: every inner wall in random order, removed when the rooms on its two sides
+# aren't joined yet. which rooms are joined is kept in an array backed union-find.
+def kruskal(width: int, height: int, rng: random.Random) -> Iterator[RoomRow]:
+    rooms = width * height
+    parent = array("i", range(rooms))
+
+    def find(room):
+        while parent[room] != room:
+            parent[room] = parent[parent[room]]  # path halving
+            room = parent[room]
+        return room
+
+    # wall 2 * room is the room's east wall, 2 * room + 1 its south wall
+    walls = array("i", [2 * room for room in range(rooms) if room % width != width - 1])
+    walls.extend(2 * room + 1 for room in range(rooms - width))
+    rng.shuffle(walls)
+    east, south = bytearray(rooms), bytearray(rooms)
+    joined = 0
+    for wall in walls:
+        room = wall >> 1
+        other = room + width if wall & 1 else room + 1
+        a, b = find(room), find(other)
+        if a != b:
+            parent[a] = b
+            (south if wall & 1 else east)[room] = 1
+            joined += 1
+            if joined == rooms - 1:  # a spanning tree, every other wall stays
+                break
+    for y in range(height):
+        yield east[y * width:(y + 1) * width], south[y * width:(y + 1) * width]
+
+
+# the recursive backtracker (a random depth first search) with an explicit stack, so it isn't
+# limited by python's recursion depth. gives long winding corridors.
+def backtracker(width: int, height: int, rng: random.Random) -> Iterator[RoomRow]:
+    rooms = width * height
+    east, south = bytearray(rooms), bytearray(rooms)
+    visited = bytearray(rooms)
+    start = rng.randrange(rooms)
+    visited[start] = 1
+    stack = array("i", [start])
+    while stack:
+        room = stack[-1]
+        x = room % width
+        options = []
+        if room >= width and not visited[room - width]:
+            options.append(room - width)
+        if room + width < rooms and not visited[room + width]:
+            options.append(room + width)
+        if x > 0 and not visited[room - 1]:
+            options.append(room - 1)
+        if x < width - 1 and not visited[room + 1]:
+            options.append(room + 1)
+        if not options:
+            stack.pop()
+            continue
+        other = rng.choice(options)
+        low, high = min(room, other), max(room, other)
+        (south if high - low == width else east)[low] = 1  # open the wall on the lower numbered side
+        visited[other] = 1
+        stack.append(other)
+    for y in range(height):
+        yield east[y * width:(y + 1) * width], south[y * width:(y + 1) * width]
+
+
+# eller's algorithm, one row at a time: rooms in the same set are already joined. in each row
+# neighbouring rooms of different sets are joined at random, then every set opens at least one
+# room downwards, and the rooms that didn't get a way down start new sets in the next row.
+# the last row joins everything that is still apart.
+def eller(width: int, height: int, rng: random.Random) -> Iterator[RoomRow]:
+    sets = list(range(width))
+    next_set = width
+    for y in range(height):
+        last = y == height - 1
+        parent = {}  # sets merged in this row
+
+        def find(label):
+            while label in parent:
+                label = parent[label]
+            return label
+
+        east = bytearray(width)
+        for x in range(width - 1):
+            a, b = find(sets[x]), find(sets[x + 1])
+            if a != b and (last or rng.random() < 0.5):
+                east[x] = 1
+                parent[b] = a
+        labels = [find(label) for label in sets]
+
+        south = bytearray(width)
+        if not last:
+            members = {}
+            for x, label in enumerate(labels):
+                members.setdefault(label, []).append(x)
+            for group in members.values():
+                down = [x for x in group if rng.random() < 0.5] or [rng.choice(group)]
+                for x in down:
+                    south[x] = 1
+            for x in range(width):
+                if not south[x]:
+                    labels[x] = next_set
+                    next_set += 1
+        sets = labels
+        yield east, south
+
+
+ALGORITHMS = {"kruskal": kruskal, "backtracker": backtracker, "eller": eller}
+
+
+# turns a perfect maze into a braided one: each dead end is opened into one more neighbour with
+# the given probability (1.0 removes every dead end), which adds loops. it works on the stream
+# of room rows, so only walls towards the same row or the row below are opened.
+def braid(rows: Iterator[RoomRow], width: int, height: int, probability: float, rng: random.Random) -> Iterator[RoomRow]:
+    north = bytearray(width)  # the south openings of the row above
+    for y, (east, south) in enumerate(rows):
+        for x in range(width):
+            west = east[x - 1] if x > 0 else 0
+            if north[x] + south[x] + east[x] + west != 1 or rng.random() >= probability:
+                continue
+            closed = []
+            if x > 0 and not west:
+                closed.append("west")
+            if x < width - 1 and not east[x]:
+                closed.append("east")
+            if y < height - 1 and not south[x]:
+                closed.append("south")
+            if closed:
+                side = rng.choice(closed)
+                if side == "west":
+                    east[x - 1] = 1
+                elif side == "east":
+                    east[x] = 1
+                else:
+                    south[x] = 1
+        north = south
+        yield east, south
+
+
+# the rows of the maze as .mz text lines (without line endings)
+def maze_lines(width: int, height: int, algorithm: str = "kruskal", seed: Optional[int] = None,
+               braid_probability: float = 0.0) -> Iterator[bytes]:
+    if width < 1 or height < 1:
+        raise ValueError("A maze needs at least one room in each direction.")
+    if algorithm not in ALGORITHMS:
+        raise ValueError(f"Unknown maze algorithm: {algorithm}. Use one of: {', '.join(ALGORITHMS)}")
+    rng = random.Random(seed)
+    rows = ALGORITHMS[algorithm](width, height, rng)
+    if braid_probability > 0:
+        rows = braid(rows, width, height, braid_probability, rng)
+
+    columns = 2 * width + 1
+    yield b"#" * columns
+    line = bytearray(columns)
+    for east, south in rows:
+        line[0::2] = b"#" * (width + 1)
+        line[1::2] = b"." * width
+        line[2::2] = east.translate(_OPEN_TABLE)
+        line[-1] = ord("#")
+        yield bytes(line)
+        line[1::2] = south.translate(_OPEN_TABLE)
+        line[2::2] = b"#" * width
+        yield bytes(line)
+
+
+# writes a generated maze to a .mz file one line at a time, returns its size as (columns, rows)
+def write_mz(maze_file: str, width: int, height: int, algorithm: str = "kruskal", seed: Optional[int] = None,
+             braid_probability: float = 0.0) -> Tuple[int, int]:
+    with open(maze_file, "wb", buffering=1 << 20) as file:
+        for line in maze_lines(width, height, algorithm, seed, braid_probability):
+            file.write(line)
+            file.write(b"\n")
+    return 2 * width + 1, 2 * height + 1
+
+
+# a generated maze as a Grid of ascii bytes, the same thing read_mz returns for the written file
+def generate_grid(width: int, height: int, algorithm: str = "kruskal", seed: Optional[int] = None,
+                  braid_probability: float = 0.0) -> Grid:
+    return parse_mz(b"\n".join(maze_lines(width, height, algorithm, seed, braid_probability)))
+
+
+# command line: python maze_generator.py big.mz --width 2000 --height 2000 --algorithm eller --seed 1
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate random .mz mazes")
+    parser.add_argument("output", help="The .mz file to write")
+    parser.add_argument("--width", help="Rooms across, the file is 2 * width + 1 characters wide", type=int, default=10)
+    parser.add_argument("--height", help="Rooms down, the file has 2 * height + 1 lines", type=int, default=10)
+    parser.add_argument("--algorithm", help="Generation algorithm", choices=list(ALGORITHMS), default="kruskal")
+    parser.add_argument("--seed", help="Random seed, the same seed always gives the same maze", type=int, default=None)
+    parser.add_argument("--braid", help="Chance (0 to 1) of opening each dead end to add loops", type=float, default=0.0)
+    args = parser.parse_args()
+
+    try:
+        began = time.perf_counter()
+        columns, rows = write_mz(args.output, args.width, args.height, args.algorithm, args.seed, args.braid)
+        print(f"Wrote {args.output}: {columns}x{rows} ({columns * rows} cells) in {time.perf_counter() - began:.2f}s")
+    except Exception as e:
+        print("Error:", e)
+        sys.exit(1)
@@ -1,91 +1,131 @@
 # imports which i feel i might use in some parts of code
 import argparse
-import csv
-from typing import List, Tuple, Optional, Deque
-from collections import deque
+import sys
+from typing import List, Tuple, Optional, Union
+from grid import Grid, passable_mask
+from mz_reader import read_mz
+from mzb_format import is_mzb, read_mzb
+from search import ENGINES, get_engine
+from result_cache import ResultCache, result_key
+from renderer import render, path_viewport
+from exploration_log import LogSink, CsvSink, SINKS, open_sink
+from instrumentation import Instrumentation, INSTRUMENTATION_FILE, phase, record_search
+from components import component_index, reachable
+from multi_search import nearest_path, voronoi, write_owner_map, read_positions
+from path_codec import CompactPath, write_cells
+
+# columns of the exploration log for a search, bidirectional search adds which side found the cell
+def exploration_header(algorithm: str = "bfs") -> List[str]:
+    header = ['Step', 'x-coordinate', 'y-coordinate', 'Action']  # CSV will have 4 columns
+    if algorithm == "bidirectional":
+        header.append('Side')  # plus S or G for the half of the search that found the cell
+    return header
+
 
 # finds shortest path to starting position to goal position and writes in exploration file
+# the log is streamed while searching, to log_file as csv or to log_sink (see exploration_log.py)
+# given an Instrumentation it also times the phases and records the search counters (see instrumentation.py)
+# algorithm picks the search: "bfs" (default), "astar", "jps" (for open grids where every step costs the same),
+# "bidirectional" (searches from both ends and meets in the middle), "junction" (searches only the
+# junctions and dead ends, with every corridor between them as one step, same path as bfs) or
+# "frontier" (bfs a whole level at a time with numpy, same path and exploration steps as bfs,
+# only faster on mazes with wide frontiers such as open grids, see frontier_search.py)
+# compact=True returns the path as a CompactPath (one byte per step, see path_codec.py)
 def shortest_path(
-    maze: List[List[str]],
+    maze: Union[List[List[str]], Grid],
     starting: Optional[Tuple[int, int]] = None,
     goal: Optional[Tuple[int, int]] = None,
     log_exploration: bool = False,
-) -> Tuple[List[Tuple[int, int]], int]:
+    algorithm: str = "bfs",
+    log_file: str = 'exploration.csv',
+    log_sink: Optional[LogSink] = None,
+    instrumentation: Optional[Instrumentation] = None,
+    compact: bool = False,
+) -> Tuple[Union[List[Tuple[int, int]], CompactPath], int]:
     if not maze:  # makes sures there's a maze, else would show error
         raise ValueError("Maze cannot be empty.")
 
     rows, cols = len(maze), len(maze[0])
+    with phase(instrumentation, "prepare"):
+        open_cells = passable_mask(maze, b".")  # flat 1/0 buffer of open cells, works for lists and compact grids
     starting = starting or (0, 0)  #if no starting position,then it by default sets it to (0,0)
     goal = goal or (rows - 1, cols - 1)  #if no goal then sets it to top-right corner
 
     # Validate starting and goal positions
-    if not (0 <= starting[0] < rows and 0 <= starting[1] < cols) or maze[starting[0]][starting[1]] != '.':
+    if not (0 <= starting[0] < rows and 0 <= starting[1] < cols) or not open_cells[starting[0] * cols + starting[1]]:
         raise ValueError(f"Invalid starting position: {starting}")
-    if not (0 <= goal[0] < rows and 0 <= goal[1] < cols) or maze[goal[0]][goal[1]] != '.':
+    if not (0 <= goal[0] < rows and 0 <= goal[1] < cols) or not open_cells[goal[0] * cols + goal[1]]:
         raise ValueError(f"Invalid goal position: {goal}")
 
-    directions = [(-1, 0, 'U'), (1, 0, 'D'), (0, -1, 'L'), (0, 1, 'R')]  # Up, Down, Left, Right with actions
-    queue: deque[Tuple[int, int]] = deque([starting])
-    came_from = {starting: None}
-    path = []
-    exploration_steps = 0
-
-    # Log for exploration
-    exploration_log = []
-
-    while queue:
-        current = queue.popleft()
-        exploration_steps += 1  # Increment exploration steps for every node dequeued
-
-        if current == goal:
-            break
-
-        for dx, dy, action in directions:
-            neighbor = (current[0] + dx, current[1] + dy)
-            if (
-                0 <= neighbor[0] < rows
-                and 0 <= neighbor[1] < cols
-                and maze[neighbor[0]][neighbor[1]] == '.'
-                and neighbor not in came_from
-            ):
-                queue.append(neighbor)
-                came_from[neighbor] = current
-
-                # Log exploration if required
-                if log_exploration:
-                    exploration_log.append((exploration_steps, neighbor[0], neighbor[1], action))
-
-    if goal not in came_from:
+    # a compact maze can keep a component index, so a goal in another part of the maze is known
+    # to be unreachable straight away instead of after searching everything the start can reach.
+    # only an index that is already there is used, building one costs more than most searches
+    if isinstance(maze, Grid) and reachable(maze, starting, goal) is False:
+        raise ValueError("No path found from starting to goal.")
+
+    # the search itself is one of the engines in search.py, bfs unless another one is asked for,
+    # every engine counts exploration steps the same way (nodes taken off the queue / open list)
+    engine = get_engine(algorithm)
+
+    # Log for exploration, every row goes to the sink as soon as the search finds the cell
+    sink = log_sink
+    if sink is None and log_exploration:
+        sink = CsvSink(log_file, exploration_header(algorithm))
+    on_discover = None
+    if sink is not None:
+        write = sink.write
+
+        def on_discover(step, x, y, action, *side):  # bidirectional search also says which side found the cell
+            write((step, x, y, action, *side))
+
+    stats = {} if instrumentation is not None else None
+    path = None
+    try:
+        with phase(instrumentation, "search"):
+            path, exploration_steps, discovered = engine(open_cells, rows, cols, starting, goal, on_discover, stats)
+    finally:
+        if sink is not None and path is None:  # a failed search leaves the last exploration log as it was
+            sink.discard()
+        elif sink is not None and log_sink is None:  # a sink passed in is closed by the caller
+            sink.close()
+    if instrumentation is not None:
+        record_search(instrumentation, stats, exploration_steps, discovered, path)
+
+    if path is None:
+        if isinstance(maze, Grid):  # the next unreachable query on this grid is answered without searching
+            component_index(maze)
         raise ValueError("No path found from starting to goal.")  # Raises error if goal not found
 
-    # Reconstruct the path
-    current = goal
-    while current:
-        path.append(current)
-        current = came_from[current]
-    path = path[::-1]  # Reverse to start from the starting position
-
-    # Write exploration log to CSV
-    if log_exploration:
-        with open('exploration.csv', mode='w', newline='') as file:
-            writer = csv.writer(file)
-            writer.writerow(['Step', 'x-coordinate', 'y-coordinate', 'Action'])  # CSV will have 4 columns
-            for step, x, y, action in exploration_log:
-                writer.writerow([step, x, y, action])#writes all 4 things in file
-
+    if compact:
+        return CompactPath.from_path(path), exploration_steps
     return path, exploration_steps
 
 
 
 # reads maze from file and ensures that it follows required structure, else raise error
-def maze_reader(maze_file: str) -> List[List[str]]:
+# compact=True memory maps the file and returns a Grid of ascii bytes instead (see mz_reader.py),
+# which is the one to use for very large mazes and the one main uses. both strip every line the
+# same way. binary .mzb files (see mzb_format.py) are read either way, as a Grid with compact=True
+# and as lists otherwise
+def maze_reader(maze_file: str, compact: bool = False,
+                instrumentation: Optional[Instrumentation] = None) -> Union[List[List[str]], Grid]:
+    if instrumentation is not None:  # times the read as its own phase around an ordinary read
+        with instrumentation.phase("read"):
+            maze = maze_reader(maze_file, compact)
+        instrumentation.record("cells", len(maze) * len(maze[0]))
+        return maze
+    if is_mzb(maze_file):  # a binary .mzb maze, recognised by its first bytes whatever it is called
+        grid = read_mzb(maze_file, strict=True)
+        return grid if compact else [list(bytes(row).decode('ascii')) for row in grid]
+    if compact:
+        return read_mz(maze_file, strict=True)
     try:
         with open(maze_file, 'r') as file:
             maze = [list(line.strip()) for line in file.readlines()]
     except IOError:
         raise IOError(f"Cannot read the maze file: {maze_file}")  # when can't read from input file
 
-    if not maze:
+    if not any(maze):  # no lines, or only blank ones
         raise ValueError("Maze file is empty.")  # when file content dosen't form proper maze
 
     rows, cols = len(maze), len(maze[0])
@@ -102,56 +142,144 @@ def maze_reader(maze_file: str) -> List[List[str]]:
 
 
 # writes statistics about maze solving process( such as stpes, path length etc)
-def write_statistics(maze_file: str, exploration_steps: int, path_length: int,path: List[Tuple[int, int]]):
-    score = exploration_steps / 4 + path_length
-
-    with open('statistics.txt', mode='w') as file:  # line below are 5 output line for this file
+# cache_counters are the (hits, misses) of the result cache, left out when the cache is off
+# the path (a list of cells or a CompactPath) is written a chunk at a time, never as one string
+def write_statistics(maze_file: str, exploration_steps: int, path_length: int,
+                     path: Union[List[Tuple[int, int]], CompactPath],
+                     cache_counters: Optional[Tuple[int, int]] = None, output_file: str = 'statistics.txt',
+                     score: Optional[float] = None):
+    if score is None:  # given when it comes from the result cache
+        score = exploration_steps / 4 + path_length
+
+    with open(output_file, mode='w') as file:  # line below are 5 output line for this file
         file.write(f"Input file: {maze_file}\n")
         file.write(f"Score: {score:.2f}\n")
         file.write(f"Exploration steps: {exploration_steps}\n")
-        file.write(f"Shortest path: {path}\n")
+        file.write("Shortest path: ")
+        write_cells(file, path)
+        file.write("\n")
         file.write(f"Path length: {path_length}\n")
+        if cache_counters is not None:
+            file.write(f"Cache hits: {cache_counters[0]}\n")
+            file.write(f"Cache misses: {cache_counters[1]}\n")
 
 
 # this section is responsible for exceuting the program
 if __name__ == "__main__":
+    if sys.argv[1:2] == ["batch"]:  # python maze_runner.py batch <directory or glob> [options], see batch_solver.py
+        from batch_solver import main as batch_main
+        sys.exit(batch_main(sys.argv[2:], mode="base"))
+    if sys.argv[1:2] == ["serve"]:  # python maze_runner.py serve [options], a daemon that keeps mazes loaded, see solver_daemon.py
+        from solver_daemon import serve_main
+        sys.exit(serve_main(sys.argv[2:]))
+    if sys.argv[1:2] == ["client"]:  # python maze_runner.py client maze.mz --starting 1,1 --goal 9,9, asks the daemon
+        from solver_daemon import client_main
+        sys.exit(client_main(sys.argv[2:]))
+
     parser = argparse.ArgumentParser(description="ECS Maze Runner")  # provides decription of command line argument
     parser.add_argument("maze", help="The name of the maze file, e.g., maze1.mz")
-    parser.add_argument("--starting", help='The starting position, e.g., "2,1"', default=None)
-    parser.add_argument("--goal", help='The goal position, e.g., "4,5"', default=None)
+    parser.add_argument("--starting", help='The starting position, e.g., "2,1" (repeat it to start from the nearest '
+                                           'of several)', action="append", default=None)
+    parser.add_argument("--goal", help='The goal position, e.g., "4,5" (repeat it to find the nearest of several)',
+                        action="append", default=None)
+    parser.add_argument("--goals-file", help='A file of goal positions, one "row,column" per line', default=None)
+    parser.add_argument("--label-map", help="Write which starting position every cell is closest to, as csv, to this file",
+                        default=None)
+    parser.add_argument("--algorithm", help="Search algorithm to use", choices=list(ENGINES), default="bfs")
+    parser.add_argument("--no-cache", help="Always search, don't read or write the result cache", action="store_true")
+    parser.add_argument("--log-format", help="Exploration log format (exploration.csv, exploration.bin or none)",
+                        choices=list(SINKS), default="csv")
+    parser.add_argument("--viewport", help="Only draw the path and this many cells around it", type=int, default=None)
+    parser.add_argument("--arrows", help="Draw the path as arrows (^ > v <) pointing along it", action="store_true")
+    parser.add_argument("--render-file", help="Write the maze with path to this file instead of the screen", default=None)
+    parser.add_argument("--instrument", help=f"Write phase timings and search counters to {INSTRUMENTATION_FILE}",
+                        action="store_true")
+    parser.add_argument("--trace-allocations", help="With --instrument, also record peak allocations per phase",
+                        action="store_true")
     args = parser.parse_args()
 
+    instrumentation = Instrumentation(args.trace_allocations) if args.instrument or args.trace_allocations else None
     try:
-        maze = maze_reader(args.maze)
-
-        # Parse starting and goal positions from command-line arguments
-        starting = tuple(map(int, args.starting.split(','))) if args.starting else None
-        goal = tuple(map(int, args.goal.split(','))) if args.goal else None
+        maze = maze_reader(args.maze, compact=True, instrumentation=instrumentation)
+
+        # Parse starting and goal positions from command-line arguments, several of either are
+        # searched together for the nearest pairing (see multi_search.py)
+        startings = [tuple(map(int, position.split(','))) for position in args.starting or []]
+        goals = [tuple(map(int, position.split(','))) for position in args.goal or []]
+        if args.goals_file:
+            goals += read_positions(args.goals_file)
+        many = len(startings) > 1 or len(goals) > 1
+        if many and args.algorithm != "bfs":
+            raise ValueError("Several starting or goal positions are searched with bfs only.")
+        if many:
+            starting = startings or [(0, 0)]
+            goal = goals or [(len(maze) - 1, len(maze[0]) - 1)]
+        else:
+            starting = startings[0] if startings else None
+            goal = goals[0] if goals else None
 
         # Print maze for debugging purposes
         print("Maze:")
         for row in maze:
-            print("".join(row))
+            print(bytes(row).decode('ascii'))
         print(f"Starting position: {starting}")
         print(f"Goal position: {goal}")
 
-        # Find the shortest path and get exploration data
-        path, exploration_steps = shortest_path(maze, starting, goal, log_exploration=True)
+        # Find the shortest path and get exploration data, unless the same solve is already cached
+        cache = None if args.no_cache else ResultCache()
+        key = result_key(maze, starting, goal, "nearest" if many else args.algorithm, "base")
+        cached = cache.lookup(key) if cache else None
+        statistics = None
+        if cached is not None:
+            path, exploration_steps, statistics = cached
+            if instrumentation is not None:
+                instrumentation.record("cache_hit", True)
+            print("Result loaded from cache, exploration.csv was not rewritten (use --no-cache to search again)")
+        else:
+            with open_sink(args.log_format, exploration_header(args.algorithm)) as sink:
+                if many:
+                    with phase(instrumentation, "search"):
+                        path, exploration_steps = nearest_path(maze, starting, goal, log_sink=sink)
+                else:
+                    path, exploration_steps = shortest_path(maze, starting, goal, algorithm=args.algorithm,
+                                                            log_sink=sink, instrumentation=instrumentation)
+            log_stats = sink.stats()
+            print(f"Exploration log: {log_stats['rows']} rows, {log_stats['rows_per_second']} rows/s")
+            if cache:
+                cache.store(key, path, exploration_steps)
+
+        # from here on the path is kept as one byte per step, the cells are only made while writing it out
+        path = CompactPath.from_path(path)
 
         # Display the shortest path and maze with path
-        print("Shortest Path:", path)
+        if many:
+            print(f"Nearest pairing: {path.start} -> {path.end()}")
+        sys.stdout.write("Shortest Path: ")
+        write_cells(sys.stdout, path)
+        print()
+        print(f"Path moves: {path.start} {path.run_length()}")
         print("Maze with Path:")
-        for r, row in enumerate(maze):
-            row_display = ''.join(
-                "@" if (r, c) in path else char
-                for c, char in enumerate(row)
-            )
-            print(row_display)
+        viewport = path_viewport(len(maze), len(maze[0]), path, args.viewport) if args.viewport is not None else None
+        with phase(instrumentation, "render"):
+            if args.render_file:
+                with open(args.render_file, "w") as out:
+                    render(maze, path, out, viewport, args.arrows)
+                print(f"Written to {args.render_file}")
+            else:
+                render(maze, path, viewport=viewport, arrows=args.arrows)
+
+        # which starting position every cell is nearest to
+        if args.label_map:
+            owners, _ = voronoi(maze, startings or [(0, 0)])
+            write_owner_map(owners, len(maze[0]), args.label_map)
+            print(f"Label map written to {args.label_map}")
 
         # Write statistics to file
-        write_statistics(args.maze, exploration_steps, len(path))
-        # Write statistics to file
-        write_statistics(args.maze, exploration_steps, len(path), path)
+        with phase(instrumentation, "statistics"):
+            write_statistics(args.maze, exploration_steps, len(path), path, cache.counters() if cache else None,
+                             score=statistics["score"] if statistics else None)
+        if instrumentation is not None:
+            instrumentation.write()  # instrumentation.json, next to statistics.txt
 
 
     except Exception as e:
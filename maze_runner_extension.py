@@ -1,99 +1,152 @@
 import argparse
-import csv
-from typing import List, Tuple, Optional
-from collections import deque
+import sys
+from typing import List, Tuple, Optional, Union
+from grid import Grid, passable_mask
+from mz_reader import read_mz
+from mzb_format import is_mzb, read_mzb
+from search import ENGINES, get_engine
+from result_cache import ResultCache, result_key
+from renderer import render, path_viewport
+from exploration_log import LogSink, CsvSink, SINKS, open_sink
+from instrumentation import Instrumentation, INSTRUMENTATION_FILE, phase, record_search
+from components import component_index, reachable
+from path_codec import CompactPath, write_cells
+
+# columns of the exploration log for a search, bidirectional search adds which side found the cell
+def exploration_header(algorithm: str = "bfs") -> List[str]:
+    return ['Step', 'x-coordinate', 'y-coordinate'] + (['Side'] if algorithm == "bidirectional" else [])
+
+
+# whether a starting or goal position is on the maze and not a wall, spaces count as open here.
+# shortest_path answers an invalid one with a message and [(0, 0)], 0 instead of an error, so
+# callers check with this before caching or reporting that answer as a solve
+def valid_position(maze, position: Tuple[int, int]) -> bool:
+    rows = len(maze)
+    cols = len(maze[0]) if rows else 0
+    r, c = position
+    return 0 <= r < rows and 0 <= c < cols and maze[r][c] not in ('#', ord('#'))
+
+
+# raises the error the base version gives for an invalid starting or goal position, for the batch
+# runner and the daemon, which must not pass shortest_path's made up answer off as a solve
+def check_positions(maze, starting: Optional[Tuple[int, int]], goal: Optional[Tuple[int, int]]):
+    for what, position in (("starting", starting), ("goal", goal)):
+        if position is not None and not valid_position(maze, position):
+            raise ValueError(f"Invalid {what} position: {position}")
+
 
 # finds shortest path to starting position to goal position and writes in exploration file
+# the log is streamed while searching, to log_file as csv or to log_sink (see exploration_log.py)
+# given an Instrumentation it also times the phases and records the search counters (see instrumentation.py)
+# algorithm picks the search: "bfs" (default), "astar", "jps" (for open grids where every step costs the same),
+# "bidirectional" (searches from both ends and meets in the middle), "junction" (searches only the
+# junctions and dead ends, with every corridor between them as one step, same path as bfs) or
+# "frontier" (bfs a whole level at a time with numpy, same path and exploration steps as bfs,
+# only faster on mazes with wide frontiers such as open grids, see frontier_search.py)
 def shortest_path(
-    maze: List[List[str]],
+    maze: Union[List[List[str]], Grid],
     starting: Optional[Tuple[int, int]] = None,
     goal: Optional[Tuple[int, int]] = None,
     log_exploration: bool = False,
+    algorithm: str = "bfs",
+    log_file: str = 'exploration.csv',
+    log_sink: Optional[LogSink] = None,
+    instrumentation: Optional[Instrumentation] = None,
 ) -> Tuple[List[Tuple[int, int]], int]:
     if not maze:
         raise ValueError("Maze cannot be empty.")
 
     rows, cols = len(maze), len(maze[0])
+    with phase(instrumentation, "prepare"):
+        open_cells = passable_mask(maze, b".")
 
     # Validate provided starting and goal positions
-    if starting is not None:
-        if not (0 <= starting[0] < rows and 0 <= starting[1] < cols) or maze[starting[0]][starting[1]] == '#':
-            print(f"Invalid starting position: {starting}")
-            return [(0, 0)], 0
-    if goal is not None:
-        if not (0 <= goal[0] < rows and 0 <= goal[1] < cols) or maze[goal[0]][goal[1]] == '#':
-            print(f"Invalid goal position: {goal}")
-            return [(0, 0)], 0
+    if starting is not None and not valid_position(maze, starting):
+        print(f"Invalid starting position: {starting}")
+        if log_sink is not None:  # nothing was searched, the last exploration log stays
+            log_sink.discard()
+        return [(0, 0)], 0
+    if goal is not None and not valid_position(maze, goal):
+        print(f"Invalid goal position: {goal}")
+        if log_sink is not None:  # nothing was searched, the last exploration log stays
+            log_sink.discard()
+        return [(0, 0)], 0
 
     # Default starting and goal positions if not provided
     starting = starting or (0, 0)
     goal = goal or (rows - 1, cols - 1)
 
-    # Directions for movement: Up, Down, Left, Right
-    directions = [(-1, 0), (1, 0), (0, -1), (0, 1)]
-    queue = deque([starting])
-    came_from = {starting: None}
-    path = []
-    exploration_steps = 0
-
-    # Log exploration steps if required
-    exploration_log = []
-
-    while queue:
-        current = queue.popleft()
-
-        # If goal is reached, break out
-        if current == goal:
-            break
-
-        for dx, dy in directions:
-            neighbor = (current[0] + dx, current[1] + dy)
-
-            if (
-                0 <= neighbor[0] < rows
-                and 0 <= neighbor[1] < cols
-                and maze[neighbor[0]][neighbor[1]] == '.'  # Valid open path
-                and neighbor not in came_from
-            ):
-                queue.append(neighbor)
-                came_from[neighbor] = current
+    # irregular mazes can be in several pieces, a compact maze can keep a component index so a goal
+    # in another piece is known to be unreachable straight away instead of after a full search.
+    # only an index that is already there is used, building one costs more than most searches
+    if isinstance(maze, Grid) and reachable(maze, starting, goal) is False:
+        raise ValueError("No path found from starting to goal.")
 
-                # Log exploration if required
-                if log_exploration:
-                    exploration_steps += 1
-                    exploration_log.append((exploration_steps, neighbor[0], neighbor[1]))
+    # the search itself is one of the engines in search.py, bfs unless another one is asked for
+    engine = get_engine(algorithm)
+
+    # Log exploration steps if required, here a step is every newly discovered cell
+    # and every row goes to the sink as soon as the search finds the cell
+    sink = log_sink
+    if sink is None and log_exploration:
+        sink = CsvSink(log_file, exploration_header(algorithm))
+    on_discover = None
+    if sink is not None:
+        write = sink.write
+        logged = 0
+
+        def on_discover(_, x, y, action, *side):  # bidirectional search also says which side found the cell
+            nonlocal logged
+            logged += 1
+            write((logged, x, y, *side))
+
+    stats = {} if instrumentation is not None else None
+    path = None
+    try:
+        with phase(instrumentation, "search"):
+            path, expanded, discovered = engine(open_cells, rows, cols, starting, goal, on_discover, stats)
+    finally:
+        if sink is not None and path is None:  # a failed search leaves the last exploration log as it was
+            sink.discard()
+        elif sink is not None and log_sink is None:  # a sink passed in is closed by the caller
+            sink.close()
+    if instrumentation is not None:
+        record_search(instrumentation, stats, expanded, discovered, path)
+    exploration_steps = discovered if sink is not None else 0
 
     # If the goal is not reachable, raise an error
-    if goal not in came_from:
+    if path is None:
+        if isinstance(maze, Grid):  # the next unreachable query on this grid is answered without searching
+            component_index(maze)
         raise ValueError("No path found from starting to goal.")
 
-    # Reconstruct the path
-    current = goal
-    while current:
-        path.append(current)
-        current = came_from[current]
-    path = path[::-1]  # Reverse the path to get it from start to goal
-
-    # Write exploration log to CSV if required
-    if log_exploration:
-        with open('exploration.csv', mode='w', newline='') as file:
-            writer = csv.writer(file)
-            writer.writerow(['Step', 'x-coordinate', 'y-coordinate'])
-            for step, x, y in exploration_log:
-                writer.writerow([step, x, y])
-
     return path, exploration_steps
 
 
 # maze reader which works properly with non-regular mazes
-def maze_reader(maze_file: str) -> List[List[str]]:
+# compact=True memory maps the file and returns a Grid of ascii bytes instead (see mz_reader.py),
+# using the relaxed checks so spaces and open borders are still allowed, main uses that one.
+# both strip every line the same way, a space at either end of a line is not a cell
+# binary .mzb files (see mzb_format.py) are read either way, as a Grid with compact=True
+def maze_reader(maze_file: str, compact: bool = False,
+                instrumentation: Optional[Instrumentation] = None) -> Union[List[List[str]], Grid]:
+    if instrumentation is not None:  # times the read as its own phase around an ordinary read
+        with instrumentation.phase("read"):
+            maze = maze_reader(maze_file, compact)
+        instrumentation.record("cells", len(maze) * len(maze[0]))
+        return maze
+    if is_mzb(maze_file):  # a binary .mzb maze, recognised by its first bytes whatever it is called
+        grid = read_mzb(maze_file, strict=False)
+        return grid if compact else [list(bytes(row).decode('ascii')) for row in grid]
+    if compact:
+        return read_mz(maze_file, strict=False)
     try:
         with open(maze_file, 'r') as file: # reads maze from file
             maze = [list(line.strip()) for line in file.readlines()]
     except IOError:
         raise IOError(f"Cannot read the maze file: {maze_file}") # raises error if file not found
 
-    if not maze:
+    if not any(maze):  # no lines, or only blank ones
         raise ValueError("Maze file is empty.")# raises error if file is empty
 
     rows, cols = len(maze), len(maze[0])
@@ -114,26 +167,49 @@ def maze_reader(maze_file: str) -> List[List[str]]:
 
 
 # writes statistics about maze solving process( such as stpes, path length etc)
-def write_statistics(maze_file: str, exploration_steps: int, path_length: int):
-    score = exploration_steps / 4 + path_length
-
-    with open('statistics.txt', mode='w') as file: # line below are 5 output line for this file
+# cache_counters are the (hits, misses) of the result cache, left out when the cache is off
+def write_statistics(maze_file: str, exploration_steps: int, path_length: int,
+                     cache_counters: Optional[Tuple[int, int]] = None, output_file: str = 'statistics.txt',
+                     score: Optional[float] = None):
+    if score is None:  # given when it comes from the result cache
+        score = exploration_steps / 4 + path_length
+
+    with open(output_file, mode='w') as file: # line below are 5 output line for this file
         file.write(f"Input file: {maze_file}\n")
         file.write(f"Score: {score:.2f}\n")
         file.write(f"Exploration steps: {exploration_steps}\n")
         file.write(f"Path length: {path_length}\n")
+        if cache_counters is not None:
+            file.write(f"Cache hits: {cache_counters[0]}\n")
+            file.write(f"Cache misses: {cache_counters[1]}\n")
 
 
 # this section is responsible for exceuting the program
 if __name__ == "__main__":
+    if sys.argv[1:2] == ["batch"]:  # python maze_runner_extension.py batch <directory or glob> [options], see batch_solver.py
+        from batch_solver import main as batch_main
+        sys.exit(batch_main(sys.argv[2:], mode="extension"))
+
     parser = argparse.ArgumentParser(description="ECS Maze Runner")# provides decription of command line argument
     parser.add_argument("maze", help="The name of the maze file, e.g., maze1.mz")
     parser.add_argument("--starting", help='The starting position, e.g., "2,1"', default=None)
     parser.add_argument("--goal", help='The goal position, e.g., "4,5"', default=None)
+    parser.add_argument("--algorithm", help="Search algorithm to use", choices=list(ENGINES), default="bfs")
+    parser.add_argument("--no-cache", help="Always search, don't read or write the result cache", action="store_true")
+    parser.add_argument("--log-format", help="Exploration log format (exploration.csv, exploration.bin or none)",
+                        choices=list(SINKS), default="csv")
+    parser.add_argument("--viewport", help="Only draw the path and this many cells around it", type=int, default=None)
+    parser.add_argument("--arrows", help="Draw the path as arrows (^ > v <) pointing along it", action="store_true")
+    parser.add_argument("--render-file", help="Write the maze with path to this file instead of the screen", default=None)
+    parser.add_argument("--instrument", help=f"Write phase timings and search counters to {INSTRUMENTATION_FILE}",
+                        action="store_true")
+    parser.add_argument("--trace-allocations", help="With --instrument, also record peak allocations per phase",
+                        action="store_true")
     args = parser.parse_args()
 
+    instrumentation = Instrumentation(args.trace_allocations) if args.instrument or args.trace_allocations else None
     try:
-        maze = maze_reader(args.maze)
+        maze = maze_reader(args.maze, compact=True, instrumentation=instrumentation)
 
         starting = tuple(map(int, args.starting.split(','))) if args.starting else None
         goal = tuple(map(int, args.goal.split(','))) if args.goal else None
@@ -141,25 +217,55 @@ if __name__ == "__main__":
         # Print maze for debugging purposes
         print("Maze:")
         for row in maze:
-            print("".join(row))
+            print(bytes(row).decode('ascii'))
         print(f"Starting position: {starting}")
         print(f"Goal position: {goal}")
 
-        # Find the shortest path and get exploration data
-        path, exploration_steps = shortest_path(maze, starting, goal, log_exploration=True)
+        # Find the shortest path and get exploration data, unless the same solve is already cached.
+        # an invalid position is answered without a search and that answer is never cached
+        valid = all(valid_position(maze, position) for position in (starting, goal) if position is not None)
+        cache = None if args.no_cache or not valid else ResultCache()
+        key = result_key(maze, starting, goal, args.algorithm, "extension")
+        cached = cache.lookup(key) if cache else None
+        statistics = None
+        if cached is not None:
+            path, exploration_steps, statistics = cached
+            if instrumentation is not None:
+                instrumentation.record("cache_hit", True)
+            print("Result loaded from cache, exploration.csv was not rewritten (use --no-cache to search again)")
+        else:
+            with open_sink(args.log_format, exploration_header(args.algorithm)) as sink:
+                path, exploration_steps = shortest_path(maze, starting, goal, algorithm=args.algorithm, log_sink=sink,
+                                                        instrumentation=instrumentation)
+            log_stats = sink.stats()
+            print(f"Exploration log: {log_stats['rows']} rows, {log_stats['rows_per_second']} rows/s")
+            if cache:
+                cache.store(key, path, exploration_steps)
+
+        # from here on the path is kept as one byte per step, the cells are only made while writing it out
+        path = CompactPath.from_path(path)
 
         # Display the shortest path and maze with path
-        print("Shortest Path:", path)
+        sys.stdout.write("Shortest Path: ")
+        write_cells(sys.stdout, path)
+        print()
+        print(f"Path moves: {path.start} {path.run_length()}")
         print("Maze with Path:")
-        for r, row in enumerate(maze):
-            row_display = ''.join(
-                "@" if (r, c) in path else char
-                for c, char in enumerate(row)
-            )
-            print(row_display)
+        viewport = path_viewport(len(maze), len(maze[0]), path, args.viewport) if args.viewport is not None else None
+        with phase(instrumentation, "render"):
+            if args.render_file:
+                with open(args.render_file, "w") as out:
+                    render(maze, path, out, viewport, args.arrows)
+                print(f"Written to {args.render_file}")
+            else:
+                render(maze, path, viewport=viewport, arrows=args.arrows)
 
         # Write statistics to file
-        write_statistics(args.maze, exploration_steps, len(path))
+        with phase(instrumentation, "statistics"):
+            write_statistics(args.maze, exploration_steps, len(path), cache.counters() if cache else None,
+                             score=statistics["score"] if statistics else None)
+        if instrumentation is not None:
+            instrumentation.write()  # instrumentation.json, next to statistics.txt
 
     except Exception as e:
         print("Error:", e)# shows error message if there's any errors and make sure prograam don't crash
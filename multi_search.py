@@ -0,0 +1,183 @@
+from array import array
+from collections import deque
+from typing import List, Optional, Sequence, Tuple
+from components import built_component_index
+from exploration_log import LogSink, CsvSink
+from grid import passable_mask
+from search import MOVES, Discover, SearchResult, _build_path, trace_moves
+
+Position = Tuple[int, int]
+
+
+# breadth first search from every source at once towards the nearest of several goals. all the
+# sources go on the queue first (in the order given), so cells come off it in order of distance
+# to the closest source and the first goal taken off is the nearest one to any of them. the path
+# runs from that goal's closest source to it, so path[0] and path[-1] are the pairing. one
+# search costs O(cells) however many sources and goals there are, and with one of each it is
+# exactly bfs (same path, exploration steps and log). positions are (row, column)
+def multi_bfs(open_cells, rows: int, cols: int, sources: Sequence[Position], goals: Sequence[Position],
+              on_discover: Discover = None, stats: Optional[dict] = None) -> SearchResult:
+    size = rows * cols
+    came_from = bytearray(size)  # 0 = not seen, 1-4 = move that reached the cell, 5 = a source
+    targets = bytearray(size)
+    for r, c in goals:
+        targets[r * cols + c] = 1
+    queue = deque()
+    for r, c in sources:
+        start = r * cols + c
+        if not came_from[start]:  # a source given twice is only searched from once
+            came_from[start] = 5
+            queue.append(start)
+    expanded = discovered = 0
+    found = -1
+    track, peak = stats is not None, len(queue)
+
+    while queue:
+        if track and len(queue) > peak:
+            peak = len(queue)
+        current = queue.popleft()
+        expanded += 1
+        if targets[current]:
+            found = current
+            break
+        r, c = divmod(current, cols)
+        for move, (dr, dc, action) in enumerate(MOVES, 1):
+            nr, nc = r + dr, c + dc
+            if 0 <= nr < rows and 0 <= nc < cols:
+                neighbor = current + dr * cols + dc
+                if open_cells[neighbor] and not came_from[neighbor]:
+                    came_from[neighbor] = move
+                    queue.append(neighbor)
+                    discovered += 1
+                    if on_discover is not None:
+                        on_discover(expanded, nr, nc, action)
+
+    if track:
+        stats.update(peak_frontier=peak, came_from_entries=size - came_from.count(0))
+    if found == -1:
+        return None, expanded, discovered
+    return _build_path(stats, trace_moves, came_from, cols, found), expanded, discovered
+
+
+# which source every cell is closest to (a voronoi partition of the maze by walking distance),
+# from one breadth first search out of all the sources together. owners are numbered 1, 2, ...
+# in the order the sources are given, 0 is a closed cell or one no source can reach. a cell as
+# close to two sources goes to the one whose search got there first, the same way bfs breaks ties.
+# returns the owners and the distance of every cell to its owner (-1 where the owner is 0)
+def owner_map(open_cells, rows: int, cols: int, sources: Sequence[Position]) -> Tuple[array, array]:
+    size = rows * cols
+    owners = array("i", [0]) * size
+    distances = array("i", [-1]) * size
+    queue = deque()
+    for number, (r, c) in enumerate(sources, 1):
+        start = r * cols + c
+        if not owners[start]:
+            owners[start] = number
+            distances[start] = 0
+            queue.append(start)
+
+    while queue:
+        current = queue.popleft()
+        owner, step = owners[current], distances[current] + 1
+        r, c = divmod(current, cols)
+        for dr, dc, _ in MOVES:
+            if 0 <= r + dr < rows and 0 <= c + dc < cols:
+                neighbor = current + dr * cols + dc
+                if open_cells[neighbor] and not owners[neighbor]:
+                    owners[neighbor] = owner
+                    distances[neighbor] = step
+                    queue.append(neighbor)
+    return owners, distances
+
+
+def _check_positions(positions: Sequence[Position], open_cells, rows: int, cols: int, name: str):
+    if not positions:
+        raise ValueError(f"At least one {name} position is needed.")
+    for position in positions:
+        if not (0 <= position[0] < rows and 0 <= position[1] < cols) or not open_cells[position[0] * cols + position[1]]:
+            raise ValueError(f"Invalid {name} position: {position}")
+
+
+# the shortest path from any of startings to the nearest of goals, like shortest_path in
+# maze_runner.py but for many endpoints in one search. path[0] is the start and path[-1] the goal
+# that were paired up. the log is written to log_file or log_sink as shortest_path writes it
+def nearest_path(
+    maze,
+    startings: Sequence[Position],
+    goals: Sequence[Position],
+    log_exploration: bool = False,
+    log_file: str = 'exploration.csv',
+    log_sink: Optional[LogSink] = None,
+    open_values: bytes = b".",
+) -> Tuple[List[Position], int]:
+    if not maze:
+        raise ValueError("Maze cannot be empty.")
+    rows, cols = len(maze), len(maze[0])
+    open_cells = passable_mask(maze, open_values)
+    _check_positions(startings, open_cells, rows, cols, "starting")
+    _check_positions(goals, open_cells, rows, cols, "goal")
+
+    # a compact maze with a component index already built (see built_component_index): goals in
+    # no start's part of the maze are dropped before searching and when none are left there is
+    # nothing to search
+    index = built_component_index(maze, open_values)
+    if index is not None:
+        labels = {index.component(position) for position in startings}
+        goals = [goal for goal in goals if index.component(goal) in labels]
+        if not goals:
+            raise ValueError("No path found from starting to goal.")
+
+    sink = log_sink
+    if sink is None and log_exploration:
+        sink = CsvSink(log_file, ['Step', 'x-coordinate', 'y-coordinate', 'Action'])
+    on_discover = None
+    if sink is not None:
+        write = sink.write
+
+        def on_discover(step, x, y, action):
+            write((step, x, y, action))
+
+    try:
+        path, exploration_steps, _ = multi_bfs(open_cells, rows, cols, startings, goals, on_discover)
+    finally:
+        if sink is not None and log_sink is None:
+            sink.close()
+    if path is None:
+        raise ValueError("No path found from starting to goal.")
+    return path, exploration_steps
+
+
+# the owner map of a maze (see owner_map), checking the sources first
+def voronoi(maze, startings: Sequence[Position], open_values: bytes = b".") -> Tuple[array, array]:
+    if not maze:
+        raise ValueError("Maze cannot be empty.")
+    rows, cols = len(maze), len(maze[0])
+    open_cells = passable_mask(maze, open_values)
+    _check_positions(startings, open_cells, rows, cols, "starting")
+    return owner_map(open_cells, rows, cols, startings)
+
+
+# writes an owner map as csv, one line of owner numbers per maze row
+def write_owner_map(owners: array, cols: int, output_file: str):
+    with open(output_file, "w") as file:
+        for start in range(0, len(owners), cols):
+            file.write(",".join(map(str, owners[start:start + cols])) + "\n")
+
+
+# reads positions from a file, one "row,column" per line. blank lines and lines starting with # are skipped
+def read_positions(positions_file: str) -> List[Position]:
+    positions = []
+    try:
+        with open(positions_file) as file:
+            for number, line in enumerate(file, 1):
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                try:
+                    r, c = map(int, line.split(","))
+                except ValueError:
+                    raise ValueError(f"Bad position on line {number} of {positions_file}: {line}")
+                positions.append((r, c))
+    except OSError:
+        raise IOError(f"Cannot read the positions file: {positions_file}")
+    return positions
@@ -0,0 +1,114 @@
+import io
+import mmap
+from typing import Optional
+from grid import Grid
+
+# characters each mode accepts, strict is the base version (only walls and paths),
+# relaxed is the extension version which also allows spaces for irregular mazes
+STRICT_CHARS = b"#."
+RELAXED_CHARS = b"#. "
+
+
+# reads a .mz file through mmap and returns a Grid holding the ascii byte of every cell.
+# nothing is done per character in python: rows are copied into the grid with slice assignment
+# and the character, width and border checks all run as bytes operations over the whole buffer,
+# so a huge maze costs one byte per cell and a few passes at C speed.
+def read_mz(maze_file: str, strict: bool = True) -> Grid:
+    try:
+        with open(maze_file, 'rb') as file:
+            if file.seek(0, 2) == 0:
+                raise ValueError("Maze file is empty.")
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                return parse_mz(data, strict)
+    except OSError:
+        raise IOError(f"Cannot read the maze file: {maze_file}")
+
+
+# validates and copies an in-memory .mz buffer (bytes, bytearray or mmap) into a Grid.
+# every line is stripped of leading and trailing whitespace, as the list readers in maze_runner.py
+# and maze_runner_extension.py do with line.strip(), so both readers give the same grid or the
+# same error for any file. that is the intended behaviour: a space at either end of a line is
+# taken as stray whitespace, not as a cell, even where the extension allows spaces inside the maze
+def parse_mz(data, strict: bool = True) -> Grid:
+    grid = _parse_rows(data)
+    if grid is None:  # some line has whitespace around it, or the lines differ in length
+        grid = _parse_stripped(data)
+    if grid.cells.translate(None, STRICT_CHARS if strict else RELAXED_CHARS):
+        raise ValueError("Maze contains invalid characters.")
+    if strict and not is_enclosed(grid):
+        raise ValueError("Maze is not fully enclosed by walls.")
+    return grid
+
+
+# whitespace line.strip() removes that a line of a .mz file can contain
+_WHITESPACE = b" \t\x0b\x0c\x1c\x1d\x1e\x1f"
+
+
+# the fast path for a file whose lines all have the same length and no whitespace at either end:
+# rows are copied into the grid with slice assignment and the checks are bytes operations over
+# the whole buffer. returns None when that is not the case and the lines have to be stripped first
+def _parse_rows(data) -> Optional[Grid]:
+    # the line break at the end of the file is not an extra row (but a blank line after it is)
+    total = len(data)
+    if total > 0 and data[total - 1] == 10:
+        total -= 1
+        if total > 0 and data[total - 1] == 13:
+            total -= 1
+    if total == 0:
+        raise ValueError("Maze file is empty.")
+
+    # the first row fixes the width and the line ending (\n or \r\n), every row must follow it
+    end = data.find(b"\n", 0, total)
+    if end == -1:
+        end = total
+    eol = 2 if end < total and end > 0 and data[end - 1] == 13 else 1
+    width = end - (eol - 1)
+    if width == 0:
+        return None
+    stride = width + eol
+    height = (total + eol) // stride
+    if height * stride - eol != total:
+        return None
+
+    grid = Grid(width, height)
+    cells = grid.cells
+    for y in range(height):
+        start = y * stride
+        cells[y * width:(y + 1) * width] = data[start:start + width]
+
+    # the rows only add up to the right size by accident when something other than a line break
+    # is between them or a line break is inside one, and whitespace in the first or last column is
+    # whitespace around a line that strip() would remove
+    breaks = data[width + eol - 1:total:stride]
+    if breaks.count(b"\n") != len(breaks) or (eol == 2 and data[width:total:stride].count(b"\r") != len(breaks)):
+        return None
+    if b"\n" in cells or b"\r" in cells:
+        return None
+    edges = cells[0::width] + cells[width - 1::width]
+    if len(edges.translate(None, _WHITESPACE)) != len(edges):
+        return None
+    return grid
+
+
+# the slow path, the lines read and stripped exactly as the list readers read them
+def _parse_stripped(data) -> Grid:
+    with io.TextIOWrapper(io.BytesIO(bytes(data))) as text:
+        rows = [line.strip() for line in text]
+    if not rows:
+        raise ValueError("Maze file is empty.")
+    width = len(rows[0])
+    if any(len(row) != width for row in rows):
+        raise ValueError("Maze rows are not of consistent length.")
+    if width == 0:  # only blank lines
+        raise ValueError("Maze file is empty.")
+    if not all(row.isascii() for row in rows):
+        raise ValueError("Maze contains invalid characters.")
+    return Grid(width, len(rows), cells="".join(rows).encode("ascii"))
+
+
+# checks the outer rows and columns are all walls using slices instead of a loop per cell
+def is_enclosed(grid: Grid) -> bool:
+    cells, width = grid.cells, grid.width
+    wall = ord('#')
+    edges = (cells[:width], cells[-width:], cells[0::width], cells[width - 1::width])
+    return all(edge.count(wall) == len(edge) for edge in edges)
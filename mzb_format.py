@@ -0,0 +1,239 @@
+import argparse
+import mmap
+import struct
+import sys
+import time
+import zlib
+from array import array
+from typing import Dict, Tuple
+from components import ComponentIndex
+from grid import Grid, cell_bytes
+from mz_reader import is_enclosed, read_mz
+from wall_index import WallIndex
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, without it the bit planes are unpacked through big integers
+    np = None
+
+# binary .mzb mazes: the same '#', '.' and ' ' cells as a .mz file, packed one bit per cell, plus
+# indexes that would otherwise be rebuilt after every load. the file is
+#   header     magic, format version, flags, width, height, number of sections, checksum
+#   directory  one (tag, offset, length, crc32) entry per section, the checksum is its crc32
+#   sections   each one starts on an 8 byte boundary:
+#     WALL  bit plane, 1 = '#', row after row, first cell in the highest bit of the first byte
+#     SPCE  bit plane of the ' ' cells, only there when the maze has any (flag HAS_SPACES)
+#     MASK  the 4 bit wall mask of every cell, one byte each (see wall_index.py)
+#     CMPS  the number of components (uint32), their sizes (int64 each, [0] unused) and the
+#           label of every cell (int32 each), see components.py
+# numbers are little-endian. the file is read through mmap, the masks are one copy out of it
+# and the component labels are used straight from the mapping without copying at all. the header
+# and directory are always checked against their crc32, the sections only when asked to (verify),
+# checksumming the masks alone would take about as long as unpacking the cells.
+
+MAGIC = b"MZB\x1a"
+FORMAT_VERSION = 1
+HAS_SPACES = 1
+
+_HEADER = struct.Struct("<4sHHIIII")
+_ENTRY = struct.Struct("<4sQQI")
+
+# '#' -> '1', everything else '0', for packing a bit plane through int(..., 2)
+_WALL_DIGITS = bytes(49 if i == ord("#") else 48 for i in range(256))
+_SPACE_DIGITS = bytes(49 if i == ord(" ") else 48 for i in range(256))
+# and back: '0' / '1' -> 0 / 1 (a 1 / 0 grid) or '.' / '#', and 0 / 1 / 2 -> '.' / '#' / ' '
+_DIGIT_VALUES = bytes.maketrans(b"01", b"\x00\x01")
+_DIGIT_CHARACTERS = bytes.maketrans(b"01", b".#")
+_VALUE_CHARACTERS = bytes.maketrans(b"\x00\x01\x02", b".# ")
+
+
+# packs a plane of '0' / '1' digits into bits, eight cells per byte
+def _pack(digits: bytes) -> bytes:
+    padded = digits + b"0" * (-len(digits) % 8)
+    return int(padded, 2).to_bytes(len(padded) // 8, "big")
+
+
+# unpacks a bit plane into one '0' / '1' digit per cell
+def _unpack(plane, size: int) -> bytes:
+    return format(int.from_bytes(plane, "big"), "b").zfill(len(plane) * 8)[:size].encode("ascii")
+
+
+def _little_endian(values: array) -> bytes:
+    if sys.byteorder != "little":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+# writes a maze of '#', '.' and ' ' cells (a Grid from read_mz, or a 2d list of characters) as a
+# .mzb file. masks also stores the wall masks (one byte per cell) and components the component
+# labels (four bytes per cell, so they are only worth it for mazes that are searched a lot)
+def write_mzb(maze, mzb_file: str, masks: bool = True, components: bool = False):
+    if not maze or not len(maze[0]):
+        raise ValueError("Maze cannot be empty.")
+    height, width = len(maze), len(maze[0])
+    grid = maze if isinstance(maze, Grid) else Grid(width, height, cells=cell_bytes(maze))
+    cells = bytes(grid.cells)
+    flags = HAS_SPACES if b" " in cells else 0
+
+    sections = [(b"WALL", _pack(cells.translate(_WALL_DIGITS)))]
+    if flags & HAS_SPACES:
+        sections.append((b"SPCE", _pack(cells.translate(_SPACE_DIGITS))))
+    if masks:
+        sections.append((b"MASK", bytes(WallIndex(grid, b"#").masks)))
+    if components:
+        index = ComponentIndex(grid, b".")
+        sections.append((b"CMPS", struct.pack("<I4x", index.count()) + _little_endian(array("q", index.sizes))
+                         + _little_endian(index.labels)))
+
+    offset = _HEADER.size + _ENTRY.size * len(sections)
+    directory = b""
+    for tag, data in sections:
+        offset += -offset % 8
+        directory += _ENTRY.pack(tag, offset, len(data), zlib.crc32(data))
+        offset += len(data)
+    with open(mzb_file, "wb") as file:
+        file.write(_HEADER.pack(MAGIC, FORMAT_VERSION, flags, width, height, len(sections), zlib.crc32(directory)))
+        file.write(directory)
+        for tag, data in sections:
+            file.write(b"\x00" * (-file.tell() % 8))
+            file.write(data)
+
+
+# whether a file is a .mzb maze, going by its first bytes rather than its name
+def is_mzb(maze_file: str) -> bool:
+    try:
+        with open(maze_file, "rb") as file:
+            return file.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+# header fields and the sections of a mapped .mzb file, with verify every section is also checked
+# against its crc32
+def _sections(data, verify: bool = False) -> Tuple[int, int, int, Dict[bytes, memoryview]]:
+    if len(data) < _HEADER.size:
+        raise ValueError("Not a valid .mzb file.")
+    magic, version, flags, width, height, count, checksum = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("Not a valid .mzb file.")
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported .mzb format version: {version}")
+    end = _HEADER.size + _ENTRY.size * count
+    if len(data) < end or zlib.crc32(data[_HEADER.size:end]) != checksum:
+        raise ValueError("The .mzb file is corrupt (bad header checksum).")
+    view = memoryview(data)
+    sections = {}
+    for number in range(count):
+        tag, offset, length, crc = _ENTRY.unpack_from(data, _HEADER.size + _ENTRY.size * number)
+        section = view[offset:offset + length]
+        if len(section) != length or verify and zlib.crc32(section) != crc:
+            raise ValueError(f"The .mzb file is corrupt (bad {tag.decode('ascii', 'replace')} section).")
+        sections[tag] = section
+    if b"WALL" not in sections or len(sections[b"WALL"]) != (width * height + 7) // 8:
+        raise ValueError("The .mzb file has no wall plane.")
+    return flags, width, height, sections
+
+
+# the cells of a grid from its bit planes: 1 / 0 with binary, otherwise '#', '.' and ' '. numpy
+# unpacks a plane in one call and turns the bits into characters in place, without it the planes
+# go through the big integer digits above, which is slower than reading the .mz file
+def _cells(sections: Dict[bytes, memoryview], size: int, binary: bool, spaces: bool) -> bytearray:
+    if np is not None:
+        cells = np.unpackbits(np.frombuffer(sections[b"WALL"], np.uint8), count=size)
+        if not binary:
+            # 0 -> '.' and 1 -> '#', the uint8 arithmetic wraps around
+            cells *= np.uint8((ord("#") - ord(".")) % 256)
+            cells += np.uint8(ord("."))
+            if spaces:
+                cells[np.unpackbits(np.frombuffer(sections[b"SPCE"], np.uint8), count=size).view(bool)] = ord(" ")
+        return bytearray(cells)
+
+    digits = _unpack(sections[b"WALL"], size)
+    if binary:
+        return bytearray(digits.translate(_DIGIT_VALUES))
+    if spaces:
+        # wall digit + 2 * space digit, added as big integers: 0 -> '.', 1 -> '#', 2 -> ' '
+        merged = int.from_bytes(digits.translate(_DIGIT_VALUES), "big") \
+            + 2 * int.from_bytes(_unpack(sections[b"SPCE"], size).translate(_DIGIT_VALUES), "big")
+        return bytearray(merged.to_bytes(size, "big").translate(_VALUE_CHARACTERS))
+    return bytearray(digits.translate(_DIGIT_CHARACTERS))
+
+
+# reads a .mzb file. binary=False gives a Grid of ascii '#', '.' and ' ' like read_mz, binary=True
+# a Grid of 1 (wall) and 0 (path) like load_maze_from_file in maze.py. the indexes stored in the
+# file are put in grid.indexes, so nothing has to rebuild them. strict rejects what the strict
+# .mz reader would: spaces and a border that isn't all walls. verify checks every section against
+# its checksum, not just the header
+def read_mzb(mzb_file: str, binary: bool = False, strict: bool = False, verify: bool = False) -> Grid:
+    try:
+        with open(mzb_file, "rb") as file:
+            data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_COPY)
+    except (OSError, ValueError):
+        raise IOError(f"Cannot read the maze file: {mzb_file}")
+    flags, width, height, sections = _sections(data, verify)
+    size = width * height
+    if size == 0:
+        raise ValueError("Maze file is empty.")
+
+    spaces = bool(flags & HAS_SPACES) and b"SPCE" in sections
+    grid = Grid(width, height, cells=_cells(sections, size, binary, spaces))
+    if strict:
+        if spaces:
+            raise ValueError("Maze contains invalid characters.")
+        if not is_enclosed(Grid(width, height, cells=grid.cells.translate(_VALUE_CHARACTERS)) if binary else grid):
+            raise ValueError("Maze is not fully enclosed by walls.")
+
+    if b"MASK" in sections and len(sections[b"MASK"]) == size:
+        wall_values = b"\x01" if binary else b"#"
+        grid.indexes[("walls", wall_values)] = WallIndex.from_masks(grid, bytearray(sections[b"MASK"]), wall_values)
+    # with spaces the open cells of a 1 / 0 grid are not the same as the '.' cells the labels are for
+    if b"CMPS" in sections and not (binary and spaces):
+        section = sections[b"CMPS"]
+        count = struct.unpack_from("<I", section)[0]
+        sizes = section[8:8 + 8 * (count + 1)].cast("q")
+        labels = section[8 + 8 * (count + 1):].cast("i")
+        if sys.byteorder != "little":
+            sizes, labels = array("q", sizes), array("i", labels)
+            sizes.byteswap()
+            labels.byteswap()
+        if len(labels) == size:
+            open_values = b"\x00" if binary else b"."
+            grid.indexes[("components", open_values)] = ComponentIndex.from_labels(grid, labels, list(sizes),
+                                                                                    open_values)
+    return grid
+
+
+# converts a .mz file to .mzb
+def mz_to_mzb(mz_file: str, mzb_file: str, masks: bool = True, components: bool = False):
+    write_mzb(read_mz(mz_file, strict=False), mzb_file, masks, components)
+
+
+# converts a .mzb file back to a .mz file, one line per row, checking every section on the way
+def mzb_to_mz(mzb_file: str, mz_file: str):
+    grid = read_mzb(mzb_file, verify=True)
+    width, cells = grid.width, grid.cells
+    with open(mz_file, "wb") as file:
+        for start in range(0, len(cells), width):
+            file.write(cells[start:start + width] + b"\n")
+
+
+# command line: python mzb_format.py big.mz big.mzb, or big.mzb big.mz to convert back
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert mazes between .mz and the binary .mzb format")
+    parser.add_argument("input", help="The .mz or .mzb file to convert (the format is detected)")
+    parser.add_argument("output", help="The file to write, in the other format")
+    parser.add_argument("--no-masks", help="Don't store the wall masks in the .mzb file", action="store_true")
+    parser.add_argument("--components", help="Also store the component labels in the .mzb file", action="store_true")
+    args = parser.parse_args()
+
+    try:
+        began = time.perf_counter()
+        if is_mzb(args.input):
+            mzb_to_mz(args.input, args.output)
+        else:
+            mz_to_mzb(args.input, args.output, not args.no_masks, args.components)
+        print(f"Wrote {args.output} in {time.perf_counter() - began:.2f}s")
+    except Exception as e:
+        print("Error:", e)
+        sys.exit(1)
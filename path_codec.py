@@ -0,0 +1,124 @@
+import re
+from typing import Iterable, Iterator, List, Sequence, TextIO, Tuple
+from search import MOVES
+
+Position = Tuple[int, int]
+
+# the runner's names for the moves in search.MOVES (Up, Down, Left, Right), as dfs_explore gives them
+DIRECTIONS = ["North", "South", "West", "East"]
+LETTERS = "".join(action for _, _, action in MOVES)  # "UDLR"
+_STEPS = {(dr, dc): move for move, (dr, dc, _) in enumerate(MOVES)}
+_DIRECTION_MOVES = {direction: move for move, direction in enumerate(DIRECTIONS)}
+# a run of the same move, and one letter plus its count in a run-length string
+_RUNS = re.compile(rb"\x00+|\x01+|\x02+|\x03+")
+_RUN_TEXT = re.compile(r"([UDLR])(\d*)")
+_RUN_LENGTH = re.compile(r"(?:[UDLR]\d*)*")
+
+# cells written to a file at a time by write_cells
+WRITE_CHUNK = 4096
+
+
+# a path kept as its first cell plus one byte per step (the move number from search.MOVES, the
+# same bytes the result cache stores), instead of a list with a tuple for every cell. it iterates
+# and measures like the list of cells, so render, path_viewport and write_statistics take it as it
+# is, and it converts losslessly to that list, to the directions dfs_explore returns and to a
+# run-length string such as "R12D3L7". positions are (row, column) like shortest_path.
+class CompactPath:
+    __slots__ = ("start", "moves")
+
+    def __init__(self, start: Position, moves: Iterable[int] = b""):
+        self.start = (start[0], start[1])
+        self.moves = bytearray(moves)
+
+    # from a list of cells, every one a single step from the one before
+    @classmethod
+    def from_path(cls, path: Sequence[Position]) -> "CompactPath":
+        if not path:
+            raise ValueError("A path needs at least one cell.")
+        moves = bytearray(len(path) - 1)
+        r, c = path[0]
+        for i in range(1, len(path)):
+            nr, nc = path[i]
+            move = _STEPS.get((nr - r, nc - c))
+            if move is None:
+                raise ValueError(f"Not a single step: {(r, c)} -> {(nr, nc)}")
+            moves[i - 1] = move
+            r, c = nr, nc
+        return cls(path[0], moves)
+
+    # from a start and the "North" / "East" / "South" / "West" actions of dfs_explore
+    @classmethod
+    def from_directions(cls, start: Position, directions: Iterable[str]) -> "CompactPath":
+        try:
+            return cls(start, bytes(_DIRECTION_MOVES[direction] for direction in directions))
+        except KeyError as e:
+            raise ValueError(f"Invalid direction {e.args[0]}.")
+
+    # from a start and a run-length string, a letter without a count is one step
+    @classmethod
+    def from_run_length(cls, start: Position, text: str) -> "CompactPath":
+        if not _RUN_LENGTH.fullmatch(text):
+            raise ValueError(f"Not a run-length path: {text}")
+        moves = bytearray()
+        for letter, count in _RUN_TEXT.findall(text):
+            moves += bytes([LETTERS.index(letter)]) * (int(count) if count else 1)
+        return cls(start, moves)
+
+    # number of cells, like len() of the list of cells
+    def __len__(self) -> int:
+        return len(self.moves) + 1
+
+    def __iter__(self) -> Iterator[Position]:
+        r, c = self.start
+        yield r, c
+        for move in self.moves:
+            dr, dc, _ = MOVES[move]
+            r, c = r + dr, c + dc
+            yield r, c
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, CompactPath):
+            return self.start == other.start and self.moves == other.moves
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"CompactPath({self.start}, {self.run_length()!r})"
+
+    # the last cell, from how many times each move is taken rather than a walk along the path
+    def end(self) -> Position:
+        r, c = self.start
+        for move, (dr, dc, _) in enumerate(MOVES):
+            count = self.moves.count(move)
+            r, c = r + dr * count, c + dc * count
+        return r, c
+
+    def to_path(self) -> List[Position]:
+        return list(self)
+
+    def directions(self) -> List[str]:
+        return [DIRECTIONS[move] for move in self.moves]
+
+    def run_length(self) -> str:
+        return "".join(f"{LETTERS[run[0]]}{len(run)}" for run in _RUNS.findall(self.moves))
+
+    # bytes held for the steps, one per step
+    def nbytes(self) -> int:
+        return len(self.moves)
+
+
+# writes cells as the printed list of tuples, "[(1, 1), (1, 2)]", a chunk at a time so the
+# text of a long path is never built in memory all at once
+def write_cells(file: TextIO, cells: Iterable[Position]):
+    file.write("[")
+    chunk = []
+    first = True
+    for cell in cells:
+        chunk.append(f"({cell[0]}, {cell[1]})")
+        if len(chunk) == WRITE_CHUNK:
+            file.write(("" if first else ", ") + ", ".join(chunk))
+            first = False
+            chunk.clear()
+    if chunk:
+        file.write(("" if first else ", ") + ", ".join(chunk))
+    file.write("]")
+
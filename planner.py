@@ -0,0 +1,200 @@
+from array import array
+from heapq import heappush, heappop
+from typing import Iterable, List, Optional, Tuple
+from grid import Grid, passable_mask
+from search import MOVES
+
+Position = Tuple[int, int]
+
+INFINITY = 2 ** 31 - 1
+
+
+# keeps a shortest path between a start and a goal up to date while the maze changes, with
+# D* Lite (an incremental A* that searches from the goal back towards the start). after walls are
+# added or removed only the cells whose distance to the goal actually changed are searched again,
+# so an edit costs work in proportion to the region it affects rather than the maze size, and
+# moving the start along the path (a runner walking it) costs almost nothing.
+# positions are (row, column) like shortest_path in maze_runner.py. the planner writes wall
+# changes into the maze it owns: '#' / '.' for character mazes, 1 / 0 for the mazes from maze.py.
+class IncrementalPlanner:
+    def __init__(self, maze, starting: Position, goal: Position, open_values: bytes = b"."):
+        self.maze = maze
+        self.rows, self.cols = len(maze), len(maze[0])
+        self.open_values = open_values
+        self.wall_value, self.open_value = (ord("#"), ord(".")) if open_values == b"." else (1, 0)
+        self.open_cells = passable_mask(maze, open_values)
+        self.expanded = 0  # cells expanded since the planner was made
+        self.last_expanded = 0  # cells expanded by the latest search or repair
+        self.start = self._cell(starting, "starting")
+        self._reset(self._cell(goal, "goal"))
+
+    def _cell(self, position: Position, what: str) -> int:
+        if not (0 <= position[0] < self.rows and 0 <= position[1] < self.cols):
+            raise ValueError(f"Invalid {what} position: {position}")
+        return position[0] * self.cols + position[1]
+
+    # forgets everything searched so far, needed when the goal moves
+    def _reset(self, goal: int):
+        size = self.rows * self.cols
+        self.goal = goal
+        self.g = array("i", [INFINITY]) * size  # distance to the goal as last searched
+        self.rhs = array("i", [INFINITY]) * size  # distance to the goal from the neighbours' g
+        self.rhs[goal] = 0
+        self.km = 0  # how far the start has moved, added to every key instead of re-keying the queue
+        self.last_start = self.start
+        self.queue = []
+        self.queued = {}  # cell -> its key in the queue, older heap entries for a cell are skipped
+        self._push(goal)
+        self.dirty = True
+
+    def _heuristic(self, a: int, b: int) -> int:
+        ar, ac = divmod(a, self.cols)
+        br, bc = divmod(b, self.cols)
+        return abs(ar - br) + abs(ac - bc)
+
+    def _key(self, cell: int) -> Tuple[int, int]:
+        best = min(self.g[cell], self.rhs[cell])
+        return best + self._heuristic(self.start, cell) + self.km, best
+
+    def _push(self, cell: int):
+        key = self._key(cell)
+        self.queued[cell] = key
+        heappush(self.queue, (key, cell))
+
+    def _neighbors(self, cell: int):
+        r, c = divmod(cell, self.cols)
+        for dr, dc, _ in MOVES:
+            if 0 <= r + dr < self.rows and 0 <= c + dc < self.cols:
+                yield cell + dr * self.cols + dc
+
+    # recomputes rhs of a cell from its neighbours and puts it in the queue if it is inconsistent
+    def _update(self, cell: int):
+        if cell != self.goal:
+            best = INFINITY
+            if self.open_cells[cell]:
+                g = self.g
+                for neighbor in self._neighbors(cell):
+                    if self.open_cells[neighbor] and g[neighbor] + 1 < best:
+                        best = g[neighbor] + 1
+            self.rhs[cell] = best
+        if self.g[cell] != self.rhs[cell]:
+            self._push(cell)
+        else:
+            self.queued.pop(cell, None)
+
+    def _search(self):
+        g, rhs, queue, queued = self.g, self.rhs, self.queue, self.queued
+        start = self.start
+        expanded = 0
+        while queue:
+            key, cell = queue[0]
+            if queued.get(cell) != key:  # an older entry for this cell
+                heappop(queue)
+                continue
+            if key >= self._key(start) and rhs[start] == g[start]:
+                break
+            heappop(queue)
+            expanded += 1
+            new_key = self._key(cell)
+            if key < new_key:
+                self._push(cell)
+            elif g[cell] > rhs[cell]:
+                del queued[cell]
+                g[cell] = rhs[cell]
+                for neighbor in self._neighbors(cell):
+                    self._update(neighbor)
+            else:
+                g[cell] = INFINITY
+                self._update(cell)
+                for neighbor in self._neighbors(cell):
+                    self._update(neighbor)
+        self.last_expanded = expanded
+        self.expanded += expanded
+        self.dirty = False
+
+    # re-reads the given (row, column) cells from the maze after they were changed outside the
+    # planner (e.g. by add_horizontal_wall, with (y, x) of the cells it set) and repairs around them
+    def update_cells(self, changed: Iterable[Position]):
+        table = bytes(1 if i in self.open_values else 0 for i in range(256))
+        for r, c in changed:
+            cell = self._cell((r, c), "changed")
+            value = self.maze[r][c]
+            is_open = table[ord(value) if isinstance(value, str) else value]
+            if is_open == self.open_cells[cell]:
+                continue
+            self.open_cells[cell] = is_open
+            self._update(cell)
+            for neighbor in self._neighbors(cell):
+                self._update(neighbor)
+            self.dirty = True
+
+    def _write(self, position: Position, value: int):
+        r, c = position
+        if isinstance(self.maze, Grid):
+            self.maze.set(c, r, value)
+        elif isinstance(self.maze[r][c], str):
+            self.maze[r][c] = chr(value)
+        else:
+            self.maze[r][c] = value
+
+    # puts walls on the given (row, column) cells of the maze
+    def add_walls(self, positions: Iterable[Position]):
+        positions = list(positions)
+        for position in positions:
+            self._cell(position, "wall")
+            self._write(position, self.wall_value)
+        self.update_cells(positions)
+
+    # clears the given (row, column) cells of the maze
+    def remove_walls(self, positions: Iterable[Position]):
+        positions = list(positions)
+        for position in positions:
+            self._cell(position, "wall")
+            self._write(position, self.open_value)
+        self.update_cells(positions)
+
+    def add_wall(self, row: int, col: int):
+        self.add_walls([(row, col)])
+
+    def remove_wall(self, row: int, col: int):
+        self.remove_walls([(row, col)])
+
+    # the runner moved, usually one step along the path. nothing already searched is thrown away
+    def move_start(self, starting: Position):
+        start = self._cell(starting, "starting")
+        self.km += self._heuristic(self.last_start, start)
+        self.last_start = self.start = start
+        self.dirty = True
+
+    # a new goal means distances to a different cell, so the search starts over
+    def set_goal(self, goal: Position):
+        self._reset(self._cell(goal, "goal"))
+
+    # steps from the start to the goal, -1 when the goal can't be reached
+    def distance(self) -> int:
+        if not (self.open_cells[self.start] and self.open_cells[self.goal]):
+            return -1
+        if self.dirty:
+            self._search()
+        return -1 if self.g[self.start] >= INFINITY else self.g[self.start]
+
+    # shortest path from the start to the goal, None when there isn't one. each step goes to the
+    # open neighbour with the smallest distance, the first one (Up, Down, Left, Right) on a tie
+    def path(self) -> Optional[List[Position]]:
+        remaining = self.distance()
+        if remaining == -1:
+            return None
+        g, cols = self.g, self.cols
+        current = self.start
+        path = [divmod(current, cols)]
+        while current != self.goal:
+            current = min((n for n in self._neighbors(current) if self.open_cells[n]), key=g.__getitem__)
+            path.append(divmod(current, cols))
+        return path
+
+    # same result shape as shortest_path: (path, cells expanded by the search or repair it needed)
+    def shortest_path(self) -> Tuple[List[Position], int]:
+        path = self.path()
+        if path is None:
+            raise ValueError("No path found from starting to goal.")
+        return path, self.last_expanded
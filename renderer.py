@@ -0,0 +1,96 @@
+import sys
+from typing import Iterable, Iterator, List, Optional, Sequence, TextIO, Tuple
+from grid import cell_bytes
+
+Position = Tuple[int, int]
+Viewport = Tuple[int, int, int, int]  # top, left, bottom, right (bottom and right not included)
+
+# draws a maze with a path on it. the path is marked in one pass into a bitmap with one byte per
+# cell (0 = not on the path, otherwise the glyph to draw), then every row is built from the maze
+# row and the bitmap row with a few whole-row byte operations, so drawing costs O(cells + path)
+# instead of checking every cell against the path list. rows are written to the output as they
+# are built and only the cells inside the viewport are touched at all.
+# positions are (row, column) like shortest_path in maze_runner.py.
+
+PATH_GLYPH = ord("@")
+
+# glyph of the runner for each orientation, pointing the way it moves on the screen when north is
+# row - 1 (up the screen) as in runner_extension.py and the wall masks. runner.py moves north to
+# y + 1, down the screen, so one of its runners facing N is drawn with "S" and the other way round
+ORIENTATION_GLYPHS = {"N": ord("^"), "E": ord(">"), "S": ord("v"), "W": ord("<")}
+
+# glyph for each step of a path drawn with arrows, keyed by the (row, column) change of the move
+ARROW_GLYPHS = {(-1, 0): ord("^"), (0, 1): ord(">"), (1, 0): ord("v"), (0, -1): ord("<")}
+
+# translate tables for the cells themselves: character mazes are drawn as they are,
+# the 0/1 mazes from maze.py are drawn as . and #
+IDENTITY = bytes(range(256))
+WALL_DISPLAY = b".#" + IDENTITY[2:]
+
+# 0xff for a cell with no glyph (keep the maze byte) and 0x00 for a cell with one (drop it)
+_KEEP = b"\xff" + b"\x00" * 255
+
+
+# bitmap of the glyphs to draw, one byte per cell of the viewport (the whole maze by default),
+# row after row of it. with arrows every path cell points to the next one and the last cell keeps
+# the path glyph, runner = (row, column, orientation) adds the runner on top of the path.
+# cells outside the viewport are skipped, so drawing a small part of a huge maze stays small
+def path_overlay(rows: int, cols: int, path: Iterable[Position] = (), arrows: bool = False,
+                 runner: Optional[Tuple[int, int, str]] = None, viewport: Optional[Viewport] = None) -> bytearray:
+    top, left, bottom, right = viewport or (0, 0, rows, cols)
+    width = right - left
+    overlay = bytearray((bottom - top) * width)
+    previous = None
+    for r, c in path:
+        if previous is not None and arrows and top <= previous[0] < bottom and left <= previous[1] < right:
+            overlay[(previous[0] - top) * width + previous[1] - left] = \
+                ARROW_GLYPHS.get((r - previous[0], c - previous[1]), PATH_GLYPH)
+        if top <= r < bottom and left <= c < right:
+            overlay[(r - top) * width + c - left] = PATH_GLYPH
+        previous = (r, c)
+    if runner is not None and top <= runner[0] < bottom and left <= runner[1] < right:
+        overlay[(runner[0] - top) * width + runner[1] - left] = ORIENTATION_GLYPHS[runner[2]]
+    return overlay
+
+
+# the part of the maze around a path: its bounding box grown by margin cells on every side and
+# clipped to the maze, the whole maze when there is no path
+def path_viewport(rows: int, cols: int, path: Sequence[Position], margin: int = 2) -> Viewport:
+    if not path:
+        return 0, 0, rows, cols
+    path_rows = [r for r, _ in path]
+    path_cols = [c for _, c in path]
+    return (max(min(path_rows) - margin, 0), max(min(path_cols) - margin, 0),
+            min(max(path_rows) + margin + 1, rows), min(max(path_cols) + margin + 1, cols))
+
+
+# yields the drawn rows of the viewport as bytes, without line endings
+def render_rows(maze, path: Iterable[Position] = (), viewport: Optional[Viewport] = None, arrows: bool = False,
+                runner: Optional[Tuple[int, int, str]] = None, display: bytes = IDENTITY) -> Iterator[bytes]:
+    rows = len(maze)
+    cols = len(maze[0]) if rows else 0
+    top, left, bottom, right = viewport or (0, 0, rows, cols)
+    cells = cell_bytes(maze)
+    overlay = path_overlay(rows, cols, path, arrows, runner, (top, left, bottom, right))
+    width = right - left
+    for r in range(top, bottom):
+        start = r * cols + left
+        line = cells[start:start + width].translate(display)
+        marks = overlay[(r - top) * width:(r - top + 1) * width]
+        if marks.count(0) != width:  # this row has something drawn on it
+            kept = int.from_bytes(line, "big") & int.from_bytes(marks.translate(_KEEP), "big")
+            line = (kept | int.from_bytes(marks, "big")).to_bytes(width, "big")
+        yield bytes(line)
+
+
+# writes the drawn maze to out (standard output by default) one row at a time
+def render(maze, path: Iterable[Position] = (), out: Optional[TextIO] = None, viewport: Optional[Viewport] = None,
+           arrows: bool = False, runner: Optional[Tuple[int, int, str]] = None, display: bytes = IDENTITY):
+    out = out or sys.stdout
+    for line in render_rows(maze, path, viewport, arrows, runner, display):
+        out.write(line.decode("latin-1") + "\n")
+
+
+# the drawn maze as one list of strings, for small mazes and tests
+def render_lines(maze, path: Iterable[Position] = (), **options) -> List[str]:
+    return [line.decode("latin-1") for line in render_rows(maze, path, **options)]
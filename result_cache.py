@@ -0,0 +1,134 @@
+import hashlib
+import os
+import sqlite3
+import time
+from typing import Dict, List, Optional, Tuple, Union
+from grid import cell_bytes
+from search import MOVES
+from path_codec import CompactPath
+
+Position = Tuple[int, int]
+
+# where the cache lives unless MAZE_RUNNER_CACHE points somewhere else
+DEFAULT_CACHE_FILE = ".maze_runner_cache.sqlite"
+
+# bounds before the least recently used results are evicted
+DEFAULT_MAX_ENTRIES = 10000
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+# hash of the maze contents alone, two files with the same cells (whatever their line endings
+# or file name) hash the same
+def maze_hash(maze) -> str:
+    rows = len(maze)
+    cols = len(maze[0]) if rows else 0
+    digest = hashlib.sha256(f"{rows}x{cols}\n".encode())
+    digest.update(cell_bytes(maze))
+    return digest.hexdigest()
+
+
+# key of one solve: the maze contents plus everything else that changes the answer.
+# mode tells the base runner and the extension apart since they count exploration steps differently
+def result_key(maze, starting: Optional[Position], goal: Optional[Position], algorithm: str, mode: str) -> str:
+    query = f"{maze_hash(maze)}|{starting}|{goal}|{algorithm}|{mode}"
+    return hashlib.sha256(query.encode()).hexdigest()
+
+
+# a path is stored as its first cell plus one byte per move (the move numbers from search.MOVES),
+# which is what a CompactPath already holds
+def encode_path(path: Union[List[Position], CompactPath]) -> Tuple[int, int, bytes]:
+    if isinstance(path, CompactPath):
+        return path.start[0], path.start[1], bytes(path.moves)
+    if not path:
+        return -1, -1, b""
+    steps = {(dr, dc): i for i, (dr, dc, _) in enumerate(MOVES)}
+    moves = bytes(steps[(b[0] - a[0], b[1] - a[1])] for a, b in zip(path, path[1:]))
+    return path[0][0], path[0][1], moves
+
+
+def decode_path(row: int, col: int, moves: bytes) -> List[Position]:
+    if row == -1:
+        return []
+    path = [(row, col)]
+    for move in moves:
+        dr, dc, _ = MOVES[move]
+        row, col = row + dr, col + dc
+        path.append((row, col))
+    return path
+
+
+# results of earlier solves kept in a local sqlite file so running the same maze, endpoints and
+# algorithm again returns straight away. each one keeps the path and the statistics statistics.txt
+# shows (score, exploration steps, path length). the least recently used entries are removed once there
+# are more than max_entries of them or they take more than max_bytes. hits and misses are counted
+# in the file too, so they add up over every run that shares it.
+class ResultCache:
+    def __init__(self, path: Optional[str] = None, max_entries: int = DEFAULT_MAX_ENTRIES, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = path or os.environ.get("MAZE_RUNNER_CACHE", DEFAULT_CACHE_FILE)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.connection = sqlite3.connect(self.path, timeout=30)
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, start_row INTEGER, start_col INTEGER,"
+                " moves BLOB, exploration_steps INTEGER, path_length INTEGER, score REAL, size INTEGER, last_used REAL)"
+            )
+            columns = [row[1] for row in self.connection.execute("PRAGMA table_info(results)")]
+            if "score" not in columns:  # a cache file written while the score wasn't stored
+                self.connection.execute("ALTER TABLE results ADD COLUMN score REAL")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)")
+            self.connection.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER)")
+            self.connection.execute("INSERT OR IGNORE INTO counters VALUES ('hits', 0), ('misses', 0)")
+
+    # returns (path, exploration steps, statistics) stored under key, or None. counts as a hit or a miss
+    def lookup(self, key: str) -> Optional[Tuple[List[Position], int, Dict[str, float]]]:
+        with self.connection:
+            row = self.connection.execute(
+                "SELECT start_row, start_col, moves, exploration_steps, path_length, score FROM results WHERE key = ?",
+                (key,)
+            ).fetchone()
+            if row is None:
+                self.connection.execute("UPDATE counters SET value = value + 1 WHERE name = 'misses'")
+                return None
+            self.connection.execute("UPDATE results SET last_used = ? WHERE key = ?", (time.time(), key))
+            self.connection.execute("UPDATE counters SET value = value + 1 WHERE name = 'hits'")
+        start_row, start_col, moves, exploration_steps, path_length, score = row
+        if score is None:
+            score = exploration_steps / 4 + path_length
+        statistics = {"score": score, "exploration_steps": exploration_steps, "path_length": path_length}
+        return decode_path(start_row, start_col, moves), exploration_steps, statistics
+
+    # saves a result with its statistics, then evicts the oldest entries if the cache grew past its bounds
+    def store(self, key: str, path: Union[List[Position], CompactPath], exploration_steps: int):
+        start_row, start_col, moves = encode_path(path)
+        score = exploration_steps / 4 + len(path)
+        size = len(moves) + len(key) + 64  # rough bytes on disk, the fixed part covers the numbers
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO results (key, start_row, start_col, moves, exploration_steps, path_length,"
+                " score, size, last_used) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, start_row, start_col, moves, exploration_steps, len(path), score, size, time.time()),
+            )
+            self._evict()
+
+    def _evict(self):
+        count, total = self.connection.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        cursor = self.connection.execute("SELECT key, size FROM results ORDER BY last_used")
+        doomed = []
+        for key, size in cursor:
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            doomed.append((key,))
+            count -= 1
+            total -= size
+        self.connection.executemany("DELETE FROM results WHERE key = ?", doomed)
+
+    # (hits, misses) over every run that used this cache file
+    def counters(self) -> Tuple[int, int]:
+        values = dict(self.connection.execute("SELECT name, value FROM counters"))
+        return values["hits"], values["misses"]
+
+    def close(self):
+        self.connection.close()
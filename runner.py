@@ -1,4 +1,6 @@
 from typing import Tuple, Optional, List
+from grid import Grid
+from wall_index import WallIndex, wall_index, rotation_table, NORTH, EAST, SOUTH, WEST
 
 # initializes a runner's starting position to (0,0) and orientation to north.
 def create_runner(x: int = 0, y: int = 0, orientation: str = "N"):
@@ -46,20 +48,38 @@ def forward(runner):
     return runner # returns runner
 
 
+# offsets of the cells on the (left, front, right) of the runner for each orientation,
+# for this runner north means y + 1 (see forward)
+SENSE_OFFSETS = {
+    "N": [(-1, 0), (0, 1), (1, 0)],
+    "E": [(0, 1), (1, 0), (0, -1)],
+    "S": [(1, 0), (0, -1), (-1, 0)],
+    "W": [(0, -1), (-1, 0), (0, 1)],
+}
+
+# the same (left, front, right) sides as wall mask bits, the masks count north as y - 1
+# so this runner's north is the mask's south
+RELATIVE_WALLS = rotation_table({
+    "N": (WEST, SOUTH, EAST),
+    "E": (SOUTH, EAST, NORTH),
+    "S": (EAST, NORTH, WEST),
+    "W": (NORTH, WEST, SOUTH),
+})
+
+
 # checks it theres any wall on way of runners immediate vicinity(left,right,front)
 # function returns a tuple of three Booleans, about whether or not there is a wall on(left,right,fron)
-def sense_walls(runner, maze: List[List[int]]) -> Tuple[bool, bool, bool]:
+# with a precomputed wall index (always the case for a Grid) it is a single lookup
+def sense_walls(runner, maze: List[List[int]], walls: Optional[WallIndex] = None) -> Tuple[bool, bool, bool]:
     x, y = runner["x"], runner["y"]
     orientation = runner["orientation"]
 
-    directions = {
-        "N": [(-1, 0), (0, 1), (1, 0)],
-        "E": [(0, 1), (1, 0), (0, -1)],
-        "S": [(1, 0), (0, -1), (-1, 0)],
-        "W": [(0, -1), (-1, 0), (0, 1)],
-    }
+    if walls is None and isinstance(maze, Grid):
+        walls = wall_index(maze)
+    if walls is not None and 0 <= x < walls.width and 0 <= y < walls.height:
+        return RELATIVE_WALLS[orientation][walls.masks[y * walls.width + x]]
 
-    left, front, right = directions[orientation]
+    left, front, right = SENSE_OFFSETS[orientation]
     maze_width, maze_height = len(maze[0]), len(maze)
 
 #this is a helper function to determine whether a neighboring position in a maze contains a wall or is out of bounds
@@ -71,43 +91,152 @@ def sense_walls(runner, maze: List[List[int]]) -> Tuple[bool, bool, bool]:
 
 
 #  moves runner forward if theres no wall and raises value error if wall
-def go_straight(runner, maze: List[List[int]]):
-    left, front, right = sense_walls(runner, maze)
+def go_straight(runner, maze: List[List[int]], walls: Optional[WallIndex] = None):
+    left, front, right = sense_walls(runner, maze, walls)
     if front:
         raise ValueError("There is a wall in front of the runner. The runner cannot go forward.")
     return forward(runner)  # returns the updated runner after the move
 
 # uses left hug alogrithm to mov runner based on wall position
-def move(runner, maze: List[List[int]]) -> Tuple[dict, str]:
-    left, front, right = sense_walls(runner, maze)
+def move(runner, maze: List[List[int]], walls: Optional[WallIndex] = None) -> Tuple[dict, str]:
+    left, front, right = sense_walls(runner, maze, walls)
 
     if not left:
         runner = turn(runner, "Left")
-        runner = go_straight(runner, maze)
+        runner = go_straight(runner, maze, walls)
         return runner, "LF"
     elif not front:
-        runner = go_straight(runner, maze)
+        runner = go_straight(runner, maze, walls)
         return runner, "F"
     elif not right:
         runner = turn(runner, "Right")
-        runner = go_straight(runner, maze)
+        runner = go_straight(runner, maze, walls)
         return runner, "RF"
     else:
         runner = turn(runner, "Right")
         runner = turn(runner, "Right")
-        runner = go_straight(runner, maze)
+        runner = go_straight(runner, maze, walls)
         return runner, "RRF"
 
 
+# the moves of the left hug rule in the order move() tries them, how far each one turns the
+# runner (in quarter turns to the right) and a code for a runner with walls on every side
+ORIENTATIONS = "NESW"
+ACTIONS = ("LF", "F", "RF", "RRF")
+ACTION_TURNS = (-1, 0, 1, 2)
+STUCK = len(ACTIONS)
+
+
+# the action move() takes for a runner facing orientation in a cell with the given wall mask
+def _move_action(orientation: str, mask: int) -> int:
+    left, front, right = RELATIVE_WALLS[orientation][mask]
+    if not left:
+        return 0
+    if not front:
+        return 1
+    if not right:
+        return 2
+    behind = RELATIVE_WALLS[ORIENTATIONS[(ORIENTATIONS.index(orientation) + 2) % 4]][mask][1]
+    return STUCK if behind else 3
+
+
+# translate tables from a wall mask to the action code, one per orientation
+MOVE_TABLES = [bytes(_move_action(o, mask) if mask < 16 else STUCK for mask in range(256)) for o in ORIENTATIONS]
+
+
+# the left hug rule compiled for a whole maze. a state is cell * 4 + orientation (cell = y * width + x,
+# orientation in NESW order), actions[state] is the code of the move the runner makes from it, and
+# step() gives the next state, so exploring is a loop over integers instead of dict updates.
+# the actions of every orientation are made with one translate of the wall masks.
+class TransitionTable:
+    __slots__ = ("width", "height", "actions", "deltas", "version")
+
+    def __init__(self, maze, walls: Optional[WallIndex] = None):
+        self.version = maze.version if isinstance(maze, Grid) else 0
+        self.rebuild(walls or wall_index(maze))
+
+    def rebuild(self, walls: WallIndex):
+        self.width, self.height = walls.width, walls.height
+        self.actions = bytearray(len(walls.masks) * 4)
+        for o, table in enumerate(MOVE_TABLES):
+            self.actions[o::4] = walls.masks.translate(table)
+        # how a move in each orientation changes the cell number, north is y + 1 for this runner
+        self.deltas = (self.width, 1, -self.width, -1)
+
+    def state(self, runner) -> int:
+        return (runner["y"] * self.width + runner["x"]) << 2 | ORIENTATIONS.index(runner["orientation"])
+
+    # (next state, action code) after one move from state, the state is unchanged when stuck
+    def step(self, state: int) -> Tuple[int, int]:
+        action = self.actions[state]
+        if action == STUCK:
+            return state, action
+        orientation = (state + ACTION_TURNS[action]) & 3
+        return ((state >> 2) + self.deltas[orientation]) << 2 | orientation, action
+
+
+# the transition table of a maze, kept with a Grid (in grid.indexes) until the grid changes
+def transition_table(maze) -> TransitionTable:
+    if not isinstance(maze, Grid):
+        return TransitionTable(maze)
+    table = maze.indexes.get("transitions")
+    if table is None:
+        table = maze.indexes["transitions"] = TransitionTable(maze)
+    elif table.version != maze.version:
+        table.rebuild(wall_index(maze))
+        table.version = maze.version
+    return table
+
+
+# explore() on the compiled transition table, same actions and final runner as the step by step walk
+def _explore_fast(runner, maze, goal: Tuple[int, int]) -> str:
+    table = transition_table(maze)
+    width, height = table.width, table.height
+    if not (0 <= runner["x"] < width and 0 <= runner["y"] < height):
+        raise ValueError(f"Runner is outside the maze: {(runner['x'], runner['y'])}")
+    target = goal[1] * width + goal[0] if 0 <= goal[0] < width and 0 <= goal[1] < height else -1
+    actions, deltas = table.actions, table.deltas
+    seen = bytearray(len(actions))
+    codes = bytearray()
+    state = table.state(runner)
+    try:
+        while state >> 2 != target:
+            if seen[state]:
+                raise RuntimeError(f"Goal {goal} is unreachable by wall following")
+            seen[state] = 1
+            action = actions[state]
+            if action == STUCK:
+                state = state & ~3 | (state + 2) & 3  # move() turns around before it finds the wall
+                raise RuntimeError("Error: There is a wall in front of the runner. The runner cannot go forward.")
+            orientation = (state + ACTION_TURNS[action]) & 3
+            state = ((state >> 2) + deltas[orientation]) << 2 | orientation
+            codes.append(action)
+    finally:
+        runner["y"], runner["x"] = divmod(state >> 2, width)
+        runner["orientation"] = ORIENTATIONS[state & 3]
+    return "".join([ACTIONS[code] for code in codes])
+
+
 # makes runner to go to goal and records steps taken to reach goal, and returns it.
-def explore(runner, maze: List[List[int]], goal: Optional[Tuple[int, int]] = None) -> str:
+# the walk stops with a RuntimeError once the runner is back in a cell facing the same way
+# without reaching the goal, from there it would only go round the same loop forever.
+# fast=True runs the same walk on the compiled transition table
+def explore(runner, maze: List[List[int]], goal: Optional[Tuple[int, int]] = None, fast: bool = False) -> str:
     if goal is None:
         goal = (len(maze[0]) - 1, len(maze) - 1)  # Default top-right corner
+    if fast:
+        return _explore_fast(runner, maze, goal)
 
+    walls = wall_index(maze)  # built once so every step is a single lookup
     actions = []
+    seen = set()
     while (runner["x"], runner["y"]) != goal:
+        state = (runner["x"], runner["y"], runner["orientation"])
+        if state in seen:
+            raise RuntimeError(f"Goal {goal} is unreachable by wall following")
+        seen.add(state)
         try:
-            runner, action = move(runner, maze)
+            runner, action = move(runner, maze, walls)
             actions.append(action)
         except ValueError as e:  # if move fn raises value error then it provides additonal context
             raise RuntimeError(f"Error: {str(e)}") from e
@@ -0,0 +1,135 @@
+from array import array
+from typing import List, Optional, Sequence, Tuple, Union
+from runner import ORIENTATIONS, ACTION_TURNS, STUCK, transition_table
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, the batch falls back to plain arrays
+    np = None
+
+# what each runner of a batch is doing
+RUNNING, REACHED, BOXED_IN, UNREACHABLE = 0, 1, 2, 3
+STATUS_NAMES = ("running", "reached", "boxed in", "unreachable")
+
+
+# many left hug runners (the explore() rule in runner.py) on one maze, stepped together.
+# every runner is a state in the maze's transition table, so one step is a lookup of all the
+# states in the next state table (one numpy fancy index when numpy is installed, otherwise a
+# loop that works each next state out from the table's action codes). a runner stops when it reaches its goal, when it has walls on every side,
+# or once it has made more moves than there are states, by then it is going round a loop.
+# positions are (x, y) and orientations N/E/S/W like create_runner.
+class RunnerBatch:
+    def __init__(self, maze, starts: Sequence[Tuple[int, int]], orientations: Union[str, Sequence[str]] = "N",
+                 goals: Union[None, Tuple[int, int], Sequence[Tuple[int, int]]] = None, use_numpy: Optional[bool] = None):
+        self.table = transition_table(maze)
+        width, height = self.table.width, self.table.height
+        count = len(starts)
+        if isinstance(orientations, str):
+            orientations = orientations * count if len(orientations) == 1 else orientations
+        if goals is None:
+            goals = (width - 1, height - 1)  # same default goal as explore
+        if len(goals) == 2 and isinstance(goals[0], int):
+            goals = [goals] * count
+        if len(orientations) != count or len(goals) != count:
+            raise ValueError("Need one orientation and one goal per runner.")
+        for x, y in starts:
+            if not (0 <= x < width and 0 <= y < height):
+                raise ValueError(f"Runner is outside the maze: {(x, y)}")
+
+        self.use_numpy = np is not None if use_numpy is None else use_numpy and np is not None
+        self.limit = len(self.table.actions)  # more moves than states means the runner is looping
+        states = [(y * width + x) << 2 | ORIENTATIONS.index(o) for (x, y), o in zip(starts, orientations)]
+        targets = [gy * width + gx if 0 <= gx < width and 0 <= gy < height else -1 for gx, gy in goals]
+        status = [REACHED if state >> 2 == target else RUNNING for state, target in zip(states, targets)]
+        if self.use_numpy:
+            self.states = np.array(states, dtype=np.int64)
+            self.targets = np.array(targets, dtype=np.int64)
+            self.status = np.array(status, dtype=np.uint8)
+            self.steps = np.zeros(count, dtype=np.int64)
+            self.next_states = self._numpy_next_states()
+        else:
+            self.states = array("q", states)
+            self.targets = array("q", targets)
+            self.status = array("B", status)
+            self.steps = array("q", [0]) * count
+            self.active = [i for i in range(count) if status[i] == RUNNING]
+
+    # the next state of every state, worked out for the whole table at once
+    def _numpy_next_states(self):
+        actions = np.frombuffer(bytes(self.table.actions), dtype=np.uint8)
+        states = np.arange(len(actions), dtype=np.int64)
+        orientation = (states + np.array(ACTION_TURNS + (0,))[actions]) & 3
+        moved = ((states >> 2) + np.array(self.table.deltas)[orientation]) << 2 | orientation
+        return np.where(actions == STUCK, states, moved)
+
+    def __len__(self) -> int:
+        return len(self.states)
+
+    # moves every running runner once, returns how many are still running
+    def step(self) -> int:
+        if self.use_numpy:
+            return self._step_numpy()
+        states, steps, status, targets = self.states, self.steps, self.status, self.targets
+        actions, deltas = self.table.actions, self.table.deltas
+        still = []
+        for i in self.active:
+            state = states[i]
+            action = actions[state]
+            if action == STUCK:
+                status[i] = BOXED_IN
+                continue
+            orientation = (state + ACTION_TURNS[action]) & 3
+            state = states[i] = ((state >> 2) + deltas[orientation]) << 2 | orientation
+            steps[i] += 1
+            if state >> 2 == targets[i]:
+                status[i] = REACHED
+            elif steps[i] >= self.limit:
+                status[i] = UNREACHABLE
+            else:
+                still.append(i)
+        self.active = still
+        return len(still)
+
+    def _step_numpy(self) -> int:
+        active = np.flatnonzero(self.status == RUNNING)
+        current = self.states[active]
+        moved = self.next_states[current]
+        boxed = moved == current
+        self.status[active[boxed]] = BOXED_IN
+        active, moved = active[~boxed], moved[~boxed]
+        self.states[active] = moved
+        self.steps[active] += 1
+        reached = (moved >> 2) == self.targets[active]
+        self.status[active[reached]] = REACHED
+        self.status[active[~reached & (self.steps[active] >= self.limit)]] = UNREACHABLE
+        return int(np.count_nonzero(self.status == RUNNING))
+
+    # steps until no runner is running (or max_steps steps), returns which runners reached their goal
+    def run(self, max_steps: Optional[int] = None) -> List[bool]:
+        taken = 0
+        running = len(self) - self.count(REACHED, BOXED_IN, UNREACHABLE)
+        while running and (max_steps is None or taken < max_steps):
+            running = self.step()
+            taken += 1
+        return self.reached()
+
+    def reached(self) -> List[bool]:
+        return [status == REACHED for status in self.status.tolist()]
+
+    # number of runners in any of the given statuses
+    def count(self, *statuses: int) -> int:
+        values = self.status.tolist()
+        return sum(values.count(status) for status in statuses)
+
+    # runners per status name, e.g. {"running": 0, "reached": 812, "boxed in": 3, "unreachable": 185}
+    def summary(self) -> dict:
+        return {name: self.count(status) for status, name in enumerate(STATUS_NAMES)}
+
+    # (x, y, orientation) of every runner
+    def positions(self) -> List[Tuple[int, int, str]]:
+        width = self.table.width
+        return [((state >> 2) % width, (state >> 2) // width, ORIENTATIONS[state & 3]) for state in self.states.tolist()]
+
+    # moves made by every runner so far
+    def moves(self) -> List[int]:
+        return self.steps.tolist()
@@ -1,4 +1,10 @@
-from typing import Tuple, Optional, List
+from array import array
+from itertools import permutations
+from typing import Tuple, Optional, List, Union
+from grid import Grid
+from wall_index import WallIndex, wall_index, rotation_table, NORTH, EAST, SOUTH, WEST
+from instrumentation import Instrumentation
+from path_codec import CompactPath, DIRECTIONS
 
 # initializes a runner's starting position to (0,0) and orientation to north.
 def create_runner(x: int = 0, y: int = 0, orientation: str = "N"):
@@ -89,21 +95,40 @@ def is_within_bounds(x, y, maze):
     return 0 <= y < len(maze) and 0 <= x < len(maze[0])
 
 
+# (left, front, right, back) sides for each orientation as wall mask bits, north is y - 1 here
+RELATIVE_WALLS = rotation_table({
+    "N": (WEST, NORTH, EAST, SOUTH),
+    "E": (NORTH, EAST, SOUTH, WEST),
+    "S": (EAST, SOUTH, WEST, NORTH),
+    "W": (SOUTH, WEST, NORTH, EAST),
+})
+
+
+# returns the wall index this runner senses with, walls are the '#' cells
+def maze_walls(maze) -> WallIndex:
+    return wall_index(maze, b"#")
+
+
 # fucntion detects presene of wall around runner based on its orientation and position in maze
-def sense_walls(runner, maze):
+# with a precomputed wall index (always the case for a Grid) it is a single lookup
+def sense_walls(runner, maze, walls: Optional[WallIndex] = None):
     x, y = runner["x"], runner["y"]
     orientation = runner["orientation"]
 
-    # Helper function to check bounds
-    def is_within_bounds(x, y, maze):
-        return 0 <= y < len(maze) and 0 <= x < len(maze[0])
+    if walls is None and isinstance(maze, Grid):
+        walls = maze_walls(maze)
+    if walls is not None and orientation in RELATIVE_WALLS and 0 <= x < walls.width and 0 <= y < walls.height:
+        return RELATIVE_WALLS[orientation][walls.masks[y * walls.width + x]]
 
     # Get absolute wall directions (North, East, South, West)
     # Add boundary checks before accessing the maze
-    north = not is_within_bounds(x, y - 1, maze) or maze[y - 1][x] == "#"
-    east = not is_within_bounds(x + 1, y, maze) or maze[y][x + 1] == "#"
-    south = not is_within_bounds(x, y + 1, maze) or maze[y + 1][x] == "#"
-    west = not is_within_bounds(x - 1, y, maze) or maze[y][x - 1] == "#"
+    if walls is not None:  # runner is off the maze, so check the neighbours one at a time
+        north, east, south, west = walls.is_wall(x, y - 1), walls.is_wall(x + 1, y), walls.is_wall(x, y + 1), walls.is_wall(x - 1, y)
+    else:
+        north = not is_within_bounds(x, y - 1, maze) or maze[y - 1][x] == "#"
+        east = not is_within_bounds(x + 1, y, maze) or maze[y][x + 1] == "#"
+        south = not is_within_bounds(x, y + 1, maze) or maze[y + 1][x] == "#"
+        west = not is_within_bounds(x - 1, y, maze) or maze[y][x - 1] == "#"
 
     # Convert to relative walls (Left, Front, Right, Back) based on the orientation
     if orientation == "N":
@@ -117,74 +142,146 @@ def sense_walls(runner, maze):
 
 
 
-# it performs Depth first search to explore maze from current positon to goal of runner
-# it check wall surrounding runner and recursively explores available direction and backtraps
-# when necessary, it marks position visited to avoid revisting them, check all 4 possible direction,
-# if valid path found return actions taken to find path and path, fn ends when goal reached or no possible way
-def dfs_explore(runner, maze, goal, visited=None, verbose=False):
-
-    if visited is None:
-        visited = set()
+# the four moves the dfs tries, in this order: (direction, dx, dy, which relative wall guards it)
+# the wall used is the one sense_walls reports as (left, front, right, back) = (0, 1, 2, 3)
+DFS_MOVES = [("West", -1, 0, 0), ("East", 1, 0, 2), ("North", 0, -1, 1), ("South", 0, 1, 3)]
+ORIENTATIONS = "NESW"
+MOVE_ORIENTATION = [ORIENTATIONS.index(direction[0]) for direction, _, _, _ in DFS_MOVES]
+MOVE_ORDERS = list(permutations(range(4)))  # goal directed search stores one of these per cell
+MOVE_ORDER_IDS = {order: i for i, order in enumerate(MOVE_ORDERS)}
+# dfs move numbers to the move numbers of a CompactPath (search.MOVES order)
+ROUTE_MOVES = bytes.maketrans(bytes(range(4)), bytes(DIRECTIONS.index(direction) for direction, _, _, _ in DFS_MOVES))
+
+
+# depth first search with an explicit stack, so long corridors can't hit the recursion limit.
+# every cell on the current route costs a few bytes in flat arrays (position, orientation,
+# next move to try, move order) and the route itself is a bytearray of move numbers, so time and
+# memory are O(cells). it returns the same actions as the recursive version: a list of directions
+# from the runner to the goal, or None. on success the runner is left on the goal, otherwise it
+# is back where it started. goal_directed=True tries the moves that get closest to the goal first.
+# a stats dict is filled in with cells_entered and peak_stack (the longest the route got).
+# compact=True returns the route as a CompactPath from the runner's cell instead of the list of
+# directions, one byte per step (its cells are (y, x), see path_codec.py)
+def dfs_search(runner, maze, goal, visited=None, verbose=False, walls: Optional[WallIndex] = None,
+               goal_directed: bool = False, stats: Optional[dict] = None,
+               compact: bool = False) -> Optional[Union[List[str], CompactPath]]:
+    if walls is None:
+        walls = maze_walls(maze)
+    width, height, masks = walls.width, walls.height, walls.masks
+    gx, gy = goal
 
     x, y = get_x(runner), get_y(runner)
+    orientation = ORIENTATIONS.index(get_orientation(runner))
 
     # Print the current position and the goal
     if verbose and not visited:
         print(f"Visiting: ({x}, {y}), Goal: {goal}")
 
-    # Base case: if we have reached the goal
-    if (x, y) == goal:
+    # cells already seen, a byte per cell of the maze (on disk for a tiled maze, see TiledWalls).
+    # the callers set (if any) is copied in and kept up to date as well
+    seen = walls.new_plane()
+    if visited is not None:
+        for vx, vy in visited:
+            if 0 <= vx < width and 0 <= vy < height:
+                seen[vy * width + vx] = 1
+    seen_before = seen.count(1) if stats is not None else 0
+    peak = 1
+
+    def order_for(cx, cy):
+        if not goal_directed:
+            return 0
+        order = sorted(range(4), key=lambda m: (abs(cx + DFS_MOVES[m][1] - gx) + abs(cy + DFS_MOVES[m][2] - gy), m))
+        return MOVE_ORDER_IDS[tuple(order)]
+
+    def enter(cx, cy, co):
+        # Get the walls relative to the runner, one lookup unless the runner is off the maze
+        if 0 <= cx < width and 0 <= cy < height:
+            seen[cy * width + cx] = 1
+            relative = RELATIVE_WALLS[ORIENTATIONS[co]][masks[cy * width + cx]]
+        else:
+            relative = sense_walls({"x": cx, "y": cy, "orientation": ORIENTATIONS[co]}, maze, walls)
+        if visited is not None:
+            visited.add((cx, cy))
         if verbose:
-            print(f"Reached goal at: ({x}, {y})")
-        return []  # Found the goal, no more steps to take
-
-    # Mark the current position as visited
-    visited.add((x, y))
-
-    # Get the walls relative to the runner
-    left, front, right, back = sense_walls(runner, maze)
-
-    if verbose:
-        print(f"Wall Status at ({x}, {y}): Left={left}, Front={front}, Right={right}, Back={back}")
-        # verbose is helps while debugging
+            print(f"Wall Status at ({cx}, {cy}): Left={relative[0]}, Front={relative[1]}, Right={relative[2]}, Back={relative[3]}")
+        return relative
 
-    # Define possible directions in terms of (dx, dy, direction string)
-    directions = [
-        ("West", -1, 0, left),
-        ("East", 1, 0, right),
-        ("North", 0, -1, front),
-        ("South", 0, 1, back),
-    ]
+    def report():
+        if stats is not None:
+            stats.update(cells_entered=seen.count(1) - seen_before, peak_stack=peak)
 
-    for direction, dx, dy, has_wall in directions:
-        if not has_wall:  # Check if there's no wall in the given direction
-            new_x, new_y = x + dx, y + dy
-
-            # Skip out-of-bounds positions
-            if not (0 <= new_x < len(maze[0]) and 0 <= new_y < len(maze)):
-                continue
-
-            # Skip already visited positions
-            if (new_x, new_y) in visited:
-                continue
-
-            # Save the runner's state before moving
-            prev_state = runner.copy()
-
-            # Move the runner in the chosen direction
-            move(runner, direction)
-
-            # Recursively explore from the new position
-            actions = dfs_explore(runner, maze, goal, visited, verbose)
-
-            # If a valid path is found, append the current direction to the path
-            if actions is not None:
-                return [direction] + actions
+    def finish(route):
+        report()
+        if verbose:
+            print(f"Reached goal at: ({gx}, {gy})")
+        if route:
+            runner["x"], runner["y"] = gx, gy
+            runner["orientation"] = ORIENTATIONS[MOVE_ORIENTATION[route[-1]]]
+        if compact:
+            return CompactPath((y, x), route.translate(ROUTE_MOVES))
+        return [DFS_MOVES[m][0] for m in route]
+
+    # Base case: the runner already stands on the goal
+    if x == gx and y == gy:
+        return finish(b"")
+
+    # one entry per cell on the current route
+    xs, ys = array("i", [x]), array("i", [y])
+    orientations, next_moves, orders = bytearray([orientation]), bytearray([0]), bytearray([order_for(x, y)])
+    relatives = [enter(x, y, orientation)]
+    route = bytearray()  # move taken out of every cell on the route but the last
+
+    while xs:
+        k = next_moves[-1]
+        if k == 4:  # every move tried, backtrack
+            xs.pop(); ys.pop(); orientations.pop(); next_moves.pop(); orders.pop(); relatives.pop()
+            if route:
+                route.pop()
+            continue
+        next_moves[-1] = k + 1
+        m = MOVE_ORDERS[orders[-1]][k]
+        _, dx, dy, side = DFS_MOVES[m]
+        if relatives[-1][side]:  # Check if there's no wall in the given direction
+            continue
+        nx, ny = xs[-1] + dx, ys[-1] + dy
+        # Skip out-of-bounds and already visited positions
+        if not (0 <= nx < width and 0 <= ny < height) or seen[ny * width + nx]:
+            continue
+
+        route.append(m)
+        if nx == gx and ny == gy:
+            return finish(route)
+        xs.append(nx); ys.append(ny)
+        orientations.append(MOVE_ORIENTATION[m]); next_moves.append(0); orders.append(order_for(nx, ny))
+        relatives.append(enter(nx, ny, MOVE_ORIENTATION[m]))
+        if len(xs) > peak:
+            peak = len(xs)
+
+    report()
+    return None  # No valid moves found
 
-            # Backtrack: restore the runner's previous state
-            runner.update(prev_state)
 
-    return None  # No valid moves found
+# it performs Depth first search to explore maze from current positon to goal of runner
+# it check wall surrounding runner and explores available direction and backtraps
+# when necessary, it marks position visited to avoid revisting them, check all 4 possible direction,
+# if valid path found return actions taken to find path and path, fn ends when goal reached or no possible way
+# the search itself is dfs_search above, which uses an explicit stack instead of recursion
+# given an Instrumentation the search is timed as the dfs phase and its counters are recorded
+def dfs_explore(runner, maze, goal, visited=None, verbose=False, walls: Optional[WallIndex] = None,
+                goal_directed: bool = False, instrumentation: Optional[Instrumentation] = None,
+                compact: bool = False):
+    if instrumentation is None:
+        return dfs_search(runner, maze, goal, visited, verbose, walls, goal_directed, compact=compact)
+    stats = {}
+    with instrumentation.phase("dfs"):
+        actions = dfs_search(runner, maze, goal, visited, verbose, walls, goal_directed, stats, compact)
+    instrumentation.count("nodes_expanded", stats["cells_entered"])
+    instrumentation.maximum("peak_stack", stats["peak_stack"])
+    if actions is None:
+        instrumentation.record("path_length", 0)
+    else:  # a CompactPath counts its cells already, a list of directions has one less
+        instrumentation.record("path_length", len(actions) if compact else len(actions) + 1)
+    return actions
 
 # Note = I have used DFS which analyse all possible routes hence takes more steps
 # to find a path, compare to BFS
\ No newline at end of file
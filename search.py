@@ -0,0 +1,358 @@
+from collections import deque
+from heapq import heappush, heappop
+from time import perf_counter
+from typing import Callable, List, Optional, Tuple
+
+# search engines used by shortest_path in maze_runner.py and maze_runner_extension.py.
+# they all work on a flat open-cell mask (1 = the runner may stand there, see grid.passable_mask)
+# with positions as (row, column) like shortest_path, and all return
+# (path or None when the goal can't be reached, nodes expanded, nodes discovered).
+# on_discover(expanded so far, row, column, action) is called for every newly discovered cell,
+# that is what feeds the exploration log. searches that run from both ends add a fifth argument,
+# the side that found the cell ('S' from the start, 'G' from the goal).
+# given a stats dict an engine also fills in peak_frontier (largest queue / open list / frontier),
+# came_from_entries (cells with a parent recorded) and path_seconds (time spent rebuilding the path),
+# without one it skips all of that.
+
+# moves in the order shortest_path always tried them: Up, Down, Left, Right
+MOVES = [(-1, 0, 'U'), (1, 0, 'D'), (0, -1, 'L'), (0, 1, 'R')]
+
+Position = Tuple[int, int]
+SearchResult = Tuple[Optional[List[Position]], int, int]
+Discover = Optional[Callable[..., None]]
+
+
+# builds the path with build(*args), timing it into stats when there is one
+def _build_path(stats: Optional[dict], build: Callable, *args) -> List[Position]:
+    if stats is None:
+        return build(*args)
+    began = perf_counter()
+    path = build(*args)
+    stats["path_seconds"] = perf_counter() - began
+    return path
+
+
+# the plain breadth first search shortest_path always did, parents are kept as the move number
+# that reached each cell (one byte per cell) instead of a dict of tuples
+def bfs(open_cells, rows: int, cols: int, starting: Position, goal: Position, on_discover: Discover = None,
+        stats: Optional[dict] = None) -> SearchResult:
+    start, target = starting[0] * cols + starting[1], goal[0] * cols + goal[1]
+    came_from = bytearray(rows * cols)  # 0 = not seen, 1-4 = move that reached the cell, 5 = start
+    came_from[start] = 5
+    queue = deque([start])
+    expanded = discovered = 0
+    track, peak = stats is not None, 1
+
+    while queue:
+        if track and len(queue) > peak:
+            peak = len(queue)
+        current = queue.popleft()
+        expanded += 1
+        if current == target:
+            break
+        r, c = divmod(current, cols)
+        for move, (dr, dc, action) in enumerate(MOVES, 1):
+            nr, nc = r + dr, c + dc
+            if 0 <= nr < rows and 0 <= nc < cols:
+                neighbor = current + dr * cols + dc
+                if open_cells[neighbor] and not came_from[neighbor]:
+                    came_from[neighbor] = move
+                    queue.append(neighbor)
+                    discovered += 1
+                    if on_discover is not None:
+                        on_discover(expanded, nr, nc, action)
+
+    if track:
+        stats.update(peak_frontier=peak, came_from_entries=len(came_from) - came_from.count(0))
+    if not came_from[target]:
+        return None, expanded, discovered
+    return _build_path(stats, trace_moves, came_from, cols, target), expanded, discovered
+
+
+# walks the move plane back from the target to the start and returns the cells start first
+def trace_moves(came_from, cols: int, target: int) -> List[Position]:
+    path = []
+    current = target
+    while True:
+        path.append(divmod(current, cols))
+        move = came_from[current]
+        if move == 5:
+            break
+        dr, dc, _ = MOVES[move - 1]
+        current -= dr * cols + dc
+    path.reverse()
+    return path
+
+
+# A* with the manhattan heuristic, it heads for the goal instead of flooding every direction.
+# ties on f are broken towards the deeper node, which keeps the open list small on open grids
+def astar(open_cells, rows: int, cols: int, starting: Position, goal: Position, on_discover: Discover = None,
+          stats: Optional[dict] = None) -> SearchResult:
+    start, target = starting[0] * cols + starting[1], goal[0] * cols + goal[1]
+    gr, gc = goal
+    came_from = bytearray(rows * cols)
+    came_from[start] = 5
+    closed = bytearray(rows * cols)
+    cost = {start: 0}
+    heap = [(abs(starting[0] - gr) + abs(starting[1] - gc), 0, start)]
+    expanded = discovered = 0
+    track, peak = stats is not None, 1
+
+    while heap:
+        if track and len(heap) > peak:
+            peak = len(heap)
+        _, negative_g, current = heappop(heap)
+        if closed[current]:
+            continue
+        closed[current] = 1
+        expanded += 1
+        if current == target:
+            break
+        next_g = 1 - negative_g  # every step costs 1
+        r, c = divmod(current, cols)
+        for move, (dr, dc, action) in enumerate(MOVES, 1):
+            nr, nc = r + dr, c + dc
+            if 0 <= nr < rows and 0 <= nc < cols:
+                neighbor = current + dr * cols + dc
+                if open_cells[neighbor] and not closed[neighbor] and next_g < cost.get(neighbor, next_g + 1):
+                    cost[neighbor] = next_g
+                    came_from[neighbor] = move
+                    heappush(heap, (next_g + abs(nr - gr) + abs(nc - gc), -next_g, neighbor))
+                    discovered += 1
+                    if on_discover is not None:
+                        on_discover(expanded, nr, nc, action)
+
+    if track:
+        stats.update(peak_frontier=peak, came_from_entries=len(came_from) - came_from.count(0))
+    if not closed[target]:
+        return None, expanded, discovered
+    return _build_path(stats, trace_moves, came_from, cols, target), expanded, discovered
+
+
+# jump point search for 4-connected grids where every step costs the same. instead of adding
+# every neighbour it jumps in a straight line and only stops on cells where the route could need
+# to turn (a side opening appears that was blocked one step back) or on the goal, so on open
+# rooms and long corridors only a few cells ever reach the open list. moving vertically it also
+# looks sideways from every cell and stops if a horizontal jump from there finds something.
+def jps(open_cells, rows: int, cols: int, starting: Position, goal: Position, on_discover: Discover = None,
+        stats: Optional[dict] = None) -> SearchResult:
+    start, target = starting[0] * cols + starting[1], goal[0] * cols + goal[1]
+    gr, gc = goal
+    last_row = rows - 1
+
+    def jump_horizontal(current: int, c: int, dc: int) -> int:
+        r = current // cols
+        while True:
+            c += dc
+            if not 0 <= c < cols:
+                return -1
+            current += dc
+            if not open_cells[current]:
+                return -1
+            if current == target:
+                return current
+            if r > 0 and open_cells[current - cols] and not open_cells[current - cols - dc]:
+                return current
+            if r < last_row and open_cells[current + cols] and not open_cells[current + cols - dc]:
+                return current
+
+    def jump_vertical(current: int, r: int, dr: int) -> int:
+        c = current % cols
+        step = dr * cols
+        while True:
+            r += dr
+            if not 0 <= r < rows:
+                return -1
+            current += step
+            if not open_cells[current]:
+                return -1
+            if current == target:
+                return current
+            if c > 0 and open_cells[current - 1] and not open_cells[current - 1 - step]:
+                return current
+            if c < cols - 1 and open_cells[current + 1] and not open_cells[current + 1 - step]:
+                return current
+            if jump_horizontal(current, c, -1) != -1 or jump_horizontal(current, c, 1) != -1:
+                return current
+
+    # directions worth jumping in from a node, given the move that reached it (-1 for the start)
+    def directions(move: int):
+        if move == -1:
+            return range(4)
+        if move < 2:  # arrived moving vertically: keep going or turn sideways
+            return (move, 2, 3)
+        return (move, 0, 1)
+
+    parent = {start: (-1, -1)}  # jump point -> (previous jump point, move used to get here)
+    cost = {start: 0}
+    closed = set()
+    heap = [(abs(starting[0] - gr) + abs(starting[1] - gc), 0, start)]
+    expanded = discovered = 0
+    track, peak = stats is not None, 1
+
+    while heap:
+        if track and len(heap) > peak:
+            peak = len(heap)
+        _, negative_g, current = heappop(heap)
+        if current in closed:
+            continue
+        closed.add(current)
+        expanded += 1
+        if current == target:
+            break
+        g = -negative_g
+        r, c = divmod(current, cols)
+        for move in directions(parent[current][1]):
+            dr, dc, action = MOVES[move]
+            if dr:
+                point = jump_vertical(current, r, dr)
+            else:
+                point = jump_horizontal(current, c, dc)
+            if point == -1 or point in closed:
+                continue
+            pr, pc = divmod(point, cols)
+            new_cost = g + abs(pr - r) + abs(pc - c)
+            if new_cost < cost.get(point, new_cost + 1):
+                cost[point] = new_cost
+                parent[point] = (current, move)
+                heappush(heap, (new_cost + abs(pr - gr) + abs(pc - gc), -new_cost, point))
+                discovered += 1
+                if on_discover is not None:
+                    on_discover(expanded, pr, pc, action)
+
+    if track:
+        stats.update(peak_frontier=peak, came_from_entries=len(parent))
+    if target not in closed:
+        return None, expanded, discovered
+    return _build_path(stats, fill_jumps, parent, cols, start, target), expanded, discovered
+
+
+# the jump points are joined by straight runs, fills the cells in between back in
+def fill_jumps(parent, cols: int, start: int, target: int) -> List[Position]:
+    path = [divmod(target, cols)]
+    current = target
+    while current != start:
+        previous, move = parent[current]
+        dr, dc, _ = MOVES[move]
+        step = dr * cols + dc
+        while current != previous:
+            current -= step
+            path.append(divmod(current, cols))
+    path.reverse()
+    return path
+
+
+# breadth first search from the start and the goal at the same time, always growing the smaller
+# frontier by one whole level. the first level that touches the other side holds a shortest path
+# (every route is at least as long as both searched depths plus one, and that level checks every
+# edge that could be that long), so the best meeting edge found in it is stitched into the path.
+# on open mazes each side only has to get about half way, which is far fewer cells.
+def bidirectional(open_cells, rows: int, cols: int, starting: Position, goal: Position, on_discover: Discover = None,
+                  stats: Optional[dict] = None) -> SearchResult:
+    start, target = starting[0] * cols + starting[1], goal[0] * cols + goal[1]
+    if start == target:
+        if stats is not None:
+            stats.update(peak_frontier=1, came_from_entries=1, path_seconds=0.0)
+        return [starting], 1, 0
+    # like bfs, a goal that isn't open is never reached, the goal side must not search out of it.
+    # a start that isn't open (a ' ' start in the extension) is searched from, as bfs does
+    if not open_cells[target]:
+        if stats is not None:
+            stats.update(peak_frontier=1, came_from_entries=1)
+        return None, 0, 0
+
+    sides = "SG"
+    parents = ({start: -1}, {target: -1})  # cell -> the cell it was discovered from, per side
+    depths = ({start: 0}, {target: 0})
+    frontiers = [[start], [target]]
+    expanded = discovered = 0
+    peak = 2
+
+    while frontiers[0] and frontiers[1]:
+        peak = max(peak, len(frontiers[0]) + len(frontiers[1]))  # once per level, not per cell
+        side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+        mine, my_depth, other_depth = parents[side], depths[side], depths[1 - side]
+        best = None  # (route length, cell on this side, cell on the other side)
+        next_frontier = []
+        for current in frontiers[side]:
+            expanded += 1
+            depth = my_depth[current] + 1
+            r, c = divmod(current, cols)
+            for dr, dc, action in MOVES:
+                nr, nc = r + dr, c + dc
+                if 0 <= nr < rows and 0 <= nc < cols:
+                    neighbor = current + dr * cols + dc
+                    if not open_cells[neighbor]:
+                        continue
+                    if neighbor in other_depth:
+                        length = depth + other_depth[neighbor]
+                        if best is None or length < best[0]:
+                            best = (length, current, neighbor)
+                    if neighbor not in mine:
+                        mine[neighbor] = current
+                        my_depth[neighbor] = depth
+                        next_frontier.append(neighbor)
+                        discovered += 1
+                        if on_discover is not None:
+                            on_discover(expanded, nr, nc, action, sides[side])
+        if best is not None:
+            _, near, far = best
+            if side == 1:
+                near, far = far, near  # near is always the cell on the start side
+            if stats is not None:
+                stats.update(peak_frontier=peak, came_from_entries=len(parents[0]) + len(parents[1]))
+            return _build_path(stats, join_sides, parents, near, far, cols), expanded, discovered
+        frontiers[side] = next_frontier
+
+    if stats is not None:
+        stats.update(peak_frontier=peak, came_from_entries=len(parents[0]) + len(parents[1]))
+    return None, expanded, discovered
+
+
+# the full path through the meeting edge near -> far, start side first
+def join_sides(parents, near: int, far: int, cols: int) -> List[Position]:
+    cells = stitch(parents[0], near) + stitch(parents[1], far)[::-1]
+    return [divmod(cell, cols) for cell in cells]
+
+
+# follows one side's parents from a cell back to that side's root, returned root first
+def stitch(parents, cell: int) -> List[int]:
+    chain = []
+    while cell != -1:
+        chain.append(cell)
+        cell = parents[cell]
+    return chain[::-1]
+
+
+# searches the maze with its corridors collapsed into single edges, see junction_graph.py (which
+# builds on this module, so it is only imported once the engine is used)
+def junction(open_cells, rows: int, cols: int, starting: Position, goal: Position, on_discover: Discover = None,
+             stats: Optional[dict] = None) -> SearchResult:
+    from junction_graph import junction as engine
+    return engine(open_cells, rows, cols, starting, goal, on_discover, stats)
+
+
+# breadth first search a whole level at a time with numpy, same results as bfs, see frontier_search.py
+def frontier(open_cells, rows: int, cols: int, starting: Position, goal: Position, on_discover: Discover = None,
+             stats: Optional[dict] = None) -> SearchResult:
+    from frontier_search import frontier_bfs
+    return frontier_bfs(open_cells, rows, cols, starting, goal, on_discover, stats)
+
+
+# engines shortest_path can be asked for with algorithm=...
+ENGINES = {
+    "bfs": bfs,
+    "astar": astar,
+    "jps": jps,
+    "bidirectional": bidirectional,
+    "junction": junction,
+    "frontier": frontier,
+}
+
+
+# returns the engine for an algorithm name, raising a clear error for unknown ones
+def get_engine(algorithm: str):
+    try:
+        return ENGINES[algorithm]
+    except KeyError:
+        raise ValueError(f"Unknown search algorithm: {algorithm}. Use one of: {', '.join(ENGINES)}")
@@ -0,0 +1,371 @@
+import argparse
+import asyncio
+import json
+import os
+import signal
+import socket
+import sys
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import BrokenExecutor, Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from batch_solver import RUNNERS
+from components import reachable
+from maze_runner_extension import check_positions
+from exploration_log import NullSink
+from search import ENGINES
+
+# a local solver service for callers that send many small queries against the same few mazes:
+# mazes are read once and kept (with the indexes a Grid builds for itself) so a query is just
+# the search. it speaks one JSON object per line over a unix socket or localhost TCP:
+#   {"id": 7, "maze": "mazes/a.mz", "starting": [1, 1], "goal": [9, 9], "algorithm": "bfs", "mode": "base"}
+# and answers each line with one line, carrying the same id (answers can come back out of order):
+#   {"id": 7, "ok": true, "path": [[1, 1], ...], "exploration_steps": 40, "path_length": 17, "score": 27.0, ...}
+# or {"id": 7, "ok": false, "error": "..."}. {"op": "stats"} returns the counters and {"op": "ping"} just answers.
+# searches run in worker processes, every maze always goes to the same worker so it is only
+# loaded once, and the event loop only reads, routes and writes.
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_MAX_MAZES = 32
+DEFAULT_MAX_CELLS = 50_000_000
+
+
+# the mazes one worker keeps, least recently used first. a maze is read again when its file
+# changed (size or modification time) and the oldest ones are dropped past max_mazes or once
+# the mazes kept add up to more than max_cells
+class MazeStore:
+    def __init__(self, max_mazes: int = DEFAULT_MAX_MAZES, max_cells: int = DEFAULT_MAX_CELLS):
+        self.max_mazes = max_mazes
+        self.max_cells = max_cells
+        self.mazes: "OrderedDict[Tuple[str, str], tuple]" = OrderedDict()  # (file, mode) -> (stamp, cells, maze)
+        self.cells = 0
+        self.hits = self.loads = self.evictions = 0
+
+    def get(self, maze_file: str, mode: str = "base"):
+        if mode not in RUNNERS:
+            raise ValueError(f"Unknown mode: {mode}. Use one of: {', '.join(RUNNERS)}")
+        key = (os.path.abspath(maze_file), mode)
+        try:
+            status = os.stat(key[0])
+        except OSError:
+            raise IOError(f"Cannot read the maze file: {maze_file}")
+        stamp = (status.st_size, status.st_mtime_ns)
+        entry = self.mazes.get(key)
+        if entry is not None and entry[0] == stamp:
+            self.hits += 1
+            self.mazes.move_to_end(key)
+            return entry[2]
+        if entry is not None:
+            self._drop(key)
+        maze = RUNNERS[mode].maze_reader(maze_file, compact=True)
+        self.loads += 1
+        cells = len(maze) * len(maze[0])
+        self.mazes[key] = (stamp, cells, maze)
+        self.cells += cells
+        while len(self.mazes) > 1 and (len(self.mazes) > self.max_mazes or self.cells > self.max_cells):
+            self._drop(next(iter(self.mazes)))
+            self.evictions += 1
+        return maze
+
+    def _drop(self, key: Tuple[str, str]):
+        self.cells -= self.mazes.pop(key)[1]
+
+    def stats(self) -> Dict[str, int]:
+        return {"mazes": len(self.mazes), "cells": self.cells, "hits": self.hits, "loads": self.loads,
+                "evictions": self.evictions}
+
+
+# the store of the process (or thread) a query runs in, made by the pool initializer
+_store: Optional[MazeStore] = None
+
+
+def _start_worker(max_mazes: int, max_cells: int):
+    global _store
+    _store = MazeStore(max_mazes, max_cells)
+
+
+# answers one query with the mazes kept by this worker. never raises, errors come back in the answer
+def solve_query(request: dict) -> dict:
+    answer = {"id": request.get("id"), "ok": False}
+    began = time.perf_counter()
+    try:
+        mode = request.get("mode", "base")
+        algorithm = request.get("algorithm", "bfs")
+        if algorithm not in ENGINES:
+            raise ValueError(f"Unknown search algorithm: {algorithm}. Use one of: {', '.join(ENGINES)}")
+        if "maze" not in request:
+            raise ValueError("The query has no maze.")
+        maze = _store.get(request["maze"], mode)
+        starting = tuple(request["starting"]) if request.get("starting") else None
+        goal = tuple(request["goal"]) if request.get("goal") else None
+        answer["load_seconds"] = round(time.perf_counter() - began, 6)
+
+        # the extension answers an invalid position with a made up [(0, 0)] path (and prints a
+        # message to the worker's output), here it is an error like in the base version
+        if mode == "extension":
+            check_positions(maze, starting, goal)
+        # known only once the kept grid has a component index, built after its first failed search
+        if reachable(maze, starting or (0, 0), goal or (len(maze) - 1, len(maze[0]) - 1)) is False:
+            answer["unreachable"] = True
+            raise ValueError("No path found from starting to goal.")
+        runner = RUNNERS[mode]
+        with NullSink(runner.exploration_header(algorithm)) as sink:  # counted only, the extension scores need it
+            path, exploration_steps = runner.shortest_path(maze, starting, goal, algorithm=algorithm, log_sink=sink)
+        answer.update(ok=True, exploration_steps=exploration_steps, path_length=len(path),
+                      score=exploration_steps / 4 + len(path))
+        if request.get("path", True):
+            answer["path"] = path
+    except Exception as e:
+        answer["error"] = str(e)
+    answer["seconds"] = round(time.perf_counter() - began, 6)
+    return answer
+
+
+def _store_stats() -> Dict[str, int]:
+    return _store.stats()
+
+
+# the asyncio server. each worker is a pool of one process (or one thread with workers=0, which
+# keeps everything in this process), so a maze always lands on the worker that already has it.
+# a worker process that dies (killed for running out of memory on a huge maze, say) is replaced
+# by a fresh one, the queries it had fail with an error and the next ones load their mazes again
+class SolverDaemon:
+    def __init__(self, workers: int = 2, max_mazes: int = DEFAULT_MAX_MAZES, max_cells: int = DEFAULT_MAX_CELLS):
+        self.processes = workers > 0
+        self.limits = (max_mazes, max_cells)
+        self.pools: List[Executor] = [self._new_pool() for _ in range(max(workers, 1))]
+        self.requests = self.errors = self.in_flight = self.restarts = 0
+        self.began = time.time()
+
+    def _new_pool(self) -> Executor:
+        if self.processes:
+            return ProcessPoolExecutor(1, initializer=_start_worker, initargs=self.limits)
+        return ThreadPoolExecutor(1, initializer=_start_worker, initargs=self.limits)
+
+    # the worker a maze belongs to, the same one every time for the same file
+    def _worker(self, maze_file) -> int:
+        name = os.path.abspath(str(maze_file)).encode("utf-8", "replace")
+        return zlib.crc32(name) % len(self.pools)
+
+    # runs fn on a worker, replacing the worker's pool when it broke. several queries waiting on
+    # the same dead worker all fail, but only the first of them replaces it
+    async def _run(self, worker: int, fn, *args):
+        pool = self.pools[worker]
+        try:
+            return await asyncio.get_running_loop().run_in_executor(pool, fn, *args)
+        except BrokenExecutor:
+            if self.pools[worker] is pool:
+                self.pools[worker] = self._new_pool()
+                self.restarts += 1
+                pool.shutdown(wait=False)
+            raise RuntimeError(f"Worker {worker} stopped while answering, it has been restarted.")
+
+    async def answer(self, request: dict) -> dict:
+        op = request.get("op", "solve")
+        if op == "ping":
+            return {"id": request.get("id"), "ok": True}
+        if op == "stats":
+            workers = await asyncio.gather(*(self._run(worker, _store_stats) for worker in range(len(self.pools))),
+                                           return_exceptions=True)
+            return {"id": request.get("id"), "ok": True, "requests": self.requests, "errors": self.errors,
+                    "in_flight": self.in_flight, "restarts": self.restarts,
+                    "uptime_seconds": round(time.time() - self.began, 3),
+                    "workers": [{"error": str(w)} if isinstance(w, Exception) else w for w in workers]}
+        if op != "solve":
+            return {"id": request.get("id"), "ok": False, "error": f"Unknown op: {op}"}
+        self.requests += 1
+        self.in_flight += 1
+        try:
+            answer = await self._run(self._worker(request.get("maze")), solve_query, request)
+        except Exception as e:
+            answer = {"id": request.get("id"), "ok": False, "error": str(e)}
+        finally:
+            self.in_flight -= 1
+        self.errors += not answer["ok"]
+        return answer
+
+    # one connection: every line is answered by its own task, so a slow search doesn't hold up
+    # the queries sent after it
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        tasks = set()
+
+        # every line gets an answer line, whatever goes wrong while answering it
+        async def reply(line: bytes):
+            request_id = None
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    raise ValueError("A query must be a JSON object.")
+            except ValueError as e:
+                answer = {"id": None, "ok": False, "error": f"Bad query: {e}"}
+            else:
+                request_id = request.get("id")
+                try:
+                    answer = await self.answer(request)
+                except Exception as e:
+                    answer = {"id": request_id, "ok": False, "error": str(e)}
+            try:
+                text = json.dumps(answer)
+            except (TypeError, ValueError) as e:
+                text = json.dumps({"id": request_id, "ok": False, "error": f"Cannot encode the answer: {e}"})
+            writer.write(text.encode() + b"\n")
+            await writer.drain()
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if line.strip():
+                    task = asyncio.ensure_future(reply(line))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, unix_socket: Optional[str] = None):
+        if unix_socket:
+            server = await asyncio.start_unix_server(self.handle, unix_socket)
+            where = unix_socket
+        else:
+            server = await asyncio.start_server(self.handle, host, port)
+            where = f"{host}:{port}"
+        print(f"Solver daemon listening on {where} with {len(self.pools)} worker(s)", file=sys.stderr)
+        # stops on ctrl-c or kill, so the worker processes are shut down with it rather than left behind
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signal_number in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(signal_number, stop.set)
+            except (NotImplementedError, RuntimeError):  # not on windows, ctrl-c still raises KeyboardInterrupt
+                pass
+        async with server:
+            await stop.wait()
+        if unix_socket and os.path.exists(unix_socket):
+            os.remove(unix_socket)
+
+    def close(self):
+        for pool in self.pools:
+            pool.shutdown(cancel_futures=True)
+
+
+# a blocking client for the daemon, one connection kept open for any number of queries
+class SolverClient:
+    def __init__(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, unix_socket: Optional[str] = None,
+                 timeout: Optional[float] = None):
+        if unix_socket:
+            self.connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.connection.settimeout(timeout)
+            self.connection.connect(unix_socket)
+        else:
+            self.connection = socket.create_connection((host, port), timeout)
+        self.lines = self.connection.makefile("rb")
+
+    def __enter__(self) -> "SolverClient":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.lines.close()
+        self.connection.close()
+
+    # sends queries without waiting, read the answers with receive()
+    def send(self, *requests: dict):
+        self.send_lines([json.dumps(request) for request in requests])
+
+    # sends queries that are already JSON text, one per line
+    def send_lines(self, lines: List[str]):
+        self.connection.sendall(b"".join(line.strip().encode() + b"\n" for line in lines))
+
+    def receive(self) -> dict:
+        line = self.lines.readline()
+        if not line:
+            raise ConnectionError("The solver daemon closed the connection.")
+        return json.loads(line)
+
+    # one query and its answer
+    def query(self, request: dict) -> dict:
+        self.send(request)
+        return self.receive()
+
+
+def _address_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--host", help="Address to listen on / connect to", default=DEFAULT_HOST)
+    parser.add_argument("--port", help="TCP port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--socket", help="Use this unix socket instead of TCP", default=None)
+
+
+# command line for the daemon: python maze_runner.py serve [options]
+def serve_main(argv: List[str]):
+    parser = argparse.ArgumentParser(prog="serve", description="Keep mazes loaded and answer queries over a socket")
+    _address_arguments(parser)
+    parser.add_argument("--workers", help="Worker processes (0 = search in a thread of the daemon)", type=int,
+                        default=2)
+    parser.add_argument("--max-mazes", help="Mazes each worker keeps loaded", type=int, default=DEFAULT_MAX_MAZES)
+    parser.add_argument("--max-cells", help="Cells each worker keeps loaded in all", type=int,
+                        default=DEFAULT_MAX_CELLS)
+    args = parser.parse_args(argv)
+
+    daemon = SolverDaemon(args.workers, args.max_mazes, args.max_cells)
+    try:
+        asyncio.run(daemon.serve(args.host, args.port, args.socket))
+    except KeyboardInterrupt:
+        pass
+    except OSError as e:  # e.g. the port or socket is already in use
+        print("Error:", e)
+        return 1
+    finally:
+        daemon.close()
+    return 0
+
+
+# command line for queries: python maze_runner.py client maze.mz --starting 1,1 --goal 9,9,
+# or with no maze every line of standard input is sent as a query and the answers are printed
+def client_main(argv: List[str]):
+    parser = argparse.ArgumentParser(prog="client", description="Send queries to a running solver daemon")
+    parser.add_argument("maze", help="The maze file to solve (none: read JSON queries from standard input)", nargs="?")
+    _address_arguments(parser)
+    parser.add_argument("--starting", help='The starting position, e.g., "2,1"', default=None)
+    parser.add_argument("--goal", help='The goal position, e.g., "4,5"', default=None)
+    parser.add_argument("--algorithm", help="Search algorithm to use", choices=list(ENGINES), default="bfs")
+    parser.add_argument("--mode", help="Which runner's rules to solve with", choices=list(RUNNERS), default="base")
+    parser.add_argument("--stats", help="Print the daemon's counters", action="store_true")
+    args = parser.parse_args(argv)
+
+    try:
+        with SolverClient(args.host, args.port, args.socket) as client:
+            if args.stats:
+                print(json.dumps(client.query({"op": "stats"})))
+            elif args.maze:
+                request = {"id": 1, "maze": os.path.abspath(args.maze), "algorithm": args.algorithm, "mode": args.mode}
+                if args.starting:
+                    request["starting"] = list(map(int, args.starting.split(',')))
+                if args.goal:
+                    request["goal"] = list(map(int, args.goal.split(',')))
+                answer = client.query(request)
+                print(json.dumps(answer))
+                return 0 if answer["ok"] else 1
+            else:
+                lines = [line for line in sys.stdin if line.strip()]
+                client.send_lines(lines)  # as they are, the daemon answers a bad line with an error
+                for _ in lines:
+                    print(json.dumps(client.receive()))
+    except (OSError, ValueError) as e:
+        print("Error:", e)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["client"]:
+        sys.exit(client_main(sys.argv[2:]))
+    sys.exit(serve_main(sys.argv[1:]))
@@ -0,0 +1,53 @@
+import copy
+import pickle
+
+import pytest
+import maze
+import maze_extension
+import runner
+from grid import Grid
+
+
+# a write into a Grid has to reach the cached wall masks, whichever way it is made
+def test_rows_are_read_only():
+    grid = maze.create_maze(5, 5)
+    with pytest.raises(TypeError):
+        grid[1][2] = 1
+
+
+def test_set_updates_walls():
+    grid = maze.create_maze(5, 5)
+    assert maze.get_walls(grid, 2, 2) == (False, False, False, False)
+    grid.set(2, 1, 1)
+    assert maze.get_walls(grid, 2, 2) == (True, False, False, False)
+    assert maze_extension.get_walls(grid, 2, 2) == (True, False, False, False)
+
+
+def test_touch_after_writing_cells_updates_walls():
+    grid = maze.create_maze(5, 5)
+    maze.get_walls(grid, 2, 2)  # builds the wall masks before the write
+    grid.cells[1 * grid.width + 2] = 1
+    grid.touch((2, 1))
+    assert maze.get_walls(grid, 2, 2) == (True, False, False, False)
+
+
+def test_add_wall_updates_sense_walls_and_explore():
+    grid = maze.create_maze(5, 5)
+    walker = runner.create_runner(1, 1, "E")
+    assert runner.sense_walls(walker, grid) == (False, False, True)  # this runner's north is y + 1
+    runner.explore(runner.create_runner(1, 1, "E"), grid, (3, 3), fast=True)  # builds the transition table
+    maze.add_vertical_wall(grid, 1, 3)  # walls at (3, 1) and (2, 1), right in front of the runner
+    assert runner.sense_walls(walker, grid) == (False, True, True)
+    after = runner.explore(runner.create_runner(1, 1, "E"), grid, (3, 3), fast=True)
+    assert after == runner.explore(runner.create_runner(1, 1, "E"), Grid(5, 5, cells=bytearray(grid.cells)), (3, 3))
+
+
+# a Grid pickles and deep copies like the 2d lists did, the copy rebuilding its own indexes
+def test_pickle_and_deepcopy():
+    grid = maze.create_maze(5, 5)
+    maze.get_walls(grid, 2, 2)
+    for other in (pickle.loads(pickle.dumps(grid)), copy.deepcopy(grid)):
+        assert other == grid and other.cells is not grid.cells
+        other.set(2, 1, 1)
+        assert maze.get_walls(other, 2, 2) == (True, False, False, False)
+        assert maze.get_walls(grid, 2, 2) == (False, False, False, False)
@@ -0,0 +1,394 @@
+import argparse
+import mmap
+import struct
+import sys
+import tempfile
+import time
+import zlib
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+from mz_reader import RELAXED_CHARS
+from search import MOVES, Discover, SearchResult, _build_path
+from wall_index import EAST, NORTH, SOUTH, WEST
+
+Position = Tuple[int, int]
+
+# mazes too big for memory, kept on disk as square tiles of cells and read a tile at a time.
+# a .mzt file is
+#   header  magic, format version, flags, width, height, tile size, offset of the tile index
+#   tiles   tile_size x tile_size ascii cells each ('#', '.', ' '), tiles on the right and bottom
+#           edges are padded with '#', zlib compressed when the COMPRESSED flag is set
+#   index   (offset, length) of every tile, row of tiles after row of tiles, at the end of the file
+# the writer takes the maze a band of tile_size rows at a time, so converting or generating a maze
+# never needs more than one band in memory, and TiledMaze keeps at most cache_tiles tiles in memory.
+# searches still need a byte of state per cell they can reach, that is kept in a ScratchPlane (a
+# temporary file mapped into memory) so it can be bigger than memory too, but it needs that much
+# free disk space in the scratch directory.
+
+MAGIC = b"MZT\x1a"
+FORMAT_VERSION = 1
+COMPRESSED = 1
+DEFAULT_TILE_SIZE = 256
+DEFAULT_CACHE_TILES = 64
+
+_HEADER = struct.Struct("<4sHHIIIQ")
+_ENTRY = struct.Struct("<QI")
+
+# bytes counted at a time by ScratchPlane.count
+_COUNT_CHUNK = 1 << 22
+
+
+# a zeroed byte per cell for a search's state, kept in a temporary file mapped into memory instead
+# of on the heap: the operating system keeps only the pages in use in memory and writes the others
+# out, so a search of a maze larger than memory can keep its state as well. the file is sparse
+# (pages never written take no disk space) and deleted when the plane is closed or collected. it indexes and
+# slices like a bytearray, count() included
+class ScratchPlane(mmap.mmap):
+    def __new__(cls, size: int, directory: Optional[str] = None):
+        file = tempfile.TemporaryFile(dir=directory)
+        file.truncate(max(size, 1))  # mmap can't map an empty file
+        plane = super().__new__(cls, file.fileno(), max(size, 1))
+        plane.scratch_file = file
+        return plane
+
+    def __init__(self, size: int, directory: Optional[str] = None):
+        super().__init__()
+
+    def count(self, value: int) -> int:
+        return sum(self[i:i + _COUNT_CHUNK].count(value) for i in range(0, len(self), _COUNT_CHUNK))
+
+    def close(self):
+        super().close()
+        self.scratch_file.close()
+
+
+# writes the rows of a maze (bytes without line breaks, e.g. the lines of a .mz file or
+# maze_generator.maze_lines) as a tiled maze. returns (width, height)
+def write_tiled(lines: Iterable[bytes], tiled_file: str, tile_size: int = DEFAULT_TILE_SIZE,
+                compress: bool = True) -> Tuple[int, int]:
+    if tile_size < 1:
+        raise ValueError("Tile size must be at least 1.")
+    width = height = 0
+    index = []
+    with open(tiled_file, "wb") as file:
+        file.write(bytes(_HEADER.size))  # filled in once the height is known
+
+        def write_band(band: List[bytes]):
+            padding = b"#" * (tile_size * (tile_size - len(band)))
+            for left in range(0, width, tile_size):
+                tile = b"".join(row[left:left + tile_size].ljust(tile_size, b"#") for row in band) + padding
+                if compress:
+                    tile = zlib.compress(tile)
+                index.append((file.tell(), len(tile)))
+                file.write(tile)
+
+        band = []
+        for line in lines:
+            row = bytes(line)
+            if not height:
+                width = len(row)
+            if len(row) != width or width == 0:
+                raise ValueError("Maze rows are not of consistent length.")
+            if row.translate(None, RELAXED_CHARS):
+                raise ValueError("Maze contains invalid characters.")
+            band.append(row)
+            height += 1
+            if len(band) == tile_size:
+                write_band(band)
+                band = []
+        if band:
+            write_band(band)
+        if not height:
+            raise ValueError("Maze cannot be empty.")
+
+        index_offset = file.tell()
+        for entry in index:
+            file.write(_ENTRY.pack(*entry))
+        file.seek(0)
+        file.write(_HEADER.pack(MAGIC, FORMAT_VERSION, COMPRESSED if compress else 0, width, height, tile_size,
+                                index_offset))
+    return width, height
+
+
+# converts a .mz file to a tiled maze, reading it one line at a time. a blank line is a row of no
+# cells and fails like it does in read_mz, skipping it would shift every row below it
+def mz_to_tiled(mz_file: str, tiled_file: str, tile_size: int = DEFAULT_TILE_SIZE, compress: bool = True):
+    with open(mz_file, "rb") as file:
+        return write_tiled((line.rstrip(b"\r\n") for line in file), tiled_file, tile_size, compress)
+
+
+# a tiled maze on disk behind cell access, with the most recently used tiles kept in memory.
+# get(x, y) reads a cell like Grid.get, tile(number) gives a whole tile (cells row by row,
+# tile_size apart). hits and misses count the tile requests, hit_rate() is what to watch when
+# choosing tile_size and cache_tiles. search state goes in scratch_dir (the system temporary
+# directory by default), see ScratchPlane.
+class TiledMaze:
+    def __init__(self, tiled_file: str, cache_tiles: int = DEFAULT_CACHE_TILES, scratch_dir: Optional[str] = None):
+        self.scratch_dir = scratch_dir
+        try:
+            self.file = open(tiled_file, "rb")
+        except OSError:
+            raise IOError(f"Cannot read the maze file: {tiled_file}")
+        header = self.file.read(_HEADER.size)
+        if len(header) != _HEADER.size or header[:len(MAGIC)] != MAGIC:
+            self.file.close()
+            raise ValueError("Not a valid tiled maze file.")
+        _, version, flags, self.width, self.height, self.tile_size, index_offset = _HEADER.unpack(header)
+        if version != FORMAT_VERSION:
+            self.file.close()
+            raise ValueError(f"Unsupported tiled maze format version: {version}")
+        self.compressed = bool(flags & COMPRESSED)
+        self.tiles_across = -(-self.width // self.tile_size)
+        self.tiles_down = -(-self.height // self.tile_size)
+        self.file.seek(index_offset)
+        entries = self.file.read(_ENTRY.size * self.tiles_across * self.tiles_down)
+        self.index = [_ENTRY.unpack_from(entries, i) for i in range(0, len(entries), _ENTRY.size)]
+        if len(self.index) != self.tiles_across * self.tiles_down:
+            self.file.close()
+            raise ValueError("The tiled maze file is truncated.")
+        self.cache_tiles = max(1, cache_tiles)
+        self.cache: "OrderedDict[int, bytes]" = OrderedDict()
+        self.hits = self.misses = 0
+
+    def __len__(self) -> int:
+        return self.height
+
+    def __enter__(self) -> "TiledMaze":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.file.close()
+        self.cache.clear()
+
+    # the tile with the given number (row of tiles * tiles_across + column of tiles)
+    def tile(self, number: int) -> bytes:
+        data = self.cache.get(number)
+        if data is not None:
+            self.hits += 1
+            self.cache.move_to_end(number)
+            return data
+        self.misses += 1
+        offset, length = self.index[number]
+        self.file.seek(offset)
+        data = self.file.read(length)
+        if self.compressed:
+            data = zlib.decompress(data)
+        self.cache[number] = data
+        if len(self.cache) > self.cache_tiles:
+            self.cache.popitem(last=False)
+        return data
+
+    # number of the tile holding row r, column c
+    def tile_of(self, r: int, c: int) -> int:
+        return r // self.tile_size * self.tiles_across + c // self.tile_size
+
+    # reads the cell at column x, row y
+    def get(self, x: int, y: int) -> int:
+        size = self.tile_size
+        return self.tile(y // size * self.tiles_across + x // size)[y % size * size + x % size]
+
+    # row y as bytes, put together from every tile across the maze
+    def row(self, y: int) -> bytes:
+        size = self.tile_size
+        start = y % size * size
+        first = y // size * self.tiles_across
+        return b"".join(self.tile(first + i)[start:start + size] for i in range(self.tiles_across))[:self.width]
+
+    def hit_rate(self) -> float:
+        requests = self.hits + self.misses
+        return self.hits / requests if requests else 0.0
+
+    def cache_stats(self) -> Dict[str, float]:
+        return {"tile_size": self.tile_size, "cache_tiles": self.cache_tiles, "tile_hits": self.hits,
+                "tile_misses": self.misses, "tile_hit_rate": round(self.hit_rate(), 4)}
+
+    # a zeroed byte per cell (or size bytes) for a search to keep its state in, on disk
+    def new_plane(self, size: Optional[int] = None) -> ScratchPlane:
+        return ScratchPlane(self.width * self.height if size is None else size, self.scratch_dir)
+
+    # wall masks worked out from the tiles as they are asked for, to pass as walls= to
+    # runner_extension.dfs_search / dfs_explore so the dfs runs without the maze in memory
+    def walls(self, wall_values: bytes = b"#") -> "TiledWalls":
+        return TiledWalls(self, wall_values)
+
+
+# what dfs_search needs from a WallIndex (width, height, masks[cell], is_wall, new_plane), read
+# from a TiledMaze. the plane the dfs marks visited cells in is a ScratchPlane, on disk
+class TiledWalls:
+    __slots__ = ("maze", "width", "height", "masks", "_is_wall")
+
+    def __init__(self, maze: TiledMaze, wall_values: bytes = b"#"):
+        self.maze = maze
+        self.width, self.height = maze.width, maze.height
+        self._is_wall = bytes(1 if i in wall_values else 0 for i in range(256))
+        self.masks = self  # masks[y * width + x] is the mask of (x, y)
+
+    def __getitem__(self, cell: int) -> int:
+        y, x = divmod(cell, self.width)
+        return ((NORTH if self.is_wall(x, y - 1) else 0) | (EAST if self.is_wall(x + 1, y) else 0)
+                | (SOUTH if self.is_wall(x, y + 1) else 0) | (WEST if self.is_wall(x - 1, y) else 0))
+
+    # whether (x, y) is a wall or off the maze
+    def is_wall(self, x: int, y: int) -> bool:
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return True
+        return bool(self._is_wall[self.maze.get(x, y)])
+
+    def new_plane(self) -> ScratchPlane:
+        return self.maze.new_plane()
+
+
+# breadth first search on a tiled maze, one level at a time. each level is expanded tile by tile
+# (the frontier is sorted by tile, so a tile is fetched once per level instead of once per cell)
+# and the cells it finds are then put back in the order the queue of search.bfs would have found
+# them: by the position of the cell that found them, then Up, Down, Left, Right, a cell found
+# twice keeping its first finder. so path, exploration steps and log are the same as bfs gives.
+# the search state (move that reached each cell) is one byte per cell laid out tile by tile in a
+# ScratchPlane, so it is on disk rather than in memory apart from the pages in use. the frontier
+# itself is still a list in memory, one int per cell of the widest level.
+# positions are (row, column) like shortest_path, stats also gets the tile cache counters.
+def tiled_bfs(maze: TiledMaze, starting: Position, goal: Position, on_discover: Discover = None,
+              stats: Optional[dict] = None, open_values: bytes = b".") -> SearchResult:
+    rows, cols, size, across = maze.height, maze.width, maze.tile_size, maze.tiles_across
+    cells = size * size
+    is_open = bytes(1 if i in open_values else 0 for i in range(256))
+    for what, (r, c) in (("starting", starting), ("goal", goal)):
+        if not (0 <= r < rows and 0 <= c < cols) or not is_open[maze.get(c, r)]:
+            raise ValueError(f"Invalid {what} position: {(r, c)}")
+
+    # where a cell's state is: its tile's block of the plane, then its place in the tile
+    def state(r: int, c: int) -> int:
+        return (r // size * across + c // size) * cells + r % size * size + c % size
+
+    came_from = maze.new_plane(cells * across * maze.tiles_down)  # 0 unseen, 1-4 move, 5 start
+    try:
+        target = goal[0] * cols + goal[1]
+        came_from[state(*starting)] = 5
+        frontier = [starting[0] * cols + starting[1]]
+        expanded = discovered = 0
+        peak = 1
+        touched = {maze.tile_of(*starting)}
+
+        # the cells the first `limit` cells of the frontier find, in bfs order, marked in came_from
+        def expand(limit: int) -> List[int]:
+            finders = {}  # new cell -> lowest (frontier position * 4 + move) that found it
+            tiles = [cell // cols // size * across + cell % cols // size for cell in frontier[:limit]]
+            current_tile, data, base = -1, b"", 0
+            for i in sorted(range(limit), key=tiles.__getitem__):
+                r, c = divmod(frontier[i], cols)
+                if tiles[i] != current_tile:
+                    current_tile = tiles[i]
+                    data, base = maze.tile(current_tile), current_tile * cells
+                top, left = r - r % size, c - c % size
+                for move, (dr, dc, _) in enumerate(MOVES):
+                    nr, nc = r + dr, c + dc
+                    if not (0 <= nr < rows and 0 <= nc < cols):
+                        continue
+                    neighbor = nr * cols + nc
+                    finder = i * 4 + move
+                    if neighbor in finders:
+                        if finder < finders[neighbor]:
+                            finders[neighbor] = finder
+                        continue
+                    if top <= nr < top + size and left <= nc < left + size:  # same tile, no lookups needed
+                        local = (nr - top) * size + nc - left
+                        if not came_from[base + local] and is_open[data[local]]:
+                            finders[neighbor] = finder
+                    elif not came_from[state(nr, nc)] and is_open[maze.get(nc, nr)]:
+                        finders[neighbor] = finder
+            found = sorted(finders, key=finders.__getitem__)
+            for cell in found:
+                finder = finders[cell]
+                r, c = divmod(cell, cols)
+                came_from[state(r, c)] = (finder & 3) + 1
+                touched.add(r // size * across + c // size)
+                if on_discover is not None:
+                    on_discover(expanded + (finder >> 2) + 1, r, c, MOVES[finder & 3][2])
+            return found
+
+        reached = False
+        while frontier:
+            peak = max(peak, len(frontier))
+            if came_from[state(*goal)]:  # the goal is in this level, expand only what bfs takes off before it
+                position = frontier.index(target)
+                discovered += len(expand(position))
+                expanded += position + 1
+                reached = True
+                break
+            next_frontier = expand(len(frontier))
+            expanded += len(frontier)
+            discovered += len(next_frontier)
+            frontier = next_frontier
+
+        if stats is not None:
+            stats.update(peak_frontier=peak, came_from_entries=discovered + 1, state_tiles=len(touched),
+                         **maze.cache_stats())
+        if not reached:
+            return None, expanded, discovered
+        return _build_path(stats, _trace, came_from, state, goal), expanded, discovered
+    finally:
+        came_from.close()
+
+
+# follows the moves in the state plane back from the goal to the start
+def _trace(came_from, state, goal: Position) -> List[Position]:
+    r, c = goal
+    path = []
+    while True:
+        path.append((r, c))
+        move = came_from[state(r, c)]
+        if move == 5:
+            break
+        dr, dc, _ = MOVES[move - 1]
+        r, c = r - dr, c - dc
+    path.reverse()
+    return path
+
+
+def _position(text: str) -> Position:
+    return tuple(map(int, text.split(",")))
+
+
+# command line:
+#   python tiled_maze.py convert big.mz big.mzt --tile-size 256
+#   python tiled_maze.py solve big.mzt --starting 1,1 --goal 3999,3999 --cache-tiles 64
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tiled on-disk mazes for mazes larger than memory")
+    commands = parser.add_subparsers(dest="command", required=True)
+    convert = commands.add_parser("convert", help="Convert a .mz file to a tiled .mzt file")
+    convert.add_argument("maze", help="The .mz file to convert")
+    convert.add_argument("output", help="The .mzt file to write")
+    convert.add_argument("--tile-size", help="Cells along each side of a tile", type=int, default=DEFAULT_TILE_SIZE)
+    convert.add_argument("--no-compress", help="Store the tiles uncompressed", action="store_true")
+    solve = commands.add_parser("solve", help="Shortest path (BFS) on a tiled maze, (row, column) positions. "
+                                   "Needs a byte per cell of free disk space for the search state")
+    solve.add_argument("maze", help="The .mzt file to search")
+    solve.add_argument("--starting", help='The starting position, e.g., "1,1"', default="1,1")
+    solve.add_argument("--goal", help='The goal position, e.g., "9,9"', required=True)
+    solve.add_argument("--cache-tiles", help="Tiles kept in memory", type=int, default=DEFAULT_CACHE_TILES)
+    solve.add_argument("--scratch-dir", help="Directory for the search state, one byte per cell of the maze on "
+                                             "disk (default: the system temporary directory)", default=None)
+    args = parser.parse_args()
+
+    try:
+        began = time.perf_counter()
+        if args.command == "convert":
+            width, height = mz_to_tiled(args.maze, args.output, args.tile_size, not args.no_compress)
+            print(f"Wrote {args.output}: {width}x{height} in tiles of {args.tile_size} "
+                  f"in {time.perf_counter() - began:.2f}s")
+        else:
+            with TiledMaze(args.maze, args.cache_tiles, args.scratch_dir) as maze:
+                stats = {}
+                path, steps, _ = tiled_bfs(maze, _position(args.starting), _position(args.goal), stats=stats)
+                if path is None:
+                    raise ValueError("No path found from starting to goal.")
+                print(f"Path length: {len(path)}, exploration steps: {steps}, "
+                      f"{time.perf_counter() - began:.2f}s")
+                print(f"Tile cache: {stats['tile_hits']} hits, {stats['tile_misses']} misses, "
+                      f"hit rate {stats['tile_hit_rate']:.2%} (tiles of {maze.tile_size}, {maze.cache_tiles} kept)")
+    except Exception as e:
+        print("Error:", e)
+        sys.exit(1)
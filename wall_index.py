@@ -0,0 +1,114 @@
+from typing import Dict, Iterable, List, Tuple
+from grid import Grid, cell_bytes
+
+# one bit per side of a cell, north is the row above (y - 1) like maze.get_walls
+NORTH, EAST, SOUTH, WEST = 1, 2, 4, 8
+
+# wall status tuple (north, east, south, west) for every 4 bit mask
+ABSOLUTE = [(bool(m & NORTH), bool(m & EAST), bool(m & SOUTH), bool(m & WEST)) for m in range(16)]
+
+
+# precomputed wall mask for every cell of a maze, stored one byte per cell.
+# building it is a handful of whole-buffer operations, after that the walls around a cell are a
+# single indexed load. a side counts as walled when the neighbour there is a wall or off the maze.
+class WallIndex:
+    __slots__ = ("maze", "width", "height", "masks", "wall_values", "version", "_is_wall")
+
+    def __init__(self, maze, wall_values: bytes = b"\x01"):
+        self.maze = maze
+        self.height = len(maze)
+        self.width = len(maze[0]) if self.height > 0 else 0
+        self.wall_values = wall_values
+        self.version = maze.version if isinstance(maze, Grid) else 0
+        self._is_wall = bytes(1 if i in wall_values else 0 for i in range(256))
+        self.masks = bytearray()
+        self.rebuild(maze)
+
+    # an index around masks that were already computed (e.g. stored in a .mzb file), nothing is rebuilt
+    @classmethod
+    def from_masks(cls, maze, masks: bytearray, wall_values: bytes = b"\x01") -> "WallIndex":
+        index = cls.__new__(cls)
+        index.maze = maze
+        index.height = len(maze)
+        index.width = len(maze[0]) if index.height > 0 else 0
+        index.wall_values = wall_values
+        index.version = maze.version if isinstance(maze, Grid) else 0
+        index._is_wall = bytes(1 if i in wall_values else 0 for i in range(256))
+        index.masks = masks
+        return index
+
+    # recomputes every mask, each side is a shifted copy of the wall plane and the four planes are
+    # or-ed together as big integers (every plane only uses its own bit, so cells never mix)
+    def rebuild(self, maze=None):
+        maze = self.maze if maze is None else maze
+        width, height = self.width, self.height
+        size = width * height
+        if size == 0:
+            self.masks = bytearray()
+            return
+        walls = cell_bytes(maze).translate(self._is_wall)
+        edge_row, edge_col = b"\x01" * width, b"\x01" * height
+        north = edge_row + walls[:-width]
+        south = walls[width:] + edge_row
+        east = bytearray(walls[1:] + b"\x01")
+        east[width - 1::width] = edge_col
+        west = bytearray(b"\x01" + walls[:-1])
+        west[0::width] = edge_col
+        merged = (int.from_bytes(north, "big") | int.from_bytes(east, "big") << 1
+                  | int.from_bytes(south, "big") << 2 | int.from_bytes(west, "big") << 3)
+        self.masks = bytearray(merged.to_bytes(size, "big"))
+
+    # patches the masks after the given (x, y) cells changed, only they and their neighbours move
+    def update(self, changed: Iterable[Tuple[int, int]]):
+        for x, y in changed:
+            for nx, ny in ((x, y), (x, y - 1), (x + 1, y), (x, y + 1), (x - 1, y)):
+                if 0 <= nx < self.width and 0 <= ny < self.height:
+                    self.masks[ny * self.width + nx] = self._cell_mask(nx, ny)
+
+    def _cell_mask(self, x: int, y: int) -> int:
+        return ((NORTH if self.is_wall(x, y - 1) else 0) | (EAST if self.is_wall(x + 1, y) else 0)
+                | (SOUTH if self.is_wall(x, y + 1) else 0) | (WEST if self.is_wall(x - 1, y) else 0))
+
+    # whether (x, y) is a wall or off the maze, read from the maze itself rather than the masks
+    def is_wall(self, x: int, y: int) -> bool:
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return True
+        value = self.maze[y][x]
+        return bool(self._is_wall[ord(value) if isinstance(value, str) else value])
+
+    # a zeroed byte per cell, for a search to mark the cells it has seen
+    def new_plane(self) -> bytearray:
+        return bytearray(self.width * self.height)
+
+    # 4 bit wall mask of the cell at (x, y)
+    def mask(self, x: int, y: int) -> int:
+        return self.masks[y * self.width + x]
+
+    # wall status (north, east, south, west) at (x, y), same result as maze.get_walls
+    def walls(self, x: int, y: int) -> Tuple[bool, bool, bool, bool]:
+        return ABSOLUTE[self.masks[y * self.width + x]]
+
+
+# returns the wall index of a maze, for a Grid it is kept in grid.indexes and reused until the
+# grid changes (add_horizontal_wall / add_vertical_wall patch it in place), lists get a fresh one
+def wall_index(maze, wall_values: bytes = b"\x01") -> WallIndex:
+    if not isinstance(maze, Grid):
+        return WallIndex(maze, wall_values)
+    key = ("walls", wall_values)
+    index = maze.indexes.get(key)
+    if index is None:
+        index = maze.indexes[key] = WallIndex(maze, wall_values)
+    elif index.version != maze.version:
+        index.rebuild()
+        index.version = maze.version
+    return index
+
+
+# builds the rotation table a runner uses to turn an absolute mask into walls relative to where
+# it is facing, layout maps each orientation to the absolute sides seen as (left, front, right, ...)
+# e.g. {"N": (WEST, NORTH, EAST), ...}, the result is indexed as table[orientation][mask]
+def rotation_table(layout: Dict[str, Tuple[int, ...]]) -> Dict[str, List[Tuple[bool, ...]]]:
+    return {
+        orientation: [tuple(bool(mask & side) for side in sides) for mask in range(16)]
+        for orientation, sides in layout.items()
+    }